@@ -0,0 +1,36 @@
+"""Unique workflow key for bulk upserts
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Keep the newest row of any duplicated key before adding the constraint
+    op.execute(
+        """
+        DELETE FROM workflows a
+        USING workflows b
+        WHERE a.workflow_name = b.workflow_name
+          AND a.platform = b.platform
+          AND a.country = b.country
+          AND a.id < b.id
+        """
+    )
+    op.create_unique_constraint(
+        'uq_workflow_platform_country', 'workflows', ['workflow_name', 'platform', 'country']
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_workflow_platform_country', 'workflows', type_='unique')
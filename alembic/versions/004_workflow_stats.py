@@ -0,0 +1,35 @@
+"""Workflow stats summary table
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('workflow_stats',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('generation', sa.Integer(), nullable=False),
+    sa.Column('total_workflows', sa.Integer(), nullable=True),
+    sa.Column('platforms', postgresql.JSON(astext_type=sa.Text()), nullable=True),
+    sa.Column('countries', postgresql.JSON(astext_type=sa.Text()), nullable=True),
+    sa.Column('avg_popularity_score', sa.Float(), nullable=True),
+    sa.Column('top_workflow', sa.String(length=500), nullable=True),
+    sa.Column('last_updated', sa.DateTime(), nullable=True),
+    sa.Column('computed_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('workflow_stats')
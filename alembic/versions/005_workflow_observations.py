@@ -0,0 +1,37 @@
+"""Workflow content hashes and collected observations
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('workflows', sa.Column('content_hash', sa.String(length=32), nullable=True))
+    op.create_table('workflow_observations',
+    sa.Column('obs_key', sa.String(length=600), nullable=False),
+    sa.Column('workflow_id', sa.Integer(), nullable=False),
+    sa.Column('content_hash', sa.String(length=32), nullable=False),
+    sa.Column('popularity_score', sa.Float(), nullable=True),
+    sa.Column('data', postgresql.JSON(astext_type=sa.Text()), nullable=True),
+    sa.Column('observed_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['workflow_id'], ['workflows.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('obs_key')
+    )
+    op.create_index(op.f('ix_workflow_observations_workflow_id'), 'workflow_observations', ['workflow_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_workflow_observations_workflow_id'), table_name='workflow_observations')
+    op.drop_table('workflow_observations')
+    op.drop_column('workflows', 'content_hash')
@@ -0,0 +1,54 @@
+"""Workflow metric snapshots and trend deltas
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Monthly partitions are created by services.snapshots before each insert
+    op.create_table('workflow_metric_snapshots',
+    sa.Column('workflow_id', sa.Integer(), nullable=False),
+    sa.Column('captured_at', sa.DateTime(), nullable=False),
+    sa.Column('views', sa.Integer(), nullable=True),
+    sa.Column('likes', sa.Integer(), nullable=True),
+    sa.Column('comments', sa.Integer(), nullable=True),
+    sa.Column('replies', sa.Integer(), nullable=True),
+    sa.Column('search_volume', sa.Integer(), nullable=True),
+    sa.Column('popularity_score', sa.Float(), nullable=True),
+    sa.ForeignKeyConstraint(['workflow_id'], ['workflows.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('workflow_id', 'captured_at'),
+    postgresql_partition_by='RANGE (captured_at)'
+    )
+    op.create_index('idx_snapshots_captured_at', 'workflow_metric_snapshots', ['captured_at'], unique=False)
+    
+    op.create_table('workflow_trends',
+    sa.Column('workflow_id', sa.Integer(), nullable=False),
+    sa.Column('window_days', sa.Integer(), nullable=False),
+    sa.Column('score_delta', sa.Float(), nullable=True),
+    sa.Column('views_delta', sa.Integer(), nullable=True),
+    sa.Column('velocity', sa.Float(), nullable=True),
+    sa.Column('baseline_at', sa.DateTime(), nullable=True),
+    sa.Column('computed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['workflow_id'], ['workflows.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('workflow_id', 'window_days')
+    )
+    op.create_index('idx_trends_window_velocity', 'workflow_trends',
+                    ['window_days', sa.text('velocity DESC'), sa.text('workflow_id DESC')], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_trends_window_velocity', table_name='workflow_trends')
+    op.drop_table('workflow_trends')
+    op.drop_index('idx_snapshots_captured_at', table_name='workflow_metric_snapshots')
+    op.drop_table('workflow_metric_snapshots')
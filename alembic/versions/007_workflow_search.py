@@ -0,0 +1,72 @@
+"""Full-text and trigram search over workflows
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+# SQLite FTS5 tables over workflows: bm25-ranked words and name trigrams
+SQLITE_FTS_TABLES = {
+    'workflows_fts': (['workflow_name', 'title', 'description'], "tokenize='porter unicode61'"),
+    'workflows_trgm': (['workflow_name'], "tokenize='trigram'"),
+}
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        # Generated tsvector with a GIN index, pg_trgm index on the name
+        op.execute(sa.text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        op.execute(sa.text(
+            "ALTER TABLE workflows ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('english', coalesce(workflow_name, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(title, '')), 'B') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), 'C')) STORED"
+        ))
+        op.execute(sa.text('CREATE INDEX idx_workflows_search_vector ON workflows USING GIN (search_vector)'))
+        op.execute(sa.text('CREATE INDEX idx_workflows_name_trgm ON workflows USING GIN (workflow_name gin_trgm_ops)'))
+        return
+
+    # SQLite: external-content FTS5 tables kept in sync by triggers
+    for table, (columns, tokenize) in SQLITE_FTS_TABLES.items():
+        listed = ', '.join(columns)
+        new = ', '.join(f'new.{column}' for column in columns)
+        old = ', '.join(f'old.{column}' for column in columns)
+        op.execute(sa.text(
+            f"CREATE VIRTUAL TABLE {table} USING fts5({listed}, {tokenize}, content='workflows', content_rowid='id')"
+        ))
+        op.execute(sa.text(
+            f'CREATE TRIGGER {table}_ai AFTER INSERT ON workflows BEGIN '
+            f'INSERT INTO {table}(rowid, {listed}) VALUES (new.id, {new}); END'
+        ))
+        op.execute(sa.text(
+            f'CREATE TRIGGER {table}_ad AFTER DELETE ON workflows BEGIN '
+            f"INSERT INTO {table}({table}, rowid, {listed}) VALUES ('delete', old.id, {old}); END"
+        ))
+        op.execute(sa.text(
+            f'CREATE TRIGGER {table}_au AFTER UPDATE ON workflows BEGIN '
+            f"INSERT INTO {table}({table}, rowid, {listed}) VALUES ('delete', old.id, {old}); "
+            f'INSERT INTO {table}(rowid, {listed}) VALUES (new.id, {new}); END'
+        ))
+        op.execute(sa.text(f"INSERT INTO {table}({table}) VALUES ('rebuild')"))
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('idx_workflows_name_trgm', table_name='workflows')
+        op.drop_index('idx_workflows_search_vector', table_name='workflows')
+        op.drop_column('workflows', 'search_vector')
+    else:
+        for table in SQLITE_FTS_TABLES:
+            for suffix in ['ai', 'ad', 'au']:
+                op.execute(sa.text(f'DROP TRIGGER IF EXISTS {table}_{suffix}'))
+            op.execute(sa.text(f'DROP TABLE IF EXISTS {table}'))
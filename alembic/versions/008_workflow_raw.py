@@ -0,0 +1,69 @@
+"""Move workflows.raw_data to the compressed workflow_raw table
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from db.raw import compress_raw, decompress_raw
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+# Rows copied per statement
+BATCH_SIZE = 1000
+
+workflows = sa.table('workflows', sa.column('id', sa.Integer), sa.column('raw_data', sa.JSON))
+workflow_raw = sa.table('workflow_raw', sa.column('workflow_id', sa.Integer), sa.column('data', sa.LargeBinary))
+
+
+def batches(connection, query, key):
+    """Rows of query in key order, BATCH_SIZE at a time"""
+    last = None
+    while True:
+        page = query if last is None else query.where(key > last)
+        rows = connection.execute(page.order_by(key).limit(BATCH_SIZE)).all()
+        if not rows:
+            return
+        yield rows
+        last = rows[-1][0]
+
+
+def upgrade() -> None:
+    op.create_table('workflow_raw',
+    sa.Column('workflow_id', sa.Integer(), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['workflow_id'], ['workflows.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('workflow_id')
+    )
+
+    connection = op.get_bind()
+    query = sa.select(workflows.c.id, workflows.c.raw_data).where(workflows.c.raw_data.isnot(None))
+    for rows in batches(connection, query, workflows.c.id):
+        connection.execute(
+            workflow_raw.insert(),
+            [{'workflow_id': workflow_id, 'data': compress_raw(raw_data)} for workflow_id, raw_data in rows]
+        )
+
+    # A plain DROP COLUMN on SQLite (3.35+) keeps the FTS triggers that a
+    # batch table rebuild would lose
+    op.execute(sa.text('ALTER TABLE workflows DROP COLUMN raw_data'))
+
+
+def downgrade() -> None:
+    op.add_column('workflows', sa.Column('raw_data', sa.JSON(), nullable=True))
+
+    connection = op.get_bind()
+    query = sa.select(workflow_raw.c.workflow_id, workflow_raw.c.data)
+    for rows in batches(connection, query, workflow_raw.c.workflow_id):
+        connection.execute(
+            workflows.update().where(workflows.c.id == sa.bindparam('row_id')).values(raw_data=sa.bindparam('raw')),
+            [{'row_id': workflow_id, 'raw': decompress_raw(data)} for workflow_id, data in rows]
+        )
+
+    op.drop_table('workflow_raw')
@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from fastapi import Request, Response
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.stats import get_generation
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # optional, only needed for RESPONSE_CACHE_BACKEND=redis
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# How long the data generation read from workflow_stats is trusted before
+# it is checked again; refreshes in this process bump it immediately
+GENERATION_CHECK_INTERVAL = float(os.getenv("CACHE_GENERATION_CHECK_INTERVAL", "1.0"))
+
+# (etag, body)
+CacheEntry = Tuple[str, bytes]
+
+class MemoryBackend:
+    """In-process LRU of serialized responses"""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    async def set(self, key: str, entry: CacheEntry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def size(self) -> int:
+        return len(self.entries)
+
+class RedisBackend:
+    """Shared cache on a local Redis-compatible server
+
+    Entries expire after RESPONSE_CACHE_TTL; entries of old generations are
+    never read again and simply age out.
+    """
+
+    def __init__(self, url: str = REDIS_URL, ttl: int = RESPONSE_CACHE_TTL):
+        self.client = redis.from_url(url)
+        self.ttl = ttl
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        value = await self.client.get(f"response:{key}")
+        if value is None:
+            return None
+        etag, body = value.split(b"\n", 1)
+        return etag.decode(), body
+
+    async def set(self, key: str, entry: CacheEntry):
+        etag, body = entry
+        await self.client.set(f"response:{key}", etag.encode() + b"\n" + body, ex=self.ttl)
+
+    def size(self) -> Optional[int]:
+        return None
+
+class ResponseCache:
+    """Generation-versioned cache of JSON responses with strong ETags"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._generation: Optional[int] = None
+        self._generation_checked = 0.0
+
+    async def generation(self, session: AsyncSession) -> int:
+        """Current data generation, re-read at most every GENERATION_CHECK_INTERVAL"""
+        now = time.monotonic()
+        if self._generation is None or now - self._generation_checked > GENERATION_CHECK_INTERVAL:
+            self._generation = await get_generation(session) or 0
+            self._generation_checked = now
+        return self._generation
+
+    def bump(self, generation: int):
+        """Switch to a generation committed by this process"""
+        self._generation = generation
+        self._generation_checked = time.monotonic()
+
+    @staticmethod
+    def key(path: str, params: Dict, generation: int) -> str:
+        normalized = json.dumps(params, sort_keys=True, default=str, separators=(",", ":"))
+        return f"{generation}:{path}:{normalized}"
+
+    @staticmethod
+    def etag(body: bytes) -> str:
+        return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+    @staticmethod
+    def matches(if_none_match: Optional[str], etag: str) -> bool:
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or any(tag.replace("W/", "", 1) == etag for tag in tags)
+
+    async def respond(self, request: Request, session: AsyncSession, params: Dict,
+                      build: Callable[[], Awaitable[BaseModel]]) -> Response:
+        """Serve a cached response for the resolved params, building it on a miss
+
+        params should be the endpoint's parameters after defaults and
+        normalization, so equivalent requests share one entry.
+        """
+        generation = await self.generation(session)
+        key = self.key(request.url.path, params, generation)
+
+        entry = await self.backend.get(key)
+        if entry is None:
+            self.misses += 1
+            model = await build()
+            body = model.model_dump_json().encode()
+            entry = (self.etag(body), body)
+            await self.backend.set(key, entry)
+        else:
+            self.hits += 1
+
+        etag, body = entry
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if self.matches(request.headers.get("if-none-match"), etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "generation": self._generation,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "evictions": self.backend.evictions,
+            "entries": self.backend.size(),
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+def create_response_cache() -> ResponseCache:
+    """Build the cache for RESPONSE_CACHE_BACKEND (memory or redis)"""
+    if RESPONSE_CACHE_BACKEND == "redis":
+        if redis is None:
+            logger.warning("RESPONSE_CACHE_BACKEND=redis but the redis package is not installed, using memory")
+        else:
+            return ResponseCache(RedisBackend())
+    return ResponseCache(MemoryBackend())
+
+response_cache = create_response_cache()
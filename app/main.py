@@ -1,20 +1,31 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, desc
-from typing import Optional
+from sqlalchemy import select, func, desc, tuple_
+from sqlalchemy.orm import load_only
+from typing import Dict, List, Optional, Tuple
 import logging
 from datetime import datetime
 import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from db.session import get_db, create_tables, create_database_if_not_exists
-from db.models import Workflow
+from db.session import get_db, create_tables, create_database_if_not_exists, pool_stats
+from db.instrumentation import db_stats
+from db.models import Workflow, WorkflowTrend, WORKFLOW_RESPONSE_COLUMNS
 from app.schemas import (
     WorkflowResponse, WorkflowListResponse, StatsResponse, 
-    RefreshRequest, RefreshResponse
+    RefreshRequest, RefreshResponse, JobResponse, TrendingWorkflow, TrendingResponse,
+    SearchResult, SearchResponse
 )
-from services.orchestrator import run_pipeline
+from app.cache import response_cache
+from app.pagination import encode_cursor, decode_cursor
+from app.metrics import MetricsMiddleware
+from services.jobs import RefreshJobs, RefreshJob
+from services.locks import pipeline_lock
+from services.metrics import registry, CONTENT_TYPE
+from services.stats import load_stats
+from services.snapshots import TRENDING_WINDOWS
+from services.search import search_workflows, filtered, platform_value, country_value, normalize_query
 
 # Setup logging
 logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
@@ -28,6 +39,9 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+# Background refreshes; a finished refresh invalidates cached responses
+refresh_jobs = RefreshJobs(on_success=lambda results: response_cache.bump(results["generation"]))
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -37,6 +51,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency per route for /metrics
+app.add_middleware(MetricsMiddleware)
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize database on startup"""
@@ -47,6 +64,11 @@ async def startup_event():
     except Exception as e:
         logger.error(f"Error during startup: {e}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop a refresh still running in this process"""
+    await refresh_jobs.shutdown()
+
 @app.get("/", tags=["Root"])
 async def root():
     """Root endpoint"""
@@ -65,142 +87,322 @@ async def health_check():
         "service": "n8n-workflow-system"
     }
 
+@app.get("/metrics", tags=["Health"], include_in_schema=False)
+async def metrics():
+    """Prometheus metrics for this process"""
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
+
+async def fetch_workflow_page(
+    db: AsyncSession,
+    platform: Optional[str],
+    country: Optional[str],
+    limit: int,
+    offset: int,
+    after: Optional[Tuple[float, int]],
+    include_total: bool
+) -> WorkflowListResponse:
+    """Query one page of workflows, after a keyset position or at an offset"""
+    
+    # Build query, loading only the columns the response returns
+    query = select(Workflow).options(load_only(*WORKFLOW_RESPONSE_COLUMNS))
+    
+    # Apply filters, exact matches on stored values use the
+    # (platform, country, score, id) index
+    query = filtered(query, platform, country)
+    
+    # Get total count only when asked, it scans every matching row
+    total = None
+    if include_total:
+        count_query = select(func.count()).select_from(query.subquery())
+        total_result = await db.execute(count_query)
+        total = total_result.scalar()
+    
+    # Keyset pagination continues after the (popularity_score, id) of
+    # the previous page's last row; offset mode is kept for old clients
+    if after:
+        last_score, last_id = after
+        query = query.where(
+            tuple_(Workflow.popularity_score, Workflow.id) < tuple_(last_score, last_id)
+        )
+    else:
+        query = query.offset(offset)
+    
+    # Fetch one extra row to know whether another page exists
+    query = query.order_by(desc(Workflow.popularity_score), desc(Workflow.id)).limit(limit + 1)
+    result = await db.execute(query)
+    workflows = result.scalars().all()
+    
+    has_next = len(workflows) > limit
+    workflows = workflows[:limit]
+    next_cursor = None
+    if has_next:
+        next_cursor = encode_cursor(workflows[-1].popularity_score, workflows[-1].id)
+    
+    return WorkflowListResponse(
+        workflows=workflows,
+        total=total,
+        page=None if after else offset // limit + 1,
+        per_page=limit,
+        has_next=has_next,
+        has_prev=bool(after) or offset > 0,
+        next_cursor=next_cursor
+    )
+
 @app.get("/workflows", response_model=WorkflowListResponse, tags=["Workflows"])
 async def get_workflows(
+    request: Request,
     platform: Optional[str] = Query(None, description="Filter by platform"),
     country: Optional[str] = Query(None, description="Filter by country"),
     limit: int = Query(20, ge=1, le=100, description="Number of results per page"),
-    offset: int = Query(0, ge=0, description="Number of results to skip"),
+    offset: int = Query(0, ge=0, description="Number of results to skip (ignored with cursor)"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor"),
+    include_total: bool = Query(False, description="Also count all matching workflows"),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get workflows with filtering and pagination"""
+    """Get workflows with filtering and keyset or offset pagination"""
     try:
-    
-        # Build query
-        query = select(Workflow)
+        after = None
+        if cursor:
+            try:
+                after = decode_cursor(cursor)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
         
-        # Apply filters
-        if platform:
-            query = query.where(Workflow.platform.ilike(f"%{platform}%"))
-        if country:
-            query = query.where(Workflow.country.ilike(f"%{country}%"))
+        # Filters are case-insensitive; they are matched, and part of the
+        # cache key, in their stored spelling
+        platform = platform_value(platform)
+        country = country_value(country)
+        params = {
+            "platform": platform,
+            "country": country,
+            "limit": limit,
+            "offset": 0 if after else offset,
+            "after": after,
+            "include_total": include_total
+        }
         
-        # Get total count
-        count_query = select(func.count()).select_from(query.subquery())
-        total_result = await db.execute(count_query)
-        total = total_result.scalar()
-        
-        # Apply pagination and ordering
-        query = query.order_by(desc(Workflow.popularity_score)).offset(offset).limit(limit)
-        result = await db.execute(query)
-        workflows = result.scalars().all()
+        return await response_cache.respond(
+            request, db, params,
+            lambda: fetch_workflow_page(db, platform, country, limit, offset, after, include_total)
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching workflows: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+async def fetch_trending(
+    db: AsyncSession,
+    window: int,
+    platform: Optional[str],
+    country: Optional[str],
+    limit: int
+) -> TrendingResponse:
+    """Rank workflows by their precomputed score velocity over one window"""
+    query = (
+        select(Workflow, WorkflowTrend)
+        .options(load_only(*WORKFLOW_RESPONSE_COLUMNS))
+        .join(WorkflowTrend, WorkflowTrend.workflow_id == Workflow.id)
+        .where(WorkflowTrend.window_days == window)
+    )
+    query = filtered(query, platform, country)
+    
+    query = query.order_by(desc(WorkflowTrend.velocity), desc(WorkflowTrend.workflow_id)).limit(limit)
+    result = await db.execute(query)
+    rows = result.all()
+    
+    workflows = [
+        TrendingWorkflow(
+            **WorkflowResponse.model_validate(workflow).model_dump(),
+            score_delta=trend.score_delta,
+            views_delta=trend.views_delta,
+            velocity=trend.velocity,
+            baseline_at=trend.baseline_at
+        )
+        for workflow, trend in rows
+    ]
+    return TrendingResponse(
+        workflows=workflows,
+        window_days=window,
+        computed_at=rows[0][1].computed_at if rows else None
+    )
+
+# Declared before /workflows/{workflow_id} so "trending" is not read as an id
+@app.get("/workflows/trending", response_model=TrendingResponse, tags=["Workflows"])
+async def get_trending_workflows(
+    request: Request,
+    window: int = Query(7, description=f"Window in days, one of {TRENDING_WINDOWS}"),
+    platform: Optional[str] = Query(None, description="Filter by platform"),
+    country: Optional[str] = Query(None, description="Filter by country"),
+    limit: int = Query(20, ge=1, le=100, description="Number of results"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the workflows whose popularity score is rising fastest"""
+    if window not in TRENDING_WINDOWS:
+        raise HTTPException(status_code=400, detail=f"window must be one of {TRENDING_WINDOWS}")
+    
+    try:
+        platform = platform_value(platform)
+        country = country_value(country)
+        params = {"window": window, "platform": platform, "country": country, "limit": limit}
         
-        page = offset // limit + 1
+        return await response_cache.respond(
+            request, db, params,
+            lambda: fetch_trending(db, window, platform, country, limit)
+        )
+    except Exception as e:
+        logger.error(f"Error fetching trending workflows: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+async def fetch_search(
+    db: AsyncSession,
+    q: str,
+    platform: Optional[str],
+    country: Optional[str],
+    limit: int
+) -> SearchResponse:
+    """Full-text and fuzzy name matches, best rank first"""
+    matches = await search_workflows(db, q, platform, country, limit)
+    return SearchResponse(
+        workflows=[
+            SearchResult(**WorkflowResponse.model_validate(workflow).model_dump(), rank=round(rank, 4))
+            for workflow, rank in matches
+        ],
+        query=q
+    )
+
+# Declared before /workflows/{workflow_id} so "search" is not read as an id
+@app.get("/workflows/search", response_model=SearchResponse, tags=["Workflows"])
+async def search_workflows_endpoint(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200, description="Words of the name, title or description"),
+    platform: Optional[str] = Query(None, description="Filter by platform"),
+    country: Optional[str] = Query(None, description="Filter by country"),
+    limit: int = Query(20, ge=1, le=100, description="Number of results"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Search workflows by text, tolerating typos in workflow names"""
+    try:
+        q = normalize_query(q)
+        platform = platform_value(platform)
+        country = country_value(country)
+        params = {"q": q, "platform": platform, "country": country, "limit": limit}
         
-        return WorkflowListResponse(
-            workflows=workflows,
-            total=total,
-            page=page,
-            per_page=limit,
-            has_next=offset + limit < total,
-            has_prev=offset > 0
+        return await response_cache.respond(
+            request, db, params,
+            lambda: fetch_search(db, q, platform, country, limit)
         )
     except Exception as e:
-        logger.error(f"Error fetching workflows: {e}")
+        logger.error(f"Error searching workflows: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
+async def fetch_workflow(db: AsyncSession, workflow_id: int) -> WorkflowResponse:
+    """Load one workflow or raise 404"""
+    query = select(Workflow).options(load_only(*WORKFLOW_RESPONSE_COLUMNS)).where(Workflow.id == workflow_id)
+    result = await db.execute(query)
+    workflow = result.scalar_one_or_none()
+    
+    if not workflow:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    
+    return WorkflowResponse.model_validate(workflow)
+
 @app.get("/workflows/{workflow_id}", response_model=WorkflowResponse, tags=["Workflows"])
-async def get_workflow(workflow_id: int, db: AsyncSession = Depends(get_db)):
+async def get_workflow(request: Request, workflow_id: int, db: AsyncSession = Depends(get_db)):
     """Get a specific workflow by ID"""
     try:
-    
-        query = select(Workflow).where(Workflow.id == workflow_id)
-        result = await db.execute(query)
-        workflow = result.scalar_one_or_none()
-        
-        if not workflow:
-            raise HTTPException(status_code=404, detail="Workflow not found")
-        
-        return workflow
+        return await response_cache.respond(
+            request, db, {"workflow_id": workflow_id},
+            lambda: fetch_workflow(db, workflow_id)
+        )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching workflow: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
     
+async def fetch_stats(db: AsyncSession) -> StatsResponse:
+    stats = await load_stats(db)
+    return StatsResponse(**stats)
 
 @app.get("/stats", response_model=StatsResponse, tags=["Statistics"])
-async def get_stats(db: AsyncSession = Depends(get_db)):
+async def get_stats(request: Request, db: AsyncSession = Depends(get_db)):
     """Get system statistics"""
     try:
-
-        # Total workflows
-        total_result = await db.execute(select(func.count(Workflow.id)))
-        total_workflows = total_result.scalar()
-
-        # Platform distribution
-        platform_query = select(Workflow.platform, func.count(Workflow.id)).group_by(Workflow.platform)
-        platform_result = await db.execute(platform_query)
-        platforms = {platform: count for platform, count in platform_result.all()}
-
-        # Country distribution
-        country_query = select(Workflow.country, func.count(Workflow.id)).group_by(Workflow.country)
-        country_result = await db.execute(country_query)
-        countries = {country: count for country, count in country_result.all()}
-
-        # Average popularity score
-        avg_query = select(func.avg(Workflow.popularity_score))
-        avg_result = await db.execute(avg_query)
-        avg_score = avg_result.scalar() or 0.0
-
-        # Top workflow
-        top_query = select(Workflow.workflow_name).order_by(desc(Workflow.popularity_score)).limit(1)
-        top_result = await db.execute(top_query)
-        top_workflow = top_result.scalar()
-
-        # Last updated
-        last_updated_query = select(func.max(Workflow.updated_at))
-        last_updated_result = await db.execute(last_updated_query)
-        last_updated = last_updated_result.scalar()
-
-        return StatsResponse(
-            total_workflows=total_workflows,
-            platforms=platforms,
-            countries=countries,
-            avg_popularity_score=round(avg_score, 2),
-            top_workflow=top_workflow,
-            last_updated=last_updated
-        )
+        return await response_cache.respond(request, db, {}, lambda: fetch_stats(db))
 
     except Exception as e:
         logger.error(f"Error fetching stats: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
-@app.post("/admin/refresh", response_model=RefreshResponse, tags=["Admin"])
-async def refresh_data(
-    request: RefreshRequest = RefreshRequest(),
-    db: AsyncSession = Depends(get_db)
-):
-    """Trigger data collection and refresh"""
+@app.get("/admin/cache", tags=["Admin"])
+async def get_cache_stats():
+    """Response cache hit/miss/eviction counters"""
+    return response_cache.stats()
+
+def refresh_response(results: Dict, platforms: List[str]) -> RefreshResponse:
+    return RefreshResponse(
+        status="success",
+        message=f"Refreshed {results['processed']} workflows",
+        collected=results["collected"],
+        processed=results["processed"],
+        stored=results["stored"],
+        inserted=results["inserted"],
+        updated=results["updated"],
+        deleted=results["deleted"],
+        new=results["new"],
+        changed=results["changed"],
+        unchanged=results["unchanged"],
+        errors=results["errors"],
+        platforms=platforms
+    )
+
+def job_response(job: RefreshJob, coalesced: bool = False) -> JobResponse:
+    result = refresh_response(job.results, job.platforms) if job.status == "succeeded" else None
+    return JobResponse(**job.snapshot(), coalesced=coalesced, result=result)
+
+@app.post("/admin/refresh", response_model=JobResponse, status_code=202, tags=["Admin"])
+async def refresh_data(request: RefreshRequest = RefreshRequest()):
+    """Start data collection and refresh in the background
     
-    logger.info(f"Starting data refresh: {request}")
+    Returns the job to poll at /admin/jobs/{job_id}. While a refresh is
+    running, requests it covers join it and others are queued after it;
+    a refresh running in another process is handled per lock_mode.
+    """
+    logger.info(f"Refresh requested: {request}")
     
+    platforms = request.platforms or ["YouTube", "Forum", "Google"]
+    job, coalesced = refresh_jobs.submit(platforms, request.force, request.lock_mode)
+    return job_response(job, coalesced)
+
+@app.get("/admin/jobs/{job_id}", response_model=JobResponse, tags=["Admin"])
+async def get_job(job_id: str):
+    """Status, stage, progress counts and errors of a refresh job"""
+    job = refresh_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_response(job)
+
+@app.get("/admin/db/stats", tags=["Admin"])
+async def get_db_stats(
+    top: int = Query(20, ge=1, le=200, description="Statements to list, by total execution time"),
+    reset: bool = Query(False, description="Clear the counters after reading them")
+):
+    """Connection pool state, checkout waits and statement execution times"""
+    stats = pool_stats(top)
+    if reset:
+        db_stats.reset()
+    return stats
+
+@app.get("/admin/lock", tags=["Admin"])
+async def get_lock_status():
+    """Pipeline lock holder across processes, waiters and wait times"""
     try:
-        platforms = request.platforms or ["YouTube", "Forum", "Google"]
-        results = await run_pipeline(db, platforms, request.force)
-        
-        return RefreshResponse(
-            status="success",
-            message=f"Refreshed {results['processed']} workflows",
-            collected=results["collected"],
-            processed=results["processed"],
-            stored=results["stored"],
-            errors=results["errors"],
-            platforms=platforms
-        )
-        
+        return await pipeline_lock.status()
     except Exception as e:
-        logger.error(f"Data refresh failed: {e}")
-        raise HTTPException(status_code=500, detail=f"Refresh failed: {str(e)}")
+        logger.error(f"Error reading pipeline lock: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
 
 if __name__ == "__main__":
     import uvicorn
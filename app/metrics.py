@@ -0,0 +1,47 @@
+import time
+from typing import Dict, Optional
+from starlette.routing import BaseRoute
+from services.metrics import http_request_duration
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing every HTTP request into http_request_duration
+
+    Requests are labelled with the route template ("/workflows/{workflow_id}"),
+    not the raw path, so ids do not create new series. The per-request cost
+    is one send wrapper, a dict lookup and a histogram bisect.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        # endpoint function -> route path, filled on first use once routes exist
+        self.route_paths: Optional[Dict] = None
+
+    def route_path(self, scope) -> str:
+        if self.route_paths is None:
+            routes = scope["app"].routes
+            self.route_paths = {
+                route.endpoint: route.path for route in routes
+                if isinstance(route, BaseRoute) and hasattr(route, "endpoint")
+            }
+        return self.route_paths.get(scope.get("endpoint"), "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_request_duration.observe(
+                time.perf_counter() - started, scope["method"], self.route_path(scope), str(status)
+            )
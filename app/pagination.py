@@ -0,0 +1,18 @@
+import json
+import base64
+import binascii
+from typing import Tuple
+
+def encode_cursor(popularity_score: float, workflow_id: int) -> str:
+    """Opaque keyset cursor for the row a page ended on"""
+    payload = json.dumps([popularity_score, workflow_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    """Decode a cursor from encode_cursor, raising ValueError if malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        popularity_score, workflow_id = json.loads(base64.urlsafe_b64decode(padded))
+        return float(popularity_score), int(workflow_id)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal
 from datetime import datetime
 import os
 import sys
@@ -35,11 +35,30 @@ class WorkflowResponse(WorkflowBase):
 
 class WorkflowListResponse(BaseModel):
     workflows: List[WorkflowResponse]
-    total: int
-    page: int
+    total: Optional[int] = Field(None, description="Matching workflows, only with include_total=true")
+    page: Optional[int] = Field(None, description="Page number in offset mode")
     per_page: int
     has_next: bool
     has_prev: bool
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page")
+
+class TrendingWorkflow(WorkflowResponse):
+    score_delta: float = Field(..., description="Score change over the window")
+    views_delta: int = Field(..., description="View change over the window")
+    velocity: float = Field(..., description="Score change per day")
+    baseline_at: Optional[datetime] = Field(None, description="Snapshot the deltas are measured from")
+
+class TrendingResponse(BaseModel):
+    workflows: List[TrendingWorkflow]
+    window_days: int
+    computed_at: Optional[datetime] = Field(None, description="When the deltas were computed")
+
+class SearchResult(WorkflowResponse):
+    rank: float = Field(..., description="Match quality, higher is better; comparable within one response")
+
+class SearchResponse(BaseModel):
+    workflows: List[SearchResult]
+    query: str = Field(..., description="The normalized search query")
 
 class StatsResponse(BaseModel):
     total_workflows: int
@@ -52,6 +71,9 @@ class StatsResponse(BaseModel):
 class RefreshRequest(BaseModel):
     platforms: Optional[List[str]] = Field(default=None, description="Platforms to refresh")
     force: bool = Field(default=False, description="Force refresh (clear existing data)")
+    lock_mode: Optional[Literal["wait", "skip", "coalesce"]] = Field(
+        default=None, description="When another process is refreshing: wait, skip or coalesce (default PIPELINE_LOCK_MODE)"
+    )
 
 class RefreshResponse(BaseModel):
     status: str
@@ -59,5 +81,26 @@ class RefreshResponse(BaseModel):
     collected: int
     processed: int
     stored: int
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    new: int = 0
+    changed: int = 0
+    unchanged: int = 0
+    errors: List[str]
+    platforms: List[str]
+
+class JobResponse(BaseModel):
+    job_id: str
+    status: str = Field(..., description="queued, running, succeeded, failed, cancelled, skipped or coalesced")
+    stage: str = Field(..., description="Pipeline stage: waiting, collecting, processing, history or done")
+    coalesced: bool = Field(default=False, description="Joined a refresh that was already running")
+    platforms: List[str]
+    force: bool
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    progress: Dict[str, int]
     errors: List[str]
-    platforms: List[str]
\ No newline at end of file
+    lock: Optional[Dict[str, Any]] = Field(default=None, description="Pipeline lock outcome, wait time and the other holder")
+    result: Optional[RefreshResponse] = Field(default=None, description="Final counts once the job succeeded")
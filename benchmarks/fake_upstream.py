@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""Local stand-in for the collectors' upstream APIs, for load tests
+
+Serves the subset of endpoints the collectors call, with injected latency
+and errors:
+
+    /youtube/v3/search, /youtube/v3/videos    YouTube Data API v3
+    /forum/latest.json, /forum/t/{id}.json    Discourse
+    /trends/interest_over_time                Trends-like JSON feed
+
+    python -m benchmarks.fake_upstream --port 8900 --latency lognormal:80:0.6 --error-rate 0.01
+
+Point the collectors at it with YOUTUBE_API_BASE_URL=http://127.0.0.1:8900/youtube/v3,
+FORUM_BASE_URL=http://127.0.0.1:8900/forum and GOOGLE_TRENDS_BASE_URL=http://127.0.0.1:8900/trends,
+or use benchmarks/load.py, which starts it.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import random
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import JSONResponse
+from services.integrations import INTEGRATIONS
+
+SOURCES = ["youtube", "forum", "trends"]
+
+# Shapes of generated titles; every forum title passes the collector's keyword filter
+VIDEO_TITLES = ["{a} to {b} automation with n8n", "n8n {a} integration tutorial", "Sync {a} and {b} using n8n",
+                "Build a {a} workflow in n8n"]
+TOPIC_TITLES = ["How to connect {a} and {b}?", "{a} workflow not triggering", "Sync {a} to {b} automation",
+                "{a} integration returns empty data"]
+
+TOPICS_PER_PAGE = 30
+WEEKS = 13
+
+class Latency:
+    """Latency distribution in milliseconds, parsed from "kind:args"
+
+        fixed:50            always 50ms
+        uniform:20:120      uniform between 20 and 120ms
+        lognormal:80:0.6    median 80ms, sigma 0.6 (long right tail)
+    """
+
+    def __init__(self, spec: str):
+        kind, *args = spec.split(":")
+        self.spec = spec
+        self.kind = kind
+        self.args = [float(arg) for arg in args]
+        expected = {"fixed": 1, "uniform": 2, "lognormal": 2}
+        if kind not in expected or len(self.args) != expected[kind]:
+            raise ValueError(f"Latency must be fixed:MS, uniform:MIN:MAX or lognormal:MEDIAN:SIGMA, got {spec!r}")
+
+    def sample(self, rng: random.Random) -> float:
+        """One delay in seconds"""
+        if self.kind == "fixed":
+            ms = self.args[0]
+        elif self.kind == "uniform":
+            ms = rng.uniform(*self.args)
+        else:
+            median, sigma = self.args
+            ms = median * rng.lognormvariate(0, sigma)
+        return ms / 1000
+
+class FakeUpstreamConfig:
+    """Dataset size, latency per source and error injection rates"""
+
+    def __init__(self, videos: int = 5000, topics: int = 2000, latency: str = "lognormal:80:0.6",
+                 source_latency: Optional[Dict[str, str]] = None, rate_limit_rate: float = 0.0,
+                 error_rate: float = 0.0, retry_after: float = 1.0, seed: int = 42):
+        self.videos = videos
+        self.topics = topics
+        self.latency = {source: Latency((source_latency or {}).get(source) or latency) for source in SOURCES}
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.seed = seed
+
+def stable_hash(*parts) -> int:
+    return int(hashlib.md5("|".join(map(str, parts)).encode()).hexdigest()[:12], 16)
+
+class Dataset:
+    """Deterministic videos, topics and interest series for a seed"""
+
+    def __init__(self, config: FakeUpstreamConfig):
+        rng = random.Random(config.seed)
+        services = [name.title() for name in INTEGRATIONS]
+
+        def title(templates: List[str]) -> str:
+            a, b = rng.sample(services, 2)
+            return rng.choice(templates).format(a=a, b=b)
+
+        self.videos = []
+        for index in range(config.videos):
+            views = int(rng.lognormvariate(8, 1.5))
+            self.videos.append({
+                "id": f"fake{index:07d}",
+                "title": title(VIDEO_TITLES),
+                "statistics": {
+                    "viewCount": str(views),
+                    "likeCount": str(int(views * rng.uniform(0.005, 0.08))),
+                    "commentCount": str(int(views * rng.uniform(0.0005, 0.01)))
+                }
+            })
+        self.videos_by_id = {video["id"]: video for video in self.videos}
+
+        self.topics = []
+        for index in range(config.topics):
+            replies = int(rng.lognormvariate(2, 1))
+            self.topics.append({
+                "id": 100000 + index,
+                "title": title(TOPIC_TITLES),
+                "slug": f"fake-topic-{index}",
+                "views": int(rng.lognormvariate(6, 1.2)),
+                "reply_count": replies,
+                "like_count": int(rng.lognormvariate(1.5, 1)),
+                "posts_count": replies + 1,
+                "created_at": "2024-01-15T10:00:00.000Z"
+            })
+        self.topics_by_id = {topic["id"]: topic for topic in self.topics}
+
+    def search(self, query: str, region: str, max_results: int) -> List[Dict]:
+        """The same videos for the same query and region, overlapping across queries"""
+        start = stable_hash(query, region) % max(len(self.videos), 1)
+        return [self.videos[(start + offset * 7) % len(self.videos)] for offset in range(min(max_results, len(self.videos)))]
+
+    @staticmethod
+    def interest(keywords: List[str], geo: str) -> Dict[str, List[float]]:
+        """Weekly series normalized to the batch's peak of 100, like Google Trends"""
+        raw = {}
+        for keyword in keywords:
+            level = 5 + stable_hash(keyword, geo) % 95
+            growth = (stable_hash(keyword, geo, "trend") % 21 - 10) / 100
+            raw[keyword] = [max(level * (1 + growth * week), 0) for week in range(WEEKS)]
+        peak = max((value for values in raw.values() for value in values), default=0) or 1
+        return {keyword: [round(value * 100 / peak) for value in values] for keyword, values in raw.items()}
+
+def create_app(config: FakeUpstreamConfig) -> FastAPI:
+    app = FastAPI(title="Fake upstream APIs", docs_url=None, redoc_url=None)
+    dataset = Dataset(config)
+    rng = random.Random(config.seed)
+    app.state.requests = {source: 0 for source in SOURCES}
+
+    async def upstream(source: str) -> Optional[JSONResponse]:
+        """Apply latency, then maybe an injected error response"""
+        app.state.requests[source] += 1
+        await asyncio.sleep(config.latency[source].sample(rng))
+        roll = rng.random()
+        if roll < config.rate_limit_rate:
+            return JSONResponse(
+                {"error": {"code": 429, "message": "Rate limited", "errors": [{"reason": "rateLimitExceeded"}]}},
+                status_code=429, headers={"Retry-After": str(config.retry_after)}
+            )
+        if roll < config.rate_limit_rate + config.error_rate:
+            return JSONResponse(
+                {"error": {"code": 503, "message": "Backend error", "errors": [{"reason": "backendError"}]}},
+                status_code=503
+            )
+        return None
+
+    @app.get("/youtube/v3/search")
+    async def youtube_search(q: str, regionCode: str = "US", maxResults: int = 10):
+        error = await upstream("youtube")
+        if error:
+            return error
+        return {
+            "kind": "youtube#searchListResponse",
+            "items": [
+                {"id": {"kind": "youtube#video", "videoId": video["id"]},
+                 "snippet": {"title": video["title"], "description": f"{video['title']} step by step"}}
+                for video in dataset.search(q, regionCode, maxResults)
+            ]
+        }
+
+    @app.get("/youtube/v3/videos")
+    async def youtube_videos(id: str):
+        error = await upstream("youtube")
+        if error:
+            return error
+        return {
+            "kind": "youtube#videoListResponse",
+            "items": [
+                {"id": video_id, "statistics": dataset.videos_by_id[video_id]["statistics"]}
+                for video_id in id.split(",") if video_id in dataset.videos_by_id
+            ]
+        }
+
+    @app.get("/forum/latest.json")
+    async def forum_latest(page: int = 0):
+        error = await upstream("forum")
+        if error:
+            return error
+        start = page * TOPICS_PER_PAGE
+        return {"topic_list": {"topics": dataset.topics[start:start + TOPICS_PER_PAGE]}}
+
+    @app.get("/forum/t/{topic_id}.json")
+    async def forum_topic(topic_id: int):
+        error = await upstream("forum")
+        if error:
+            return error
+        topic = dataset.topics_by_id.get(topic_id)
+        if topic is None:
+            return JSONResponse({"errors": ["Not found"]}, status_code=404)
+        posts = [{"id": topic_id * 100 + index, "user_id": stable_hash(topic_id, index) % 50}
+                 for index in range(topic["posts_count"])]
+        return {"id": topic_id, "title": topic["title"], "post_stream": {"posts": posts}, "tags": []}
+
+    @app.get("/trends/interest_over_time")
+    async def trends_interest(keyword: List[str] = Query(...), geo: str = "US"):
+        error = await upstream("trends")
+        if error:
+            return error
+        return dataset.interest(keyword[:5], geo)
+
+    @app.get("/stats")
+    async def stats(request: Request):
+        """Requests received per source"""
+        return request.app.state.requests
+
+    return app
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Server options, shared with benchmarks/load.py"""
+    parser.add_argument("--videos", type=int, default=5000, help="Videos in the fake YouTube (default 5000)")
+    parser.add_argument("--topics", type=int, default=2000, help="Topics in the fake forum (default 2000)")
+    parser.add_argument("--latency", default="lognormal:80:0.6",
+                        help="fixed:MS, uniform:MIN:MAX or lognormal:MEDIAN:SIGMA (default lognormal:80:0.6)")
+    for source in SOURCES:
+        parser.add_argument(f"--{source}-latency", default=None, help=f"Latency for {source}, overrides --latency")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered 503")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds on 429 responses")
+    parser.add_argument("--seed", type=int, default=42)
+
+def config_from_args(args: argparse.Namespace) -> FakeUpstreamConfig:
+    return FakeUpstreamConfig(
+        videos=args.videos,
+        topics=args.topics,
+        latency=args.latency,
+        source_latency={source: getattr(args, f"{source}_latency") for source in SOURCES},
+        rate_limit_rate=args.rate_limit_rate,
+        error_rate=args.error_rate,
+        retry_after=args.retry_after,
+        seed=args.seed
+    )
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake YouTube, Discourse and Trends endpoints for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
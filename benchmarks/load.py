@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""Collector load test against benchmarks/fake_upstream.py
+
+Runs each collector's stream() to completion at several concurrency
+settings and reports throughput and upstream latency percentiles:
+
+    python -m benchmarks.load --concurrency 2,4,8,16 --latency lognormal:80:0.6 --rate-limit-rate 0.02
+    python -m benchmarks.load --upstream http://127.0.0.1:8900 --platforms Forum --output load.json
+
+Starts the fake server on a free port unless --upstream is given. The
+collectors run with the response cache off and the real quota planner
+given an unlimited budget, so every keyword is searched.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import httpx
+from benchmarks.fake_upstream import add_arguments
+
+logger = logging.getLogger(__name__)
+
+PLATFORMS = ["YouTube", "Forum", "Google"]
+
+def configure_collectors(upstream: str, trends_delay: float):
+    """Point the collectors at the fake server; read when they are imported"""
+    os.environ.update({
+        "YOUTUBE_API_BASE_URL": f"{upstream}/youtube/v3",
+        "FORUM_BASE_URL": f"{upstream}/forum",
+        "GOOGLE_TRENDS_BASE_URL": f"{upstream}/trends",
+        "YOUTUBE_API_KEY": "load-test",
+        "COLLECTOR_CACHE_MODE": "off",
+        "GOOGLE_TRENDS_MIN_DELAY": str(trends_delay),
+        "GOOGLE_TRENDS_MAX_DELAY": str(trends_delay),
+    })
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(args: argparse.Namespace) -> subprocess.Popen:
+    """Run the fake upstream in its own process, so it does not share our event loop"""
+    command = [sys.executable, "-m", "benchmarks.fake_upstream", "--port", str(args.port),
+               "--videos", str(args.videos), "--topics", str(args.topics), "--latency", args.latency,
+               "--rate-limit-rate", str(args.rate_limit_rate), "--error-rate", str(args.error_rate),
+               "--retry-after", str(args.retry_after), "--seed", str(args.seed)]
+    for source in ["youtube", "forum", "trends"]:
+        if getattr(args, f"{source}_latency"):
+            command += [f"--{source}-latency", getattr(args, f"{source}_latency")]
+    server = subprocess.Popen(command, cwd=project_root)
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{args.port}/stats", timeout=1.0)
+            return server
+        except httpx.HTTPError:
+            if server.poll() is not None:
+                raise RuntimeError("Fake upstream server exited")
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("Fake upstream server did not start")
+
+class RequestTimer:
+    """Upstream request latencies and error responses seen by one collector"""
+
+    def __init__(self):
+        self.samples: List[float] = []
+        self.errors = 0
+
+    def hook(self, client: httpx.AsyncClient):
+        """Time every request of an httpx client, from send to response headers"""
+
+        async def on_request(request: httpx.Request):
+            request.extensions["load_started"] = time.perf_counter()
+
+        async def on_response(response: httpx.Response):
+            self.samples.append(time.perf_counter() - response.request.extensions["load_started"])
+            if response.is_error:
+                self.errors += 1
+
+        client.event_hooks["request"].append(on_request)
+        client.event_hooks["response"].append(on_response)
+
+    def wrap(self, fetch: Callable) -> Callable:
+        """Time a blocking fetch function; exceptions count as errors"""
+
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fetch(*args, **kwargs)
+            except Exception:
+                self.errors += 1
+                raise
+            finally:
+                self.samples.append(time.perf_counter() - started)
+
+        return timed
+
+    def percentile(self, fraction: float) -> float:
+        """Nearest-rank percentile in milliseconds"""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(int(fraction * len(ordered)), len(ordered) - 1)
+        return round(ordered[index] * 1000, 1)
+
+def build_collector(platform: str, concurrency: int, forum_pages: int, state_dir: str, timer: RequestTimer):
+    from collectors.youtube import YouTubeCollector
+    from collectors.forum import ForumCollector
+    from collectors.google import GoogleCollector
+    from collectors.planner import KeywordPlanner
+
+    if platform == "YouTube":
+        os.environ["YOUTUBE_MAX_CONCURRENCY"] = str(concurrency)
+        collector = YouTubeCollector()
+        # A fresh, unlimited plan: every keyword in every region
+        collector.planner = KeywordPlanner(os.path.join(state_dir, f"planner-{concurrency}.json"),
+                                           daily_quota=10**9, run_quota=10**9)
+        timer.hook(collector.youtube.client)
+    elif platform == "Forum":
+        collector = ForumCollector(max_concurrency=concurrency, pages=forum_pages)
+        timer.hook(collector.client)
+    else:
+        collector = GoogleCollector(workers=concurrency)
+        collector.fetch = timer.wrap(collector.fetch)
+    return collector
+
+async def measure(platform: str, concurrency: int, args: argparse.Namespace, state_dir: str) -> Dict:
+    timer = RequestTimer()
+    collector = build_collector(platform, concurrency, args.forum_pages, state_dir, timer)
+    items = 0
+    started = time.perf_counter()
+    try:
+        async for batch in collector.stream():
+            items += len(batch)
+    finally:
+        elapsed = time.perf_counter() - started
+        await collector.close()
+
+    requests = len(timer.samples)
+    return {
+        "platform": platform,
+        "concurrency": concurrency,
+        "items": items,
+        "requests": requests,
+        "errors": timer.errors,
+        "seconds": round(elapsed, 2),
+        "items_per_second": round(items / elapsed, 1) if elapsed else 0.0,
+        "requests_per_second": round(requests / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": timer.percentile(0.50),
+        "p95_ms": timer.percentile(0.95),
+        "p99_ms": timer.percentile(0.99),
+        "max_ms": round(max(timer.samples, default=0) * 1000, 1)
+    }
+
+async def run(args: argparse.Namespace) -> List[Dict]:
+    results = []
+    with tempfile.TemporaryDirectory() as state_dir:
+        for platform in args.platforms:
+            for concurrency in args.concurrency:
+                result = await measure(platform, concurrency, args, state_dir)
+                logger.info(f"{platform} x{concurrency}: {result['requests_per_second']} req/s, "
+                            f"p99 {result['p99_ms']}ms")
+                results.append(result)
+    return results
+
+def print_table(results: List[Dict]):
+    columns = ["platform", "concurrency", "items", "requests", "errors", "seconds",
+               "items_per_second", "requests_per_second", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+    widths = {column: max(len(column), *(len(str(result[column])) for result in results)) for column in columns}
+    print("  ".join(column.rjust(widths[column]) for column in columns))
+    for result in results:
+        print("  ".join(str(result[column]).rjust(widths[column]) for column in columns))
+
+def main():
+    parser = argparse.ArgumentParser(description="Collector throughput and tail latency against a fake upstream")
+    parser.add_argument("--concurrency", type=lambda value: [int(n) for n in value.split(",")], default=[2, 4, 8, 16],
+                        help="Comma-separated concurrency settings (default 2,4,8,16)")
+    parser.add_argument("--platforms", type=lambda value: value.split(","), default=PLATFORMS,
+                        help="Comma-separated collectors (default YouTube,Forum,Google)")
+    parser.add_argument("--forum-pages", type=int, default=10, help="Forum listing pages per run (default 10)")
+    parser.add_argument("--trends-delay", type=float, default=0.0,
+                        help="Pause per Trends session after each request (collector default 2-4s)")
+    parser.add_argument("--upstream", default=None, help="URL of a running fake_upstream; default: start one")
+    parser.add_argument("--port", type=int, default=None, help="Port for the started server (default: a free one)")
+    parser.add_argument("--output", default=None, help="Also write the results as JSON")
+    add_arguments(parser)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    # The collectors' own logs would drown the results
+    logging.getLogger("collectors").setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    server = None
+    if args.upstream is None:
+        args.port = args.port or free_port()
+        server = start_server(args)
+        args.upstream = f"http://127.0.0.1:{args.port}"
+    configure_collectors(args.upstream.rstrip("/"), args.trends_delay)
+
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print_table(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""Offline pipeline benchmarks against SQLite or a local Postgres
+
+    python -m benchmarks.run run --sizes 1000,10000 --output base.json
+    python -m benchmarks.run compare base.json head.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from db.models import Base
+from services.records import WorkflowRecord
+from services.scoring import WorkflowScorer
+from services.normalizer import WorkflowNormalizer
+from services.storage import upsert_workflows
+from services.stats import refresh_stats
+from services.orchestrator import run_pipeline
+from benchmarks.workload import WorkloadGenerator, DEFAULT_PLATFORM_MIX, stub_collectors
+
+logger = logging.getLogger(__name__)
+
+RESULTS_VERSION = 1
+
+class StageTimer:
+    """Wall time and tracemalloc peak of each named stage"""
+
+    def __init__(self, trace_memory: bool = True):
+        self.trace_memory = trace_memory
+        self.stages: Dict[str, Dict] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            result = {"seconds": round(time.perf_counter() - started, 4)}
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                result["peak_mb"] = round((peak - baseline) / 2**20, 2)
+            self.stages[name] = result
+            logger.info(f"{name}: {result}")
+
+async def reset_schema(engine):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+async def bench_size(engine, size: int, args) -> Dict:
+    """Run every stage once for a workload of size items"""
+    Session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    timer = StageTimer(trace_memory=not args.no_memory)
+    generator = WorkloadGenerator(size, args.duplicate_ratio, args.platform_mix, args.seed)
+
+    with timer.stage("generate"):
+        workload = generator.generate()
+    # Collector dicts to the records the pipeline works on
+    with timer.stage("records"):
+        items = [WorkflowRecord.from_dict(item) for platform_items in workload.values() for item in platform_items]
+
+    with timer.stage("score"):
+        WorkflowScorer.score_workflows(items)
+
+    dedup_stats: Dict = {}
+    with timer.stage("dedup"):
+        unique = WorkflowNormalizer.deduplicate_workflows(items, stats=dedup_stats)
+
+    await reset_schema(engine)
+    async with Session() as session:
+        with timer.stage("store_insert"):
+            counts = await upsert_workflows(session, unique)
+            await refresh_stats(session)
+            await session.commit()
+        with timer.stage("store_update"):
+            await upsert_workflows(session, unique)
+            await refresh_stats(session)
+            await session.commit()
+
+    # End to end through the orchestrator with stub collectors
+    await reset_schema(engine)
+    async with Session() as session:
+        with timer.stage("pipeline"):
+            pipeline = await run_pipeline(session, force=True, collectors=stub_collectors(workload))
+        # Same data again: change detection should skip everything
+        with timer.stage("pipeline_unchanged"):
+            await run_pipeline(session, collectors=stub_collectors(workload))
+
+    return {
+        "size": size,
+        "stages": timer.stages,
+        "counts": {
+            "collected": len(items),
+            "unique": len(unique),
+            "inserted": counts["inserted"],
+            "pipeline_stored": pipeline["stored"],
+            "pipeline_first_write_seconds": pipeline.get("first_write_seconds"),
+            "pipeline_errors": len(pipeline["errors"])
+        },
+        "dedup": dedup_stats
+    }
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=project_root,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+async def run(args) -> Dict:
+    database_url = args.database_url
+    if not database_url:
+        database_url = f"sqlite+aiosqlite:///{Path(tempfile.mkdtemp()) / 'benchmark.db'}"
+    engine = create_async_engine(database_url, echo=False)
+
+    if not args.no_memory:
+        tracemalloc.start()
+    try:
+        runs = [await bench_size(engine, size, args) for size in args.sizes]
+    finally:
+        if not args.no_memory:
+            tracemalloc.stop()
+        await engine.dispose()
+
+    return {
+        "version": RESULTS_VERSION,
+        "revision": git_revision(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "database": engine.dialect.name,
+        "params": {
+            "duplicate_ratio": args.duplicate_ratio,
+            "platform_mix": args.platform_mix,
+            "seed": args.seed,
+            "trace_memory": not args.no_memory
+        },
+        # ru_maxrss is in KiB on Linux
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2),
+        "runs": runs
+    }
+
+def compare(base: Dict, head: Dict, threshold: float) -> List[str]:
+    """Print per-stage deltas and return the stages slower than threshold"""
+    if base.get("params") != head.get("params"):
+        print(f"warning: params differ: {base.get('params')} vs {head.get('params')}")
+
+    regressions = []
+    head_runs = {run["size"]: run for run in head["runs"]}
+    print(f"{'size':>9} {'stage':<18} {base['revision']:>10} {head['revision']:>10} {'change':>8}")
+    for base_run in base["runs"]:
+        head_run = head_runs.get(base_run["size"])
+        if head_run is None:
+            continue
+        for stage, before in base_run["stages"].items():
+            after = head_run["stages"].get(stage)
+            if after is None:
+                continue
+            change = (after["seconds"] - before["seconds"]) / before["seconds"] if before["seconds"] else 0.0
+            print(f"{base_run['size']:>9} {stage:<18} {before['seconds']:>10.4f} {after['seconds']:>10.4f} {change:>+8.1%}")
+            if change > threshold:
+                regressions.append(f"{base_run['size']}/{stage}")
+    return regressions
+
+def parse_sizes(value: str) -> List[int]:
+    return [int(size) for size in value.split(",")]
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, weight = part.split("=")
+        mix[name.strip()] = float(weight)
+    return mix
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the benchmarks and write JSON results")
+    run_parser.add_argument("--sizes", type=parse_sizes, default=[1000, 10000],
+                            help="Comma-separated workload sizes (default 1000,10000)")
+    run_parser.add_argument("--duplicate-ratio", type=float, default=0.3)
+    run_parser.add_argument("--platform-mix", type=parse_mix, default=DEFAULT_PLATFORM_MIX,
+                            help="e.g. YouTube=0.5,Forum=0.3,Google=0.2")
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--database-url", default=None,
+                            help="Throwaway database; its tables are dropped. Default: temporary SQLite file")
+    run_parser.add_argument("--no-memory", action="store_true",
+                            help="Skip tracemalloc, which slows allocation-heavy stages")
+    run_parser.add_argument("--output", default="benchmark_results.json")
+
+    compare_parser = commands.add_parser("compare", help="Compare two result files")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("head")
+    compare_parser.add_argument("--threshold", type=float, default=0.2,
+                                help="Exit non-zero when a stage is this much slower (default 0.2)")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.command == "run" else logging.WARNING)
+
+    if args.command == "run":
+        results = asyncio.run(run(args))
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        logger.info(f"Wrote {args.output}")
+    else:
+        with open(args.base) as f:
+            base = json.load(f)
+        with open(args.head) as f:
+            head = json.load(f)
+        regressions = compare(base, head, args.threshold)
+        if regressions:
+            print(f"Slower than {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
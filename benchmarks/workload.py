@@ -0,0 +1,160 @@
+import json
+import random
+import asyncio
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, List, Optional
+from services.records import WorkflowRecord
+
+SEED_FILE = Path(__file__).parent.parent / "seed_data.json"
+
+DEFAULT_PLATFORM_MIX = {"YouTube": 0.5, "Forum": 0.3, "Google": 0.2}
+COUNTRIES = ["US", "IN"]
+
+# Title shapes seen in seed_data.json ("Slack → Notion Integration")
+SUFFIXES = ["Automation", "Integration", "Sync", "Notifications", "Alerts", "Monitoring", "Workflow"]
+
+# Rephrasings applied to an earlier name to make a near-duplicate
+VARIANTS: List[Callable[[str], str]] = [
+    lambda name: name.replace(" → ", " to "),
+    lambda name: name.lower(),
+    lambda name: f"n8n {name}",
+    lambda name: f"{name} Tutorial",
+    lambda name: name.replace(" → ", " + "),
+    lambda name: name.upper(),
+]
+
+def seed_services() -> List[str]:
+    """Service names used in seed_data.json workflow titles"""
+    with open(SEED_FILE, "r") as f:
+        names = [item["workflow"] for item in json.load(f)]
+
+    services = set()
+    for name in names:
+        for part in name.split(" → "):
+            words = part.split()
+            if len(words) > 1 and words[-1] in SUFFIXES:
+                words = words[:-1]
+            services.add(" ".join(words))
+    return sorted(services)
+
+class WorkloadGenerator:
+    """Synthetic collector output modelled on seed_data.json
+
+    size items are split across platforms by platform_mix; duplicate_ratio
+    of them are rephrasings of an earlier name, so deduplication has real
+    clusters to find. Output is deterministic for a given seed.
+    """
+
+    def __init__(self, size: int, duplicate_ratio: float = 0.3,
+                 platform_mix: Optional[Dict[str, float]] = None, seed: int = 42):
+        if not 0 <= duplicate_ratio < 1:
+            raise ValueError("duplicate_ratio must be in [0, 1)")
+        self.size = size
+        self.duplicate_ratio = duplicate_ratio
+        self.platform_mix = platform_mix or DEFAULT_PLATFORM_MIX
+        self.seed = seed
+        self.services = seed_services()
+
+    def names(self, rng: random.Random) -> List[str]:
+        names: List[str] = []
+        for _ in range(self.size):
+            if names and rng.random() < self.duplicate_ratio:
+                names.append(rng.choice(VARIANTS)(rng.choice(names)))
+                continue
+            chain = rng.sample(self.services, rng.choice([1, 2, 2, 2, 3]))
+            names.append(f"{' → '.join(chain)} {rng.choice(SUFFIXES)}")
+        return names
+
+    def generate(self) -> Dict[str, List[Dict]]:
+        """Collector-shaped workflow dicts keyed by platform"""
+        rng = random.Random(self.seed)
+        platforms = list(self.platform_mix)
+        weights = [self.platform_mix[platform] for platform in platforms]
+
+        output: Dict[str, List[Dict]] = {platform: [] for platform in platforms}
+        for index, name in enumerate(self.names(rng)):
+            platform = rng.choices(platforms, weights)[0]
+            country = rng.choice(COUNTRIES)
+            output[platform].append(self.item(rng, platform, index, name, country))
+        return output
+
+    @staticmethod
+    def item(rng: random.Random, platform: str, index: int, name: str, country: str) -> Dict:
+        if platform == "YouTube":
+            views = int(rng.lognormvariate(9, 1.5))
+            likes = int(views * rng.uniform(0.005, 0.08))
+            comments = int(views * rng.uniform(0.0005, 0.01))
+            return {
+                "id": f"bench{index}",
+                "title": name,
+                "description": f"How to build {name} in n8n",
+                "url": f"https://www.youtube.com/watch?v=bench{index}",
+                "views": views,
+                "likes": likes,
+                "comments": comments,
+                "like_to_view_ratio": likes / views if views > 0 else 0,
+                "comment_to_view_ratio": comments / views if views > 0 else 0,
+                "platform": "YouTube",
+                "country": country,
+                "workflow": name
+            }
+        if platform == "Forum":
+            replies = int(rng.lognormvariate(2, 1))
+            return {
+                "id": index,
+                "title": name,
+                "slug": name.lower().replace(" ", "-"),
+                "url": f"https://community.n8n.io/t/bench/{index}",
+                "views": int(rng.lognormvariate(6, 1.2)),
+                "replies": replies,
+                "likes": int(rng.lognormvariate(1.5, 1)),
+                "posts_count": replies + 1,
+                "created_at": "2024-01-01T00:00:00.000Z",
+                "contributors": rng.randint(1, max(1, replies)),
+                "tags": [],
+                "platform": "Forum",
+                "country": country,
+                "workflow": name
+            }
+        avg_interest = rng.uniform(1, 100)
+        return {
+            "platform": "Google",
+            "country": country,
+            "workflow": name,
+            "keyword": name.lower(),
+            "search_volume": int(avg_interest * 1000),
+            "trend_change_60d": rng.uniform(-50, 150),
+            "avg_interest": avg_interest,
+            "views": int(avg_interest * 1000),
+            "url": f"https://trends.google.com/trends/explore?q={name.replace(' ', '%20')}"
+        }
+
+# Items per yielded batch, about one search result page
+STUB_BATCH_SIZE = 50
+
+class StubCollector:
+    """Offline stand-in for a platform collector, serving pregenerated items"""
+
+    def __init__(self, items: List[Dict], batch_size: int = STUB_BATCH_SIZE):
+        self.items = items
+        self.batch_size = batch_size
+
+    async def stream(self) -> AsyncIterator[List[WorkflowRecord]]:
+        for start in range(0, len(self.items), self.batch_size):
+            # Fresh records, as a collector builds them; scoring writes into them
+            yield [WorkflowRecord.from_dict(item) for item in self.items[start:start + self.batch_size]]
+            # Let the other pipeline stages run, as network waits would
+            await asyncio.sleep(0)
+
+    async def collect_all(self) -> List[WorkflowRecord]:
+        return [item async for batch in self.stream() for item in batch]
+
+    def stats(self) -> Dict:
+        return {"items": len(self.items)}
+
+def stub_collectors(workload: Dict[str, List[Dict]]) -> Dict[str, Callable]:
+    """Collector factories for run_pipeline(collectors=...)"""
+    return {
+        platform: (lambda items=items: StubCollector(items))
+        for platform, items in workload.items()
+    }
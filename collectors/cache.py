@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Directory for the collectors' response cache and planner state
+COLLECTOR_CACHE_DIR = os.getenv("COLLECTOR_CACHE_DIR", os.path.join(tempfile.gettempdir(), "n8n-collector-cache"))
+
+# How collectors use cached responses:
+#   off    - always call the upstream APIs, store nothing
+#   cache  - store every response, reuse those younger than the source's TTL
+#   replay - serve every request from the cache whatever its age, never
+#            touch the network; a request that was never cached fails
+CACHE_MODES = ["off", "cache", "replay"]
+COLLECTOR_CACHE_MODE = os.getenv("COLLECTOR_CACHE_MODE", "cache")
+
+# Least recently used responses are evicted beyond this size
+COLLECTOR_CACHE_MAX_MB = float(os.getenv("COLLECTOR_CACHE_MAX_MB", "256"))
+
+# Evicting leaves the cache this fraction of its maximum size
+EVICTION_TARGET = 0.9
+
+# Seconds to wait for another process's write; a locked cache costs a miss
+CACHE_BUSY_TIMEOUT = 5.0
+
+class CacheMiss(Exception):
+    """Replay mode found no cached response for a request"""
+
+class ResponseStore:
+    """SQLite file holding every collector's cached responses
+
+    Entries are kept past their TTL, so replay can rerun a pipeline on the
+    inputs of an earlier run; only the size limit removes them. One store
+    is shared per process, SQLite handles access from other processes.
+    Calls block on file I/O; async code goes through ResponseCache, which
+    runs them in worker threads.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.connection: Optional[sqlite3.Connection] = None
+        # Bytes stored, summed once on connect and kept up to date by set();
+        # eviction re-sums, to count other processes' writes
+        self.total = 0
+
+    def connect(self) -> sqlite3.Connection:
+        if self.connection is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None,
+                                         timeout=CACHE_BUSY_TIMEOUT)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, request TEXT NOT NULL, value TEXT NOT NULL, "
+                "size INTEGER NOT NULL, stored_at REAL NOT NULL, accessed_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS ix_responses_accessed ON responses (accessed_at)")
+            self.total = self.stored_bytes(connection)
+            self.connection = connection
+        return self.connection
+
+    def get(self, namespace: str, key: str) -> Optional[Tuple[str, float]]:
+        """(value JSON, stored_at) of an entry, marking it recently used"""
+        with self.lock:
+            connection = self.connect()
+            row = connection.execute(
+                "SELECT value, stored_at FROM responses WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE responses SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                    (time.time(), namespace, key)
+                )
+            return row
+
+    def set(self, namespace: str, key: str, request: str, value: str):
+        now = time.time()
+        with self.lock:
+            connection = self.connect()
+            replaced = connection.execute(
+                "SELECT size FROM responses WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (namespace, key, request, value, len(value), now, now)
+            )
+            self.total += len(value) - (replaced[0] if replaced else 0)
+            if self.total > self.max_bytes:
+                self.evict(connection)
+
+    @staticmethod
+    def stored_bytes(connection: sqlite3.Connection) -> int:
+        return connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def evict(self, connection: sqlite3.Connection):
+        """Drop least recently used entries while over the size limit"""
+        total = self.stored_bytes(connection)
+        self.total = total
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * EVICTION_TARGET
+        evicted = 0
+        for namespace, key, size in connection.execute(
+            "SELECT namespace, key, size FROM responses ORDER BY accessed_at"
+        ).fetchall():
+            if total <= target:
+                break
+            connection.execute("DELETE FROM responses WHERE namespace = ? AND key = ?", (namespace, key))
+            total -= size
+            evicted += 1
+        self.total = total
+        logger.info(f"Evicted {evicted} cached responses, {total / 1e6:.1f} MB left")
+
+    def requests(self, namespace: str) -> List[Any]:
+        """Request parts of every entry in a namespace, oldest first"""
+        with self.lock:
+            rows = self.connect().execute(
+                "SELECT request FROM responses WHERE namespace = ? ORDER BY stored_at, rowid", (namespace,)
+            ).fetchall()
+        return [json.loads(request) for request, in rows]
+
+    def stats(self) -> Dict:
+        with self.lock:
+            rows = self.connect().execute(
+                "SELECT namespace, COUNT(*), COALESCE(SUM(size), 0) FROM responses GROUP BY namespace"
+            ).fetchall()
+        return {namespace: {"entries": count, "bytes": size} for namespace, count, size in rows}
+
+_stores: Dict[str, ResponseStore] = {}
+
+def response_store(directory: str = COLLECTOR_CACHE_DIR) -> ResponseStore:
+    """The process-wide store for a cache directory"""
+    if directory not in _stores:
+        _stores[directory] = ResponseStore(os.path.join(directory, "responses.db"),
+                                           int(COLLECTOR_CACHE_MAX_MB * 1024 * 1024))
+    return _stores[directory]
+
+class ResponseCache:
+    """One source's view of the response store
+
+    Keys are built from the request parameters, so identical requests in
+    later runs (or other processes) are served from disk while younger than
+    ttl seconds. With a ttl of 0 responses are still stored, for replay,
+    but never reused.
+    """
+
+    def __init__(self, namespace: str, ttl: float, mode: str = COLLECTOR_CACHE_MODE,
+                 directory: str = COLLECTOR_CACHE_DIR):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Cache mode must be one of {CACHE_MODES}")
+        self.namespace = namespace
+        self.ttl = ttl
+        self.mode = mode
+        self.store = response_store(directory)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def replay(self) -> bool:
+        return self.mode == "replay"
+
+    @property
+    def serving(self) -> bool:
+        return self.replay or (self.mode == "cache" and self.ttl > 0)
+
+    @staticmethod
+    def key(*parts: Any) -> str:
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+    async def get(self, *parts: Any) -> Optional[Any]:
+        """Cached value for the request, or None if missing or expired
+
+        In replay mode any cached value is returned and a missing one
+        raises CacheMiss. The store is read in a worker thread, so a slow
+        or locked cache file does not stall the event loop.
+        """
+        if not self.serving:
+            return None
+        try:
+            row = await asyncio.to_thread(self.store.get, self.namespace, self.key(*parts))
+        except sqlite3.Error as e:
+            logger.warning(f"Could not read cached {self.namespace} response: {e}")
+            row = None
+        if row is None or (not self.replay and time.time() - row[1] > self.ttl):
+            self.misses += 1
+            if self.replay:
+                raise CacheMiss(f"No cached {self.namespace} response for {parts}")
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    async def set(self, value: Any, *parts: Any):
+        """Store a fetched value, in a worker thread; storage errors only cost the cache"""
+        if self.mode != "cache":
+            return
+        try:
+            await asyncio.to_thread(self.store.set, self.namespace, self.key(*parts), json.dumps(parts),
+                                    json.dumps(value))
+        except sqlite3.Error as e:
+            logger.warning(f"Could not cache {self.namespace} response: {e}")
+
+    def requests(self) -> List[Any]:
+        """Request parts of this source's cached responses, oldest first"""
+        return self.store.requests(self.namespace)
+
+    def stats(self) -> Dict:
+        return {"mode": self.mode, "hits": self.hits, "misses": self.misses}
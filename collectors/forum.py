@@ -1,25 +1,131 @@
+import os
+import time
 import asyncio
 import logging
-from typing import List, Dict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, List, Dict, Optional
 import httpx
+from collectors.cache import ResponseCache
+from services.integrations import find_integrations, integration_label
+from services.metrics import record_upstream
+from services.records import WorkflowRecord
 
 logger = logging.getLogger(__name__)
 
+# Overridable to point the collector at a stand-in, e.g. benchmarks/fake_upstream.py
+FORUM_BASE_URL = os.getenv("FORUM_BASE_URL", "https://community.n8n.io")
+
+# Seconds a Discourse response is reused instead of fetched again, 0 always fetches
+FORUM_CACHE_TTL = float(os.getenv("FORUM_CACHE_TTL", "900"))
+
+# Longest wait honoured from a 429's Retry-After, in seconds
+FORUM_MAX_RETRY_AFTER = float(os.getenv("FORUM_MAX_RETRY_AFTER", "60"))
+
+def retry_after_seconds(value: Optional[str], default: float = 1.0) -> float:
+    """Delay from a Retry-After header, delay-seconds or HTTP-date, clamped to FORUM_MAX_RETRY_AFTER"""
+    if not value:
+        return default
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return default
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        delay = (retry_at - datetime.now(timezone.utc)).total_seconds()
+    return min(max(delay, 0.0), FORUM_MAX_RETRY_AFTER)
+
 class ForumCollector:
-    def __init__(self):
-        self.base_url = "https://community.n8n.io"
-        self.client = httpx.AsyncClient(timeout=30.0)
+    def __init__(self, max_concurrency: Optional[int] = None, pages: int = 3, base_url: str = FORUM_BASE_URL):
+        self.base_url = base_url
+        self.pages = pages
+        self.max_concurrency = max_concurrency or int(os.getenv("FORUM_MAX_CONCURRENCY", "6"))
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        # One shared HTTP/2-capable client; the pool is sized to the
+        # concurrency cap so detail fetches reuse warm connections
+        self.client = httpx.AsyncClient(
+            timeout=30.0,
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+                keepalive_expiry=30.0
+            )
+        )
+        self.cache = ResponseCache("forum", FORUM_CACHE_TTL)
+        self.request_count = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        
+    async def fetch(self, url: str, params: Optional[Dict] = None) -> Dict:
+        """GET a Discourse JSON endpoint through the response cache
+        
+        When replaying, an uncached request raises CacheMiss instead.
+        """
+        cached = await self.cache.get(url, params)
+        if cached is not None:
+            return cached
+        data = await self.get_json(url, params)
+        await self.cache.set(data, url, params)
+        return data
+        
+    async def get_json(self, url: str, params: Optional[Dict] = None) -> Dict:
+        """GET a Discourse JSON endpoint under the concurrency cap
+        
+        429 responses are retried after the server's Retry-After delay, at
+        most FORUM_MAX_RETRY_AFTER seconds.
+        """
+        # "/t/123.json" and "/t/456.json" are one endpoint in the metrics
+        endpoint = "latest" if url.endswith("/latest.json") else "topic"
+        for attempt in range(3):
+            async with self.semaphore:
+                self.request_count += 1
+                started = time.perf_counter()
+                try:
+                    response = await self.client.get(url, params=params)
+                except httpx.HTTPError as e:
+                    record_upstream("Forum", endpoint, time.perf_counter() - started, type(e).__name__)
+                    raise
+                record_upstream("Forum", endpoint, time.perf_counter() - started,
+                                str(response.status_code) if response.is_error else "")
+                
+            if response.status_code != 429 or attempt == 2:
+                break
+            retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+            logger.warning(f"Forum rate limited, retrying {url} in {retry_after}s")
+            await asyncio.sleep(retry_after)
+            
+        response.raise_for_status()
+        return response.json()
+    
+    @property
+    def requests_per_second(self) -> float:
+        """Achieved request rate of the last collection"""
+        if self.started_at is None:
+            return 0.0
+        elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        return self.request_count / elapsed if elapsed > 0 else 0.0
+    
+    def stats(self) -> Dict:
+        """Request counters for tuning FORUM_MAX_CONCURRENCY"""
+        return {
+            "requests": self.request_count,
+            "max_concurrency": self.max_concurrency,
+            "requests_per_second": round(self.requests_per_second, 2),
+            "cache": self.cache.stats()
+        }
         
-    async def get_topics(self, page: int = 0) -> List[Dict]:
+    async def get_topics(self, page: int = 0) -> List[WorkflowRecord]:
         """Get topics from n8n forum using Discourse API"""
         try:
             url = f"{self.base_url}/latest.json"
             params = {"page": page}
             
-            response = await self.client.get(url, params=params)
-            response.raise_for_status()
-            
-            data = response.json()
+            data = await self.fetch(url, params=params)
             topics = []
             
             for topic in data.get("topic_list", {}).get("topics", []):
@@ -28,23 +134,21 @@ class ForumCollector:
                 workflow_keywords = ["workflow", "automation", "integration", "connect", "sync"]
                 
                 if any(keyword in title for keyword in workflow_keywords):
-                    topic_data = {
-                        "id": topic["id"],
-                        "title": topic["title"],
-                        "slug": topic.get("slug", ""),
-                        "url": f"{self.base_url}/t/{topic.get('slug', '')}/{topic['id']}",
-                        "views": topic.get("views", 0),
-                        "replies": topic.get("reply_count", 0),
-                        "likes": topic.get("like_count", 0),
-                        "posts_count": topic.get("posts_count", 0),
-                        "created_at": topic.get("created_at"),
-                        "platform": "Forum",
-                        "country": self.infer_country(topic["title"]),
-                        "workflow": self.extract_workflow_name(topic["title"])
-                    }
-                    topics.append(topic_data)
+                    topics.append(WorkflowRecord(
+                        id=topic["id"],
+                        title=topic["title"],
+                        slug=topic.get("slug", ""),
+                        url=f"{self.base_url}/t/{topic.get('slug', '')}/{topic['id']}",
+                        views=topic.get("views", 0),
+                        replies=topic.get("reply_count", 0),
+                        likes=topic.get("like_count", 0),
+                        posts_count=topic.get("posts_count", 0),
+                        created_at=topic.get("created_at"),
+                        platform="Forum",
+                        country=self.infer_country(topic["title"]),
+                        workflow=self.extract_workflow_name(topic["title"])
+                    ))
                     
-            await asyncio.sleep(0.5)  # Rate limiting
             return topics
             
         except Exception as e:
@@ -55,10 +159,7 @@ class ForumCollector:
         """Get detailed topic information"""
         try:
             url = f"{self.base_url}/t/{topic_id}.json"
-            response = await self.client.get(url)
-            response.raise_for_status()
-            
-            data = response.json()
+            data = await self.fetch(url)
             
             # Count unique contributors
             user_ids = set()
@@ -95,45 +196,59 @@ class ForumCollector:
     
     def extract_workflow_name(self, title: str) -> str:
         """Extract workflow name from forum title"""
-        title_lower = title.lower()
-        
-        integrations = [
-            "google sheets", "slack", "discord", "notion", "airtable", "trello",
-            "gmail", "webhook", "api", "database", "mysql", "postgresql"
-        ]
-        
-        found = [i for i in integrations if i in title_lower]
+        found = [integration_label(name) for name in find_integrations(title)]
         
         if len(found) >= 2:
-            return f"{found[0].title()} → {found[1].title()} Integration"
+            return f"{found[0]} → {found[1]} Integration"
         elif len(found) == 1:
-            return f"{found[0].title()} Workflow"
+            return f"{found[0]} Workflow"
             
         # Fallback
         words = [w for w in title.split()[:3] if w.isalpha() and len(w) > 2]
         return " ".join(word.title() for word in words) or "n8n Workflow"
     
-    async def collect_all(self) -> List[Dict]:
-        """Collect all forum data"""
+    async def stream(self) -> AsyncIterator[List[WorkflowRecord]]:
+        """Yield each listing page's workflow topics once their details are in"""
         logger.info("Starting forum data collection")
         
-        all_topics = []
+        total = 0
+        self.request_count = 0
+        self.started_at = time.monotonic()
+        self.finished_at = None
         
-        # Get topics from first 3 pages
-        for page in range(3):
-            topics = await self.get_topics(page)
-            if not topics:
-                break
-                
-            for topic in topics:
+        # Get topics from the first pages; the next listing page is
+        # prefetched while details for the current one are in flight
+        next_page = asyncio.create_task(self.get_topics(0))
+        try:
+            for page in range(self.pages):
+                topics = await next_page
+                if not topics:
+                    break
+                    
+                if page + 1 < self.pages:
+                    next_page = asyncio.create_task(self.get_topics(page + 1))
+                    
                 # Get additional details for workflow topics
-                details = await self.get_topic_details(topic["id"])
-                topic.update(details)
-                all_topics.append(topic)
-                await asyncio.sleep(0.3)
-                
-        logger.info(f"Collected {len(all_topics)} forum topics")
-        return all_topics
+                details = await asyncio.gather(
+                    *(self.get_topic_details(topic.id) for topic in topics)
+                )
+                for topic, topic_details in zip(topics, details):
+                    topic.update(**topic_details)
+                total += len(topics)
+                yield topics
+        finally:
+            if not next_page.done():
+                next_page.cancel()
+            self.finished_at = time.monotonic()
+            
+        logger.info(
+            f"Collected {total} forum topics "
+            f"({self.request_count} requests, {self.requests_per_second:.1f} req/s)"
+        )
+    
+    async def collect_all(self) -> List[WorkflowRecord]:
+        """Collect all forum data"""
+        return [topic async for topics in self.stream() for topic in topics]
     
     async def close(self):
         """Close HTTP client"""
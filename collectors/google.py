@@ -1,15 +1,59 @@
+import os
+import time
 import asyncio
 import logging
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, List, Dict, Optional
+import httpx
 from pytrends.request import TrendReq
+from collectors.cache import CacheMiss, ResponseCache
+from services.integrations import find_integrations, integration_label
+from services.metrics import record_upstream
+from services.records import WorkflowRecord
 import random
 
 logger = logging.getLogger(__name__)
 
+# Independent TrendReq sessions (and threads) fetching batches concurrently
+GOOGLE_TRENDS_WORKERS = int(os.getenv("GOOGLE_TRENDS_WORKERS", "3"))
+
+# Keyword included in every batch; each batch is rescaled so this keyword
+# matches its level in the first batch, making all batches comparable
+GOOGLE_TRENDS_ANCHOR = os.getenv("GOOGLE_TRENDS_ANCHOR", "n8n workflow")
+
+# Seconds a fetched batch is reused from the response cache, 0 always refetches
+GOOGLE_TRENDS_CACHE_TTL = float(os.getenv("GOOGLE_TRENDS_CACHE_TTL", "43200"))
+
+# Seconds each session pauses after a request, drawn uniformly from this range
+GOOGLE_TRENDS_MIN_DELAY = float(os.getenv("GOOGLE_TRENDS_MIN_DELAY", "2"))
+GOOGLE_TRENDS_MAX_DELAY = float(os.getenv("GOOGLE_TRENDS_MAX_DELAY", "4"))
+
+# Trends-like JSON feed used instead of Google Trends when set, e.g.
+# benchmarks/fake_upstream.py; pytrends' endpoints cannot be redirected
+GOOGLE_TRENDS_BASE_URL = os.getenv("GOOGLE_TRENDS_BASE_URL", "")
+
+TIMEFRAME = "today 3-m"
+GEOS = ["US", "IN"]
+
+# Google Trends compares at most 5 keywords per request
+BATCH_SIZE = 5
+
 class GoogleCollector:
-    def __init__(self):
-        self.pytrends = TrendReq(hl='en-US', tz=360)
-        
+    def __init__(self, workers: int = GOOGLE_TRENDS_WORKERS, anchor: str = GOOGLE_TRENDS_ANCHOR,
+                 base_url: str = GOOGLE_TRENDS_BASE_URL):
+        self.workers = workers
+        self.anchor = anchor
+        self.base_url = base_url
+        self.fetch = self.fetch_feed if base_url else self.fetch_series
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="trends")
+        # One session per worker; each is created on first use, in its thread,
+        # since TrendReq fetches Google's cookies when constructed
+        self.sessions: asyncio.Queue = asyncio.Queue()
+        for _ in range(workers):
+            self.sessions.put_nowait(None)
+        self.cache = ResponseCache("google-trends", GOOGLE_TRENDS_CACHE_TTL)
+        self.request_count = 0
+
     def get_workflow_keywords(self) -> List[str]:
         """Get n8n workflow keywords for trends"""
         return [
@@ -20,95 +64,191 @@ class GoogleCollector:
             "salesforce n8n", "hubspot n8n", "stripe n8n",
             "shopify n8n", "wordpress n8n", "github n8n"
         ]
-    
-    async def get_interest_over_time(self, keywords: List[str], geo: str = "US") -> Dict:
-        """Get search interest data"""
+
+    def keyword_batches(self, keywords: List[str]) -> List[List[str]]:
+        """Split keywords into request batches, each led by the anchor keyword"""
+        others = [keyword for keyword in keywords if keyword != self.anchor]
+        size = BATCH_SIZE - 1
+        return [[self.anchor] + others[i:i + size] for i in range(0, len(others), size)]
+
+    @staticmethod
+    def fetch_series(session: Optional[TrendReq], keywords: List[str], geo: str):
+        """Blocking Trends request; returns the session and {keyword: weekly values}"""
+        if session is None:
+            session = TrendReq(hl='en-US', tz=360)
+        session.build_payload(keywords, cat=0, timeframe=TIMEFRAME, geo=geo, gprop='')
+        interest_data = session.interest_over_time()
+        if interest_data.empty:
+            return session, {}
+        return session, {
+            keyword: [float(value) for value in interest_data[keyword].values]
+            for keyword in keywords if keyword in interest_data.columns
+        }
+
+    def fetch_feed(self, session: Optional[httpx.Client], keywords: List[str], geo: str):
+        """Blocking request to the Trends-like feed at base_url, same result as fetch_series"""
+        if session is None:
+            session = httpx.Client(base_url=self.base_url, timeout=30.0)
+        response = session.get("/interest_over_time", params={"keyword": keywords, "geo": geo, "timeframe": TIMEFRAME})
+        response.raise_for_status()
+        return session, response.json()
+
+    async def get_interest_over_time(self, keywords: List[str], geo: str = "US") -> Optional[Dict[str, List[float]]]:
+        """Get the weekly search interest of up to 5 keywords
+
+        Served from the response cache when the same batch was fetched
+        within GOOGLE_TRENDS_CACHE_TTL. Returns None if the request failed
+        (or, when replaying, was never cached).
+        """
+        keyword_batch = keywords[:BATCH_SIZE]
+        try:
+            cached = await self.cache.get(keyword_batch, geo, TIMEFRAME)
+        except CacheMiss as e:
+            logger.error(f"Google Trends replay: {e}")
+            return None
+        if cached is not None:
+            return cached
+
+        session = await self.sessions.get()
+        started = time.perf_counter()
         try:
-            # Limit to 5 keywords per request
-            keyword_batch = keywords[:5]
-            
-            await asyncio.to_thread(
-                self.pytrends.build_payload,
-                keyword_batch,
-                cat=0,
-                timeframe='today 3-m',
-                geo=geo,
-                gprop=''
+            self.request_count += 1
+            session, series = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.fetch, session, keyword_batch, geo
             )
-            
-            interest_data = await asyncio.to_thread(self.pytrends.interest_over_time)
-            
-            if interest_data.empty:
-                return {}
-                
-            results = {}
-            for keyword in keyword_batch:
-                if keyword in interest_data.columns:
-                    values = interest_data[keyword].values
-                    avg_interest = float(values.mean())
-                    
-                    # Calculate trend change
-                    if len(values) >= 4:
-                        recent_avg = values[-4:].mean()
-                        older_avg = values[:-4].mean() if len(values) > 4 else values.mean()
-                        trend_change = recent_avg - older_avg
-                    else:
-                        trend_change = 0
-                        
-                    results[keyword] = {
-                        "avg_interest": avg_interest,
-                        "trend_change_60d": float(trend_change),
-                        "search_volume": int(avg_interest * 1000),  # Estimated
-                        "max_interest": float(values.max())
-                    }
-                    
-            await asyncio.sleep(random.uniform(2, 4))  # Rate limiting
-            return results
-            
+            record_upstream("Google", "interest_over_time", time.perf_counter() - started)
+            await self.cache.set(series, keyword_batch, geo, TIMEFRAME)
+            # Rate limiting, per session
+            await asyncio.sleep(random.uniform(GOOGLE_TRENDS_MIN_DELAY, GOOGLE_TRENDS_MAX_DELAY))
+            return series
         except Exception as e:
+            record_upstream("Google", "interest_over_time", time.perf_counter() - started, type(e).__name__)
             logger.error(f"Error getting Google Trends data for {geo}: {e}")
-            return {}
-    
+            return None
+        finally:
+            self.sessions.put_nowait(session)
+
+    def rescale(self, batches: List[Dict[str, List[float]]], geo: str) -> List[Dict[str, List[float]]]:
+        """Put every batch on the scale of the first batch via the anchor keyword
+
+        Google normalizes each request to its own peak of 100; the anchor's
+        ratio between batches undoes that. Batches without anchor interest
+        cannot be related to the others and are dropped.
+        """
+        reference = None
+        rescaled = []
+        for series in batches:
+            anchor_mean = sum(series.get(self.anchor, [])) / max(len(series.get(self.anchor, [])), 1)
+            if anchor_mean <= 0:
+                if series:
+                    logger.warning(f"Dropping Google Trends batch {list(series)} for {geo}: no anchor interest")
+                continue
+            if reference is None:
+                reference = anchor_mean
+                rescaled.append(series)
+                continue
+            factor = reference / anchor_mean
+            # The anchor is only reported from the reference batch
+            rescaled.append({
+                keyword: [value * factor for value in values]
+                for keyword, values in series.items() if keyword != self.anchor
+            })
+        return rescaled
+
+    @staticmethod
+    def summarize(values: List[float]) -> Dict:
+        """Average, peak and recent change of a keyword's weekly interest"""
+        avg_interest = sum(values) / len(values)
+
+        # Calculate trend change
+        if len(values) >= 4:
+            recent_avg = sum(values[-4:]) / 4
+            older_avg = sum(values[:-4]) / len(values[:-4]) if len(values) > 4 else avg_interest
+            trend_change = recent_avg - older_avg
+        else:
+            trend_change = 0
+
+        return {
+            "avg_interest": avg_interest,
+            "trend_change_60d": float(trend_change),
+            "search_volume": int(avg_interest * 1000),  # Estimated
+            "max_interest": max(values)
+        }
+
     def extract_workflow_name(self, keyword: str) -> str:
         """Extract workflow name from keyword"""
         keyword_clean = keyword.lower().replace("n8n", "").strip()
-        
-        integrations = ["sheets", "slack", "discord", "notion", "gmail", "trello"]
-        found = [i for i in integrations if i in keyword_clean]
-        
+
+        found = [integration_label(name) for name in find_integrations(keyword_clean)]
+
         if found:
-            return f"{found[0].title()} Integration"
-            
+            return f"{found[0]} Integration"
+
         words = [w for w in keyword_clean.split() if w.isalpha() and len(w) > 2]
         return " ".join(word.title() for word in words[:2]) or "General Workflow"
-    
-    async def collect_all(self) -> List[Dict]:
-        """Collect all Google Trends data"""
+
+    async def stream(self) -> AsyncIterator[List[WorkflowRecord]]:
+        """Yield each region's entries once all its batches are fetched
+
+        Batches of both regions run concurrently across the worker sessions;
+        a region is yielded as soon as its batches can be rescaled together.
+        """
         logger.info("Starting Google Trends data collection")
-        
-        keywords = self.get_workflow_keywords()
-        all_data = []
-        
-        # Process for both US and India
-        for geo in ["US", "IN"]:
-            # Process in batches of 5
-            for i in range(0, min(len(keywords), 25), 5):
-                batch = keywords[i:i+5]
-                trends_data = await self.get_interest_over_time(batch, geo)
-                
-                for keyword, data in trends_data.items():
-                    workflow_data = {
-                        "platform": "Google",
-                        "country": geo,
-                        "workflow": self.extract_workflow_name(keyword),
-                        "keyword": keyword,
-                        "search_volume": data["search_volume"],
-                        "trend_change_60d": data["trend_change_60d"],
-                        "avg_interest": data["avg_interest"],
-                        "views": data["search_volume"],  # Use as views
-                        "url": f"https://trends.google.com/trends/explore?q={keyword.replace(' ', '%20')}"
-                    }
-                    all_data.append(workflow_data)
-                    
-        logger.info(f"Collected {len(all_data)} Google Trends entries")
-        return all_data
\ No newline at end of file
+
+        batches = self.keyword_batches(self.get_workflow_keywords())
+        tasks = {
+            geo: [asyncio.ensure_future(self.get_interest_over_time(batch, geo)) for batch in batches]
+            for geo in GEOS
+        }
+        total = 0
+
+        try:
+            for geo in GEOS:
+                fetched = [series for series in await asyncio.gather(*tasks[geo]) if series is not None]
+
+                entries = []
+                for series in self.rescale(fetched, geo):
+                    for keyword, values in series.items():
+                        if not values:
+                            continue
+                        data = self.summarize(values)
+                        entries.append(WorkflowRecord(
+                            platform="Google",
+                            country=geo,
+                            workflow=self.extract_workflow_name(keyword),
+                            keyword=keyword,
+                            search_volume=data["search_volume"],
+                            trend_change_60d=data["trend_change_60d"],
+                            avg_interest=data["avg_interest"],
+                            views=data["search_volume"],  # Use as views
+                            url=f"https://trends.google.com/trends/explore?q={keyword.replace(' ', '%20')}"
+                        ))
+
+                if entries:
+                    total += len(entries)
+                    yield entries
+        finally:
+            for task in (task for geo_tasks in tasks.values() for task in geo_tasks):
+                task.cancel()
+
+        logger.info(f"Collected {total} Google Trends entries")
+
+    async def collect_all(self) -> List[WorkflowRecord]:
+        """Collect all Google Trends data"""
+        return [entry async for entries in self.stream() for entry in entries]
+
+    def stats(self) -> Dict:
+        """Requests sent and batches served from the response cache"""
+        return {
+            "requests": self.request_count,
+            "workers": self.workers,
+            "cache": self.cache.stats()
+        }
+
+    async def close(self):
+        """Stop the worker threads and close the feed connections"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        while not self.sessions.empty():
+            session = self.sessions.get_nowait()
+            if isinstance(session, httpx.Client):
+                session.close()
@@ -0,0 +1,196 @@
+import os
+import json
+import logging
+import tempfile
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Set, Tuple
+from collectors.cache import COLLECTOR_CACHE_DIR
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+    # The Data API quota resets at midnight Pacific time
+    QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+except (ImportError, ZoneInfoNotFoundError):  # no tz database installed
+    QUOTA_TIMEZONE = timezone.utc
+
+logger = logging.getLogger(__name__)
+
+# Quota units per day for the API key, and the most one run may spend
+YOUTUBE_DAILY_QUOTA = int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000"))
+YOUTUBE_RUN_QUOTA = int(os.getenv("YOUTUBE_RUN_QUOTA", "6000"))
+
+# Keywords averaging fewer new videos per search than this are searched
+# only every YOUTUBE_LOW_YIELD_DAYS days
+YOUTUBE_LOW_YIELD = float(os.getenv("YOUTUBE_LOW_YIELD", "1.0"))
+YOUTUBE_LOW_YIELD_DAYS = int(os.getenv("YOUTUBE_LOW_YIELD_DAYS", "7"))
+
+# Expected yield assumed for keywords never searched, ranking them just
+# below keywords known to find this many new videos
+YOUTUBE_NEW_KEYWORD_YIELD = float(os.getenv("YOUTUBE_NEW_KEYWORD_YIELD", "5.0"))
+
+# Video ids remembered to tell new videos from ones found before
+YOUTUBE_SEEN_RETENTION_DAYS = int(os.getenv("YOUTUBE_SEEN_RETENTION_DAYS", "90"))
+
+YOUTUBE_PLANNER_STATE = os.getenv("YOUTUBE_PLANNER_STATE", os.path.join(COLLECTOR_CACHE_DIR, "youtube-planner.json"))
+
+# One search.list plus the videos.list call for its results
+SEARCH_COST = 101
+
+# Weight of the latest search in a keyword's expected yield
+YIELD_SMOOTHING = 0.5
+
+def quota_day() -> str:
+    return datetime.now(QUOTA_TIMEZONE).date().isoformat()
+
+class KeywordPlanner:
+    """Spends the YouTube search quota on the keywords that find new videos
+
+    Every (keyword, region) search is scored by the new unique videos it
+    returned in previous runs. A run searches the highest-yield keywords
+    first until its budget is spent; low-yield keywords only come due every
+    YOUTUBE_LOW_YIELD_DAYS days. State is a JSON file under
+    COLLECTOR_CACHE_DIR; every process spending the same API key must see
+    the same file, or each keeps its own daily spend. docker-compose mounts
+    one volume there for the API and the scheduler, whose runs never
+    overlap (see services/locks.py).
+    """
+
+    def __init__(self, path: str = YOUTUBE_PLANNER_STATE, daily_quota: int = YOUTUBE_DAILY_QUOTA,
+                 run_quota: int = YOUTUBE_RUN_QUOTA):
+        self.path = path
+        self.daily_quota = daily_quota
+        self.run_quota = run_quota
+        self.state = self.load()
+        self.today = quota_day()
+        if self.state["quota"].get("day") != self.today:
+            self.state["quota"] = {"day": self.today, "spent": 0}
+        self.decisions: Dict = {}
+        self.run_new = 0
+        self.run_searched = 0
+        self.run_spent = 0
+
+    def load(self) -> Dict:
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            state = {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable planner state {self.path}: {e}")
+            state = {}
+        state.setdefault("quota", {})
+        state.setdefault("keywords", {})
+        state.setdefault("seen", {})
+        return state
+
+    def save(self):
+        """Write the state file, replacing it atomically"""
+        directory = os.path.dirname(self.path) or "."
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.state, f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save planner state {self.path}: {e}")
+
+    @staticmethod
+    def key(keyword: str, region: str) -> str:
+        return f"{region}:{keyword}"
+
+    @property
+    def remaining_today(self) -> int:
+        return max(self.daily_quota - self.state["quota"]["spent"], 0)
+
+    def expected_yield(self, keyword: str, region: str) -> float:
+        record = self.state["keywords"].get(self.key(keyword, region))
+        return record["yield"] if record else YOUTUBE_NEW_KEYWORD_YIELD
+
+    def is_due(self, keyword: str, region: str) -> bool:
+        record = self.state["keywords"].get(self.key(keyword, region))
+        if record is None or record["yield"] >= YOUTUBE_LOW_YIELD:
+            return True
+        last = date.fromisoformat(record["last_searched"])
+        return date.fromisoformat(self.today) - last >= timedelta(days=YOUTUBE_LOW_YIELD_DAYS)
+
+    def plan(self, keywords: Iterable[str], regions: List[str]) -> List[Tuple[str, str]]:
+        """The (keyword, region) searches to run, best expected yield first"""
+        keywords = list(dict.fromkeys(keywords))
+        candidates = [(keyword, region) for region in regions for keyword in keywords]
+        due = [pair for pair in candidates if self.is_due(*pair)]
+        order = {pair: index for index, pair in enumerate(candidates)}
+
+        def last_searched(pair) -> str:
+            record = self.state["keywords"].get(self.key(*pair))
+            return record["last_searched"] if record else ""
+
+        due.sort(key=lambda pair: (-self.expected_yield(*pair), last_searched(pair), order[pair]))
+
+        budget = min(self.run_quota, self.remaining_today)
+        planned = due[:budget // SEARCH_COST]
+        self.decisions = {
+            "budget": budget,
+            "candidates": len(candidates),
+            "due": len(due),
+            "deferred_low_yield": len(candidates) - len(due),
+            "over_budget": len(due) - len(planned),
+            "planned": len(planned),
+            "top": [
+                {"keyword": keyword, "region": region, "expected_yield": round(self.expected_yield(keyword, region), 2)}
+                for keyword, region in planned[:10]
+            ]
+        }
+        logger.info(
+            f"YouTube plan: {len(planned)} of {len(due)} due searches "
+            f"({len(candidates) - len(due)} low-yield deferred), budget {budget} units, "
+            f"{self.remaining_today} left today"
+        )
+        return planned
+
+    def record(self, keyword: str, region: str, video_ids: Iterable[str]):
+        """Update a keyword's yield with the videos one search returned"""
+        video_ids = list(video_ids)
+        seen: Dict[str, str] = self.state["seen"]
+        new: Set[str] = {video_id for video_id in video_ids if video_id not in seen}
+        for video_id in video_ids:
+            seen[video_id] = self.today
+
+        key = self.key(keyword, region)
+        record = self.state["keywords"].get(key)
+        if record is None:
+            record = self.state["keywords"][key] = {"searches": 0, "new_videos": 0, "yield": float(len(new))}
+        else:
+            record["yield"] = YIELD_SMOOTHING * len(new) + (1 - YIELD_SMOOTHING) * record["yield"]
+        record["searches"] += 1
+        record["new_videos"] += len(new)
+        record["last_searched"] = self.today
+        self.run_new += len(new)
+        self.run_searched += 1
+
+    def spend(self, units: int):
+        """Charge quota units used by the run against today's budget"""
+        self.state["quota"]["spent"] += units
+        self.run_spent += units
+
+    def exhaust(self):
+        """The API refused with quotaExceeded: nothing more can be spent today"""
+        self.state["quota"]["spent"] = max(self.state["quota"]["spent"], self.daily_quota)
+
+    def finish(self):
+        """Forget old video ids and save the state"""
+        cutoff = (date.fromisoformat(self.today) - timedelta(days=YOUTUBE_SEEN_RETENTION_DAYS)).isoformat()
+        self.state["seen"] = {video_id: day for video_id, day in self.state["seen"].items() if day >= cutoff}
+        self.save()
+
+    def stats(self) -> Dict:
+        """This run's plan, results and the quota left today"""
+        return {
+            **self.decisions,
+            "searched": self.run_searched,
+            "new_videos": self.run_new,
+            "spent": self.run_spent,
+            "spent_today": self.state["quota"]["spent"],
+            "remaining_today": self.remaining_today,
+            "daily_quota": self.daily_quota
+        }
@@ -0,0 +1,24 @@
+import asyncio
+from collections import deque
+from typing import AsyncIterator, Awaitable, Iterable, TypeVar
+
+T = TypeVar("T")
+
+async def ordered_results(awaitables: Iterable[Awaitable[T]], window: int) -> AsyncIterator[T]:
+    """Run awaitables with at most window in flight, yielding results in order
+    
+    awaitables is consumed lazily, so a consumer that stops pulling also
+    stops new requests from starting. Pending tasks are cancelled if the
+    generator is closed early.
+    """
+    pending: "deque[asyncio.Future]" = deque()
+    try:
+        for awaitable in awaitables:
+            pending.append(asyncio.ensure_future(awaitable))
+            if len(pending) >= window:
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        for task in pending:
+            task.cancel()
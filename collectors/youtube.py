@@ -1,18 +1,147 @@
 import os
+import time
 import asyncio
 import logging
-from typing import List, Dict
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+from typing import AsyncIterator, List, Dict, Optional, Set, Tuple
+import httpx
+from collectors.cache import COLLECTOR_CACHE_MODE, CacheMiss, ResponseCache
+from collectors.planner import KeywordPlanner
+from collectors.streaming import ordered_results
+from services.integrations import find_integrations, integration_label
+from services.metrics import record_upstream, youtube_quota_units
+from services.records import WorkflowRecord
 
 logger = logging.getLogger(__name__)
 
+# Overridable to point the collector at a stand-in, e.g. benchmarks/fake_upstream.py
+YOUTUBE_API_BASE_URL = os.getenv("YOUTUBE_API_BASE_URL", "https://www.googleapis.com/youtube/v3")
+
+# Static definition of the Data API v3 endpoints we call, instead of
+# fetching the discovery document on every client construction
+YOUTUBE_ENDPOINTS = {
+    "search": "/search",
+    "videos": "/videos",
+}
+
+# Quota units charged per call, failed calls included
+YOUTUBE_QUOTA_COSTS = {
+    "search": 100,
+    "videos": 1,
+}
+
+# Seconds a response is reused instead of calling the API again, 0 always calls
+YOUTUBE_CACHE_TTL = float(os.getenv("YOUTUBE_CACHE_TTL", "3600"))
+
+# Error reasons after which no further calls can succeed today
+QUOTA_EXCEEDED_REASONS = {"quotaExceeded", "dailyLimitExceeded"}
+
+REGIONS = ["US", "IN"]
+
+class YouTubeAPIError(Exception):
+    """Error response from the YouTube Data API"""
+    
+    def __init__(self, status_code: int, reason: str, message: str):
+        self.status_code = status_code
+        self.reason = reason
+        super().__init__(f"{status_code} {reason}: {message}")
+
+class CachedResponse(dict):
+    """A response served from the response cache, which cost no quota"""
+
+class YouTubeClient:
+    """Async YouTube Data API v3 client on a pooled keep-alive connection"""
+    
+    def __init__(self, api_key: str, max_concurrency: int = 8, base_url: str = YOUTUBE_API_BASE_URL,
+                 cache: Optional[ResponseCache] = None):
+        self.api_key = api_key
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.quota_units = 0
+        self.cache = cache or ResponseCache("youtube", YOUTUBE_CACHE_TTL)
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=30.0,
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency
+            )
+        )
+        
+    async def request(self, endpoint: str, params: Dict) -> Dict:
+        """Call an endpoint through the response cache
+        
+        Cached responses come back as CachedResponse. When replaying, an
+        uncached request raises CacheMiss instead of calling the API.
+        """
+        cached = await self.cache.get(endpoint, params)
+        if cached is not None:
+            return CachedResponse(cached)
+        data = await self.call(endpoint, params)
+        await self.cache.set(data, endpoint, params)
+        return data
+        
+    async def call(self, endpoint: str, params: Dict) -> Dict:
+        """Call an endpoint, holding a concurrency slot for the round trip"""
+        async with self.semaphore:
+            started = time.perf_counter()
+            self.quota_units += YOUTUBE_QUOTA_COSTS[endpoint]
+            youtube_quota_units.inc(endpoint, amount=YOUTUBE_QUOTA_COSTS[endpoint])
+            try:
+                response = await self.client.get(
+                    YOUTUBE_ENDPOINTS[endpoint],
+                    params={**params, "key": self.api_key}
+                )
+            except httpx.HTTPError as e:
+                record_upstream("YouTube", endpoint, time.perf_counter() - started, type(e).__name__)
+                raise
+            
+        if response.is_error:
+            try:
+                error = response.json().get("error", {})
+            except ValueError:
+                error = {}
+            reason = (error.get("errors") or [{}])[0].get("reason", response.reason_phrase)
+            record_upstream("YouTube", endpoint, time.perf_counter() - started, reason)
+            raise YouTubeAPIError(response.status_code, reason, error.get("message", response.text[:200]))
+            
+        record_upstream("YouTube", endpoint, time.perf_counter() - started)
+        return response.json()
+    
+    async def search(self, query: str, region: str, max_results: int = 10) -> Dict:
+        """search.list for videos matching a query in a region"""
+        return await self.request("search", {
+            "part": "snippet",
+            "q": query,
+            "type": "video",
+            "maxResults": max_results,
+            "regionCode": region,
+            "relevanceLanguage": "en",
+            "order": "relevance"
+        })
+    
+    async def videos(self, video_ids: List[str]) -> Dict:
+        """videos.list statistics for up to 50 video ids"""
+        return await self.request("videos", {
+            "part": "statistics",
+            "id": ",".join(video_ids)
+        })
+    
+    async def close(self):
+        """Close the pooled HTTP connection"""
+        await self.client.aclose()
+
 class YouTubeCollector:
     def __init__(self):
         self.api_key = os.getenv("YOUTUBE_API_KEY")
-        if not self.api_key:
+        # Replaying cached responses needs no key
+        if not self.api_key and COLLECTOR_CACHE_MODE != "replay":
             raise ValueError("YOUTUBE_API_KEY environment variable required")
-        self.youtube = build("youtube", "v3", developerKey=self.api_key)
+        self.max_concurrency = int(os.getenv("YOUTUBE_MAX_CONCURRENCY", "8"))
+        self.youtube = YouTubeClient(self.api_key, max_concurrency=self.max_concurrency)
+        self.planner = KeywordPlanner()
+        # Searches that failed or came from the cache say nothing new about their keyword's yield
+        self.failed_searches: Set[Tuple[str, str]] = set()
+        self.cached_searches: Set[Tuple[str, str]] = set()
+        self.quota_exceeded = False
         
     def generate_keywords(self) -> List[str]:
         """Generate 200+ n8n workflow keywords"""
@@ -42,19 +171,12 @@ class YouTubeCollector:
                 
         return keywords[:250]
     
-    async def search_videos(self, query: str, region: str = "US") -> List[Dict]:
+    async def search_videos(self, query: str, region: str = "US") -> List[WorkflowRecord]:
         """Search YouTube videos"""
         try:
-            request = self.youtube.search().list(
-                part="snippet",
-                q=query,
-                type="video",
-                maxResults=10,
-                regionCode=region,
-                relevanceLanguage="en",
-                order="relevance"
-            )
-            response = request.execute()
+            response = await self.youtube.search(query, region)
+            if isinstance(response, CachedResponse):
+                self.cached_searches.add((query, region))
             
             videos = []
             video_ids = [item["id"]["videoId"] for item in response.get("items", [])]
@@ -71,40 +193,42 @@ class YouTubeCollector:
                     likes = int(video_stats.get("likeCount", 0))
                     comments = int(video_stats.get("commentCount", 0))
                     
-                    video_data = {
-                        "id": video_id,
-                        "title": snippet["title"],
-                        "description": snippet.get("description", ""),
-                        "url": f"https://www.youtube.com/watch?v={video_id}",
-                        "views": views,
-                        "likes": likes,
-                        "comments": comments,
-                        "like_to_view_ratio": likes / views if views > 0 else 0,
-                        "comment_to_view_ratio": comments / views if views > 0 else 0,
-                        "platform": "YouTube",
-                        "country": region,
-                        "workflow": self.extract_workflow_name(snippet["title"])
-                    }
-                    videos.append(video_data)
+                    videos.append(WorkflowRecord(
+                        id=video_id,
+                        title=snippet["title"],
+                        description=snippet.get("description", ""),
+                        url=f"https://www.youtube.com/watch?v={video_id}",
+                        views=views,
+                        likes=likes,
+                        comments=comments,
+                        like_to_view_ratio=likes / views if views > 0 else 0,
+                        comment_to_view_ratio=comments / views if views > 0 else 0,
+                        platform="YouTube",
+                        country=region,
+                        workflow=self.extract_workflow_name(snippet["title"])
+                    ))
                     
-            await asyncio.sleep(0.1)  # Rate limiting
             return videos
             
-        except HttpError as e:
+        except YouTubeAPIError as e:
             logger.error(f"YouTube API error for '{query}': {e}")
+            self.failed_searches.add((query, region))
+            if e.reason in QUOTA_EXCEEDED_REASONS:
+                self.quota_exceeded = True
+            return []
+        except CacheMiss as e:
+            logger.error(f"YouTube replay: {e}")
+            self.failed_searches.add((query, region))
             return []
         except Exception as e:
             logger.error(f"Error searching YouTube for '{query}': {e}")
+            self.failed_searches.add((query, region))
             return []
     
     async def get_video_stats(self, video_ids: List[str]) -> Dict:
         """Get statistics for multiple videos"""
         try:
-            request = self.youtube.videos().list(
-                part="statistics",
-                id=",".join(video_ids)
-            )
-            response = request.execute()
+            response = await self.youtube.videos(video_ids)
             
             stats = {}
             for item in response.get("items", []):
@@ -117,33 +241,77 @@ class YouTubeCollector:
     
     def extract_workflow_name(self, title: str) -> str:
         """Extract workflow name from title"""
-        title_lower = title.lower()
-        
         # Look for integration patterns
-        integrations = ["sheets", "slack", "discord", "notion", "gmail", "trello", "airtable"]
-        found = [i for i in integrations if i in title_lower]
+        found = [integration_label(name) for name in find_integrations(title)]
         
         if len(found) >= 2:
-            return f"{found[0].title()} → {found[1].title()} Automation"
+            return f"{found[0]} → {found[1]} Automation"
         elif len(found) == 1:
-            return f"{found[0].title()} Integration"
+            return f"{found[0]} Integration"
             
         # Fallback
         words = [w for w in title.split()[:4] if w.isalpha()]
         return " ".join(word.title() for word in words) or "n8n Workflow"
     
-    async def collect_all(self) -> List[Dict]:
-        """Collect all YouTube data"""
+    async def stream(self) -> AsyncIterator[List[WorkflowRecord]]:
+        """Yield each planned search's videos as soon as it and the searches before it finish
+        
+        The planner picks the searches that fit the quota budget. Up to
+        twice the client's concurrency cap is in flight, which keeps the API
+        busy while a slow consumer still holds back new searches.
+        """
         logger.info("Starting YouTube data collection")
         
-        keywords = self.generate_keywords()
-        all_videos = []
+        if self.youtube.cache.replay:
+            plan = self.replay_plan()
+        else:
+            plan = self.planner.plan(self.generate_keywords(), REGIONS)
+        searches = (self.search_videos(keyword, region) for keyword, region in plan)
+        results = ordered_results(searches, window=self.max_concurrency * 2)
         
-        for region in ["US", "IN"]:
-            for keyword in keywords[:30]:  # Limit for quota
-                videos = await self.search_videos(keyword, region)
-                all_videos.extend(videos)
-                await asyncio.sleep(0.2)  # Rate limiting
+        total = 0
+        try:
+            index = 0
+            async for videos in results:
+                keyword, region = plan[index]
+                index += 1
+                if (keyword, region) not in self.failed_searches | self.cached_searches:
+                    self.planner.record(keyword, region, [video.id for video in videos])
+                if videos:
+                    total += len(videos)
+                    yield videos
+                if self.quota_exceeded:
+                    logger.error("YouTube quota exceeded, stopping collection")
+                    break
+        finally:
+            # Cancel the searches still in flight before counting the spend
+            await results.aclose()
+            if not self.youtube.cache.replay:
+                self.planner.spend(self.youtube.quota_units)
+                if self.quota_exceeded:
+                    self.planner.exhaust()
+                self.planner.finish()
                 
-        logger.info(f"Collected {len(all_videos)} YouTube videos")
-        return all_videos
\ No newline at end of file
+        logger.info(f"Collected {total} YouTube videos")
+    
+    def replay_plan(self) -> List[Tuple[str, str]]:
+        """The searches in the response cache, replayed without the planner"""
+        searches = [
+            (params["q"], params["regionCode"])
+            for endpoint, params in self.youtube.cache.requests() if endpoint == "search"
+        ]
+        plan = list(dict.fromkeys(searches))
+        logger.info(f"YouTube replay: {len(plan)} cached searches")
+        return plan
+    
+    async def collect_all(self) -> List[WorkflowRecord]:
+        """Collect all YouTube data"""
+        return [video async for videos in self.stream() for video in videos]
+    
+    def stats(self) -> Dict:
+        """Keyword plan, quota spent and quota left today, and cache use"""
+        return {**self.planner.stats(), "cache": self.youtube.cache.stats()}
+    
+    async def close(self):
+        """Close the API client"""
+        await self.youtube.close()
\ No newline at end of file
@@ -0,0 +1,163 @@
+import os
+import re
+import time
+from typing import Dict, List
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, StaticPool
+
+# Distinct statements tracked; executions of further statements are only
+# counted in the totals
+DB_STATEMENT_STATS_SIZE = int(os.getenv("DB_STATEMENT_STATS_SIZE", "200"))
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = [0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0]
+
+WHITESPACE = re.compile(r"\s+")
+
+class Timing:
+    """Count, total, max and bucketed histogram of durations"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def record(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[index] += 1
+                return
+        self.buckets[-1] += 1
+
+    def stats(self) -> Dict:
+        return {
+            "count": self.count,
+            "total_seconds": round(self.total, 4),
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+            "histogram": {
+                **{f"le_{bound}": count for bound, count in zip(LATENCY_BUCKETS, self.buckets)},
+                "le_inf": self.buckets[-1]
+            }
+        }
+
+class DatabaseStats:
+    """Pool checkout waits, connections in use and statement execution times
+
+    Filled by the pool classes and engine event hooks below. Checkout wait
+    is the time from asking the pool for a connection until getting one,
+    including opening a new connection when the pool has none idle.
+    """
+
+    def __init__(self, max_statements: int = DB_STATEMENT_STATS_SIZE):
+        self.max_statements = max_statements
+        self.in_use = 0
+        self.reset()
+
+    def reset(self):
+        """Clear the counters; connections in use are a gauge and stay"""
+        self.checkout = Timing()
+        self.checkout_timeouts = 0
+        self.peak_in_use = self.in_use
+        self.connects = 0
+        self.queries = Timing()
+        self.errors = 0
+        self.statements: Dict[str, Timing] = {}
+
+    def record_checkout_wait(self, seconds: float, timed_out: bool = False):
+        if timed_out:
+            self.checkout_timeouts += 1
+        else:
+            self.checkout.record(seconds)
+
+    def connection_checked_out(self):
+        self.in_use += 1
+        self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def connection_checked_in(self):
+        self.in_use -= 1
+
+    def record_statement(self, statement: str, seconds: float):
+        key = WHITESPACE.sub(" ", statement).strip()
+        self.queries.record(seconds)
+        timing = self.statements.get(key)
+        if timing is None and len(self.statements) < self.max_statements:
+            timing = self.statements[key] = Timing()
+        if timing is not None:
+            timing.record(seconds)
+
+    def stats(self, top: int = 20) -> Dict:
+        slowest: List = sorted(self.statements.items(), key=lambda item: item[1].total, reverse=True)[:top]
+        return {
+            "checkout": {**self.checkout.stats(), "timeouts": self.checkout_timeouts},
+            "connections": {"in_use": self.in_use, "peak_in_use": self.peak_in_use, "opened": self.connects},
+            "queries": {**self.queries.stats(), "errors": self.errors},
+            "statements": [
+                {"statement": statement, **{key: value for key, value in timing.stats().items() if key != "histogram"}}
+                for statement, timing in slowest
+            ]
+        }
+
+db_stats = DatabaseStats()
+
+class CheckoutTimingMixin:
+    """Times Pool.connect(), the wait for a pooled connection"""
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            db_stats.record_checkout_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        db_stats.record_checkout_wait(time.perf_counter() - started)
+        return connection
+
+class InstrumentedQueuePool(CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    pass
+
+class InstrumentedNullPool(CheckoutTimingMixin, NullPool):
+    pass
+
+class InstrumentedStaticPool(CheckoutTimingMixin, StaticPool):
+    pass
+
+def instrument_engine(engine: Engine, stats: DatabaseStats = db_stats):
+    """Register the pool and statement timing hooks on a (sync) engine"""
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        stats.connects += 1
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.connection_checked_out()
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        stats.connection_checked_in()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        # The compiled form groups executions whose IN lists or
+        # insertmanyvalues batches expanded to different SQL
+        compiled = getattr(context, "compiled", None)
+        stats.record_statement(compiled.string if compiled is not None else statement,
+                               time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def on_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+        stats.errors += 1
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, JSON, Index
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, JSON, LargeBinary, Index, UniqueConstraint, ForeignKey
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 
@@ -31,7 +31,9 @@ class Workflow(Base):
     url = Column(String(1000))
     title = Column(Text)
     description = Column(Text)
-    raw_data = Column(JSON)
+    
+    # Fingerprint of the merged row, rows are only rewritten when it changes
+    content_hash = Column(String(32))
     
     # Timestamps
     created_at = Column(DateTime, server_default=func.now())
@@ -39,6 +41,115 @@ class Workflow(Base):
     
     # Composite indexes for performance
     __table_args__ = (
+        UniqueConstraint('workflow_name', 'platform', 'country', name='uq_workflow_platform_country'),
         Index('idx_platform_country', 'platform', 'country'),
         Index('idx_score_platform', 'popularity_score', 'platform'),
-    )
\ No newline at end of file
+    )
+
+class WorkflowRaw(Base):
+    """Collector payload of a workflow row, kept out of the hot table
+    
+    zlib-compressed JSON (see db.raw), written with the row and read only
+    when asked for; API queries never touch it.
+    """
+    __tablename__ = "workflow_raw"
+    
+    workflow_id = Column(Integer, ForeignKey("workflows.id", ondelete="CASCADE"), primary_key=True)
+    data = Column(LargeBinary, nullable=False)
+
+class WorkflowObservation(Base):
+    """One collected item (video, topic, keyword) and the workflow it was merged into"""
+    __tablename__ = "workflow_observations"
+    
+    # platform:country:source id, see services.incremental.observation_key
+    obs_key = Column(String(600), primary_key=True)
+    workflow_id = Column(Integer, ForeignKey("workflows.id", ondelete="CASCADE"), nullable=False, index=True)
+    
+    # Fingerprint of the collected item before scoring
+    content_hash = Column(String(32), nullable=False)
+    popularity_score = Column(Float, default=0.0)
+    data = Column(JSON)
+    
+    observed_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+class WorkflowMetricSnapshot(Base):
+    """Append-only metric history, one row per workflow written by a pipeline run
+    
+    Range partitioned by month on PostgreSQL, see services.snapshots.
+    """
+    __tablename__ = "workflow_metric_snapshots"
+    
+    workflow_id = Column(Integer, ForeignKey("workflows.id", ondelete="CASCADE"), primary_key=True)
+    captured_at = Column(DateTime, primary_key=True)
+    
+    views = Column(Integer, default=0)
+    likes = Column(Integer, default=0)
+    comments = Column(Integer, default=0)
+    replies = Column(Integer, default=0)
+    search_volume = Column(Integer, default=0)
+    popularity_score = Column(Float, default=0.0)
+    
+    __table_args__ = (
+        Index('idx_snapshots_captured_at', 'captured_at'),
+        {'postgresql_partition_by': 'RANGE (captured_at)'},
+    )
+
+class WorkflowTrend(Base):
+    """Metric deltas per workflow over each trending window, rebuilt after every run"""
+    __tablename__ = "workflow_trends"
+    
+    workflow_id = Column(Integer, ForeignKey("workflows.id", ondelete="CASCADE"), primary_key=True)
+    window_days = Column(Integer, primary_key=True)
+    
+    # Current value minus the value at the start of the window
+    score_delta = Column(Float, default=0.0)
+    views_delta = Column(Integer, default=0)
+    # score_delta per day
+    velocity = Column(Float, default=0.0)
+    
+    baseline_at = Column(DateTime)
+    computed_at = Column(DateTime)
+
+class WorkflowStats(Base):
+    """Summary of the workflows table, rewritten at the end of each pipeline run"""
+    __tablename__ = "workflow_stats"
+    
+    id = Column(Integer, primary_key=True)
+    
+    # Bumped on every pipeline commit
+    generation = Column(Integer, nullable=False, default=0)
+    
+    total_workflows = Column(Integer, default=0)
+    platforms = Column(JSON)
+    countries = Column(JSON)
+    avg_popularity_score = Column(Float, default=0.0)
+    top_workflow = Column(String(500))
+    last_updated = Column(DateTime)
+    computed_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+# Columns of WorkflowResponse; list, detail, trending and search queries
+# load only these
+WORKFLOW_RESPONSE_COLUMNS = [
+    Workflow.id, Workflow.workflow_name, Workflow.platform, Workflow.country,
+    Workflow.views, Workflow.likes, Workflow.comments, Workflow.replies, Workflow.contributors,
+    Workflow.search_volume, Workflow.like_to_view_ratio, Workflow.comment_to_view_ratio,
+    Workflow.popularity_score, Workflow.url, Workflow.title, Workflow.description,
+    Workflow.created_at, Workflow.updated_at
+]
+
+# Filtered top-N pages and keyset cursors walk this index in order
+Index(
+    'idx_platform_country_score_id',
+    Workflow.platform,
+    Workflow.country,
+    Workflow.popularity_score.desc(),
+    Workflow.id.desc()
+)
+
+# /workflows/trending ranks one window by velocity
+Index(
+    'idx_trends_window_velocity',
+    WorkflowTrend.window_days,
+    WorkflowTrend.velocity.desc(),
+    WorkflowTrend.workflow_id.desc()
+)
\ No newline at end of file
@@ -0,0 +1,15 @@
+import os
+import json
+import zlib
+from typing import Any, Dict
+
+# zlib level for workflow_raw payloads, 1 (fastest) to 9 (smallest)
+RAW_COMPRESSION_LEVEL = int(os.getenv("RAW_COMPRESSION_LEVEL", "6"))
+
+def compress_raw(data: Dict[str, Any]) -> bytes:
+    """Compact JSON of a collector payload, zlib-compressed for workflow_raw.data"""
+    encoded = json.dumps(data, default=str, separators=(",", ":")).encode()
+    return zlib.compress(encoded, RAW_COMPRESSION_LEVEL)
+
+def decompress_raw(blob: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(blob))
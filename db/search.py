@@ -0,0 +1,68 @@
+import logging
+from typing import List
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+logger = logging.getLogger(__name__)
+
+# Text search configuration for the PostgreSQL tsvector
+SEARCH_LANGUAGE = "english"
+
+# PostgreSQL: a generated tsvector over name (weight A), title (B) and
+# description (C) with a GIN index, and a trigram index on the name for
+# typo-tolerant matching. Same statements as alembic revision 007.
+POSTGRESQL_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "ALTER TABLE workflows ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    f"setweight(to_tsvector('{SEARCH_LANGUAGE}', coalesce(workflow_name, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_LANGUAGE}', coalesce(title, '')), 'B') || "
+    f"setweight(to_tsvector('{SEARCH_LANGUAGE}', coalesce(description, '')), 'C')) STORED",
+    "CREATE INDEX IF NOT EXISTS idx_workflows_search_vector ON workflows USING GIN (search_vector)",
+    "CREATE INDEX IF NOT EXISTS idx_workflows_name_trgm ON workflows USING GIN (workflow_name gin_trgm_ops)",
+]
+
+# SQLite: FTS5 tables over the workflows table, kept in sync by triggers.
+# workflows_fts ranks words with bm25, workflows_trgm matches name trigrams
+SQLITE_FTS_TABLES = {
+    "workflows_fts": "workflow_name, title, description, tokenize='porter unicode61'",
+    "workflows_trgm": "workflow_name, tokenize='trigram'",
+}
+
+def sqlite_fts_ddl(table: str, columns: str) -> List[str]:
+    names = [column.strip() for column in columns.split(",") if "=" not in column]
+    listed = ", ".join(names)
+    new = ", ".join(f"new.{name}" for name in names)
+    old = ", ".join(f"old.{name}" for name in names)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5({columns}, content='workflows', content_rowid='id')",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON workflows BEGIN "
+        f"INSERT INTO {table}(rowid, {listed}) VALUES (new.id, {new}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON workflows BEGIN "
+        f"INSERT INTO {table}({table}, rowid, {listed}) VALUES ('delete', old.id, {old}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE ON workflows BEGIN "
+        f"INSERT INTO {table}({table}, rowid, {listed}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {table}(rowid, {listed}) VALUES (new.id, {new}); END",
+    ]
+
+def create_search_index(connection: Connection):
+    """Create the full-text and trigram search structures for the dialect
+
+    Idempotent, run by create_tables after create_all. On SQLite the FTS
+    tables are rebuilt from workflows when they are first created.
+    """
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        for statement in POSTGRESQL_SEARCH_DDL:
+            connection.execute(text(statement))
+    elif dialect == "sqlite":
+        for table, columns in SQLITE_FTS_TABLES.items():
+            exists = connection.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table}
+            ).first()
+            for statement in sqlite_fts_ddl(table, columns):
+                connection.execute(text(statement))
+            if not exists:
+                connection.execute(text(f"INSERT INTO {table}({table}) VALUES ('rebuild')"))
+                logger.info(f"Built search table {table}")
+    else:
+        logger.warning(f"Workflow search is not supported for {dialect}")
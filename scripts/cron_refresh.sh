@@ -11,14 +11,23 @@ export API_URL="http://localhost:8000"
 # Log file
 LOG_FILE="/var/log/n8n-popularity-refresh.log"
 
+# Give up on a job that has not finished after this many seconds
+MAX_WAIT="${REFRESH_MAX_WAIT:-10800}"
+POLL_INTERVAL=30
+
 # Function to log with timestamp
 log() {
     echo "$(date '+%Y-%m-%d %H:%M:%S') - $1" >> "$LOG_FILE"
 }
 
+# Read one top-level field of a JSON document on stdin
+json_field() {
+    python3 -c 'import json, sys; print(json.load(sys.stdin).get(sys.argv[1]) or "")' "$1" 2>/dev/null
+}
+
 log "Starting scheduled data refresh"
 
-# Make API call to refresh data
+# Start a refresh job; the API answers right away with its id
 response=$(curl -s -X POST "$API_URL/admin/refresh" \
     -H "Content-Type: application/json" \
     -d '{"platforms": ["YouTube", "Forum", "Google"], "force": false}' \
@@ -27,10 +36,47 @@ response=$(curl -s -X POST "$API_URL/admin/refresh" \
 http_code="${response: -3}"
 response_body="${response%???}"
 
-if [ "$http_code" -eq 200 ]; then
-    log "Data refresh completed successfully: $response_body"
-else
-    log "Data refresh failed with HTTP $http_code: $response_body"
+if [ "$http_code" -ne 202 ]; then
+    log "Data refresh failed to start with HTTP $http_code: $response_body"
+    exit 1
 fi
 
-log "Scheduled refresh completed"
\ No newline at end of file
+job_id=$(echo "$response_body" | json_field job_id)
+if [ -z "$job_id" ]; then
+    log "Data refresh returned no job id: $response_body"
+    exit 1
+fi
+log "Refresh job $job_id started"
+
+# Poll until the job finishes or MAX_WAIT runs out; the job is gone if
+# the API restarted, which reads as an unknown status
+waited=0
+while true; do
+    if [ "$waited" -ge "$MAX_WAIT" ]; then
+        log "Data refresh did not finish within ${MAX_WAIT}s: $job"
+        exit 1
+    fi
+    sleep "$POLL_INTERVAL"
+    waited=$((waited + POLL_INTERVAL))
+    job=$(curl -s "$API_URL/admin/jobs/$job_id")
+    status=$(echo "$job" | json_field status)
+    case "$status" in
+        queued|running) ;;
+        succeeded)
+            log "Data refresh completed successfully: $job"
+            break ;;
+        coalesced)
+            # Another process (e.g. the scheduler) refreshed the data meanwhile
+            log "Data refresh coalesced onto a run in another process: $job"
+            break ;;
+        skipped)
+            # lock_mode skip: another process held the pipeline lock
+            log "Data refresh skipped, another process is refreshing: $job"
+            break ;;
+        *)
+            log "Data refresh failed: $job"
+            exit 1 ;;
+    esac
+done
+
+log "Scheduled refresh completed"
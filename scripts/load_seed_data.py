@@ -13,7 +13,10 @@ project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 from db.session import AsyncSessionLocal, create_tables
-from db.models import Workflow
+from db.models import Workflow, WorkflowRaw, WorkflowObservation, WorkflowMetricSnapshot, WorkflowTrend
+from db.raw import compress_raw
+from sqlalchemy import delete
+from services.stats import refresh_stats
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -30,11 +33,16 @@ async def load_seed_data():
             workflows_data = json.load(f)
         
         async with AsyncSessionLocal() as session:
-            # Clear existing data
-            await session.execute("DELETE FROM workflows")
+            # Clear existing data, history is keyed by the old row ids
+            await session.execute(delete(WorkflowTrend))
+            await session.execute(delete(WorkflowMetricSnapshot))
+            await session.execute(delete(WorkflowObservation))
+            await session.execute(delete(WorkflowRaw))
+            await session.execute(delete(Workflow))
             await session.commit()
             
             # Insert seed data
+            workflows = []
             for workflow_data in workflows_data:
                 metrics = workflow_data.get("popularity_metrics", {})
                 
@@ -53,11 +61,19 @@ async def load_seed_data():
                     popularity_score=workflow_data.get("popularity_score", 0.0),
                     url=workflow_data.get("url"),
                     title=workflow_data.get("workflow"),
-                    description=f"Popular {workflow_data.get('workflow')} workflow",
-                    raw_data=workflow_data
+                    description=f"Popular {workflow_data.get('workflow')} workflow"
                 )
                 session.add(workflow)
+                workflows.append(workflow)
             
+            # Raw payloads are keyed by the new row ids
+            await session.flush()
+            session.add_all(
+                WorkflowRaw(workflow_id=workflow.id, data=compress_raw(workflow_data))
+                for workflow, workflow_data in zip(workflows, workflows_data)
+            )
+            await session.flush()
+            await refresh_stats(session)
             await session.commit()
             logger.info(f"Loaded {len(workflows_data)} workflows into database")
             
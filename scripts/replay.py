@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""Rerun the pipeline on cached collector responses, without network access
+
+Every upstream request is served from the collectors' response cache
+(COLLECTOR_CACHE_DIR), so a run can be repeated on the inputs of an earlier
+one. Writes to DATABASE_URL; point it at a scratch database to compare runs.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# Read by the collectors when they are imported
+os.environ["COLLECTOR_CACHE_MODE"] = "replay"
+
+from db.session import AsyncSessionLocal, create_tables
+from services.orchestrator import run_pipeline
+from services.locks import pipeline_lock
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def replay(platforms, force: bool):
+    await create_tables()
+    async with pipeline_lock.hold("wait", source="replay"):
+        async with AsyncSessionLocal() as session:
+            return await run_pipeline(session, platforms, force=force)
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the pipeline from cached collector responses")
+    parser.add_argument("--platforms", default="YouTube,Forum,Google",
+                        help="Comma-separated platforms (default YouTube,Forum,Google)")
+    parser.add_argument("--force", action="store_true", help="Clear existing workflows first")
+    args = parser.parse_args()
+
+    results = asyncio.run(replay(args.platforms.split(","), args.force))
+    print(json.dumps(results, indent=2, default=str))
+
+if __name__ == "__main__":
+    main()
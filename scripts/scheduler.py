@@ -11,6 +11,7 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from db.session import AsyncSessionLocal
 from services.orchestrator import run_pipeline
+from services.locks import pipeline_lock
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -24,9 +25,15 @@ class WorkflowScheduler:
         try:
             logger.info("Starting scheduled data refresh")
             
-            async with AsyncSessionLocal() as session:
-                results = await run_pipeline(session)
-                logger.info(f"Scheduled refresh completed: {results}")
+            # Skips or coalesces (PIPELINE_LOCK_MODE) when the API is refreshing
+            async with pipeline_lock.hold(source="scheduler") as attempt:
+                if not attempt.acquired:
+                    logger.info(f"Scheduled refresh {attempt.outcome}, pipeline lock held by {attempt.holder}")
+                    return
+                    
+                async with AsyncSessionLocal() as session:
+                    results = await run_pipeline(session)
+                    logger.info(f"Scheduled refresh completed: {results}")
                 
         except Exception as e:
             logger.error(f"Scheduled refresh failed: {e}")
@@ -70,9 +77,11 @@ class WorkflowScheduler:
         try:
             logger.info("Starting weekly forced refresh")
             
-            async with AsyncSessionLocal() as session:
-                results = await run_pipeline(session, force=True)
-                logger.info(f"Weekly refresh completed: {results}")
+            # A forced rebuild must not clear tables under a running refresh, so it waits
+            async with pipeline_lock.hold("wait", source="scheduler"):
+                async with AsyncSessionLocal() as session:
+                    results = await run_pipeline(session, force=True)
+                    logger.info(f"Weekly refresh completed: {results}")
                 
         except Exception as e:
             logger.error(f"Weekly refresh failed: {e}")
@@ -0,0 +1,282 @@
+import time
+import logging
+from typing import List, Dict, Iterable, Optional, Set, Tuple, Union
+from sqlalchemy import select, update, delete, bindparam, tuple_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.models import Workflow, WorkflowObservation, WorkflowRaw
+from services.normalizer import WorkflowNormalizer, DedupIndex
+from services.records import WorkflowRecord, as_record
+from services.storage import (
+    content_hash, workflow_row, raw_row, upsert_workflows, upsert_observations, upsert_raw,
+    KEY_COLUMNS, UPDATE_COLUMNS, UPSERT_CHUNK_SIZE
+)
+
+logger = logging.getLogger(__name__)
+
+# Fields identifying the source item in collector output, first present wins
+SOURCE_ID_FIELDS = ["id", "keyword", "url"]
+
+# (obs_key, content_hash, workflow)
+Observation = Tuple[str, str, WorkflowRecord]
+
+def observation_key(workflow: WorkflowRecord) -> str:
+    """Stable identity of a collected item across runs"""
+    source_id = next(
+        (value for value in map(workflow.get, SOURCE_ID_FIELDS) if value not in (None, "")),
+        workflow.workflow
+    )
+    return f"{workflow.platform}:{workflow.country}:{source_id}"
+
+def chunked(items: List, size: int = UPSERT_CHUNK_SIZE) -> Iterable[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def merge_cluster(members: List[WorkflowRecord]) -> WorkflowRecord:
+    """Cluster row the same way deduplicate_workflows builds it"""
+    if len(members) > 1:
+        return WorkflowNormalizer.merge_similar_workflows(members)
+    return members[0].copy()
+
+def cluster_key(members: List[WorkflowRecord]) -> Tuple[str, str, str]:
+    """Row key of a new cluster, taken from its highest-scoring member"""
+    base = max(members, key=lambda x: x.popularity_score)
+    return base.workflow, base.platform, base.country
+
+def legacy_observation(row: Workflow) -> WorkflowRecord:
+    """Stand-in member for a row stored before observations were tracked"""
+    data = {column: getattr(row, column) for column in UPDATE_COLUMNS if column != "content_hash"}
+    return WorkflowRecord(**data, workflow=row.workflow_name, platform=row.platform, country=row.country)
+
+async def detect_changes(session: AsyncSession, workflows: List[Union[WorkflowRecord, Dict]],
+                         seen: Optional[Set[str]] = None) -> Dict:
+    """Split collected workflows into new, changed and unchanged observations
+
+    Items are fingerprinted before scoring. Returns the new and changed ones
+    as "fresh", the workflow each changed one was stored under as
+    "previous", and the counts. Unchanged items need no further work.
+    When streaming, pass the same ``seen`` set for every batch of a run so
+    an item collected twice is only handled the first time. Dicts are
+    converted to WorkflowRecords.
+    """
+    observations: Dict[str, WorkflowRecord] = {}
+    for workflow in map(as_record, workflows):
+        key = observation_key(workflow)
+        if seen is not None:
+            if key in seen:
+                continue
+            seen.add(key)
+        observations[key] = workflow
+
+    stored: Dict[str, Tuple[str, int]] = {}
+    for keys in chunked(list(observations)):
+        result = await session.execute(
+            select(WorkflowObservation.obs_key, WorkflowObservation.content_hash, WorkflowObservation.workflow_id)
+            .where(WorkflowObservation.obs_key.in_(keys))
+        )
+        stored.update({key: (fingerprint, workflow_id) for key, fingerprint, workflow_id in result})
+
+    changes = {"fresh": [], "previous": {}, "new": 0, "changed": 0, "unchanged": 0}
+    for key, workflow in observations.items():
+        fingerprint = content_hash(workflow.to_dict())
+        if key not in stored:
+            changes["new"] += 1
+        elif stored[key][0] != fingerprint:
+            changes["changed"] += 1
+            changes["previous"][key] = stored[key][1]
+        else:
+            changes["unchanged"] += 1
+            continue
+        changes["fresh"].append((key, fingerprint, workflow))
+
+    logger.info(f"Change detection: {changes['new']} new, {changes['changed']} changed, {changes['unchanged']} unchanged")
+    return changes
+
+class ClusterWriter:
+    """Clusters scored fresh observations against stored workflows and writes them
+    
+    Stored workflows seed a DedupIndex in id order when the writer loads, so
+    a fresh item joins the earliest existing cluster it matches, as it would
+    have in a full run. Rows inserted by apply() become seeds as well, which
+    lets later batches of a streaming run join them.
+    """
+    
+    def __init__(self, session: AsyncSession, threshold: float = 0.75):
+        self.session = session
+        self.index = DedupIndex(threshold)
+        # DedupIndex seed id -> workflows.id
+        self.seed_rows: Dict[int, int] = {}
+        self.existing_clusters = 0
+        # Time spent matching names against the index, across apply() calls
+        self.dedup_seconds = 0.0
+        
+    async def load(self):
+        """Seed the index with the stored workflow names"""
+        result = await self.session.execute(select(Workflow.id, Workflow.workflow_name).order_by(Workflow.id))
+        for workflow_id, name in result:
+            self.seed_rows.setdefault(self.index.add(name), workflow_id)
+        self.existing_clusters = len(self.seed_rows)
+        
+    def stats(self) -> Dict:
+        return {**self.index.stats(), "existing_clusters": self.existing_clusters}
+    
+    async def apply(self, changes: Dict) -> Dict:
+        """Write one batch of changes from detect_changes, after scoring
+        
+        Only clusters that gained or lost members are re-aggregated from
+        their observations; they keep their row key and id, and are
+        rewritten only if their content_hash changed. Clusters left without
+        members are deleted. Returns row counts, the ids of the rows
+        written as "workflow_ids", and of those inserted and deleted as
+        "inserted_ids" and "deleted_ids". The caller owns the transaction.
+        """
+        session = self.session
+        fresh: List[Observation] = changes["fresh"]
+        fresh_keys = {key for key, _, _ in fresh}
+        
+        joins: Dict[int, List[Observation]] = {}
+        new_clusters: Dict[int, List[Observation]] = {}
+        started = time.perf_counter()
+        for observation in fresh:
+            seed_id = self.index.add(observation[2].workflow)
+            if seed_id in self.seed_rows:
+                joins.setdefault(self.seed_rows[seed_id], []).append(observation)
+            else:
+                new_clusters.setdefault(seed_id, []).append(observation)
+        self.dedup_seconds += time.perf_counter() - started
+                
+        # New clusters sharing a row key (names that never match, e.g. empty
+        # after normalization) become one row; a key that already exists joins it
+        new_rows: Dict[Tuple[str, str, str], List[Observation]] = {}
+        new_seeds: Dict[Tuple[str, str, str], List[int]] = {}
+        for seed_id, members in new_clusters.items():
+            key = cluster_key([workflow for _, _, workflow in members])
+            new_rows.setdefault(key, []).extend(members)
+            new_seeds.setdefault(key, []).append(seed_id)
+        for workflow_id, key in await existing_keys(session, list(new_rows)):
+            joins.setdefault(workflow_id, []).extend(new_rows.pop(key))
+            for seed_id in new_seeds.pop(key):
+                self.seed_rows[seed_id] = workflow_id
+                
+        counts = {"inserted": 0, "updated": 0, "deleted": 0, "workflow_ids": [], "inserted_ids": []}
+        observation_rows: List[Dict] = []
+        
+        # Re-aggregate touched clusters from their stored observations
+        affected = sorted(set(joins) | set(changes["previous"].values()))
+        rows: Dict[int, Workflow] = {}
+        members: Dict[int, List[WorkflowRecord]] = {workflow_id: [] for workflow_id in affected}
+        tracked = set()
+        for ids in chunked(affected):
+            result = await session.execute(select(Workflow).where(Workflow.id.in_(ids)))
+            rows.update({row.id: row for row in result.scalars()})
+            result = await session.execute(
+                select(WorkflowObservation.obs_key, WorkflowObservation.workflow_id, WorkflowObservation.data)
+                .where(WorkflowObservation.workflow_id.in_(ids))
+            )
+            for key, workflow_id, data in result:
+                tracked.add(workflow_id)
+                if key not in fresh_keys:
+                    members[workflow_id].append(WorkflowRecord.from_dict(data))
+                    
+        updates: List[Dict] = []
+        raw_rows: List[Dict] = []
+        emptied: List[int] = []
+        for workflow_id in affected:
+            row = rows.get(workflow_id)
+            if row is None:
+                continue
+            if workflow_id not in tracked:
+                legacy = legacy_observation(row)
+                members[workflow_id].append(legacy)
+                observation_rows.append({
+                    "obs_key": f"legacy:{workflow_id}", "workflow_id": workflow_id,
+                    "content_hash": content_hash(legacy.to_dict()), "popularity_score": row.popularity_score,
+                    "data": legacy.to_dict()
+                })
+            for key, fingerprint, workflow in joins.get(workflow_id, []):
+                members[workflow_id].append(workflow)
+                observation_rows.append(observation_row(key, fingerprint, workflow, workflow_id))
+                
+            if not members[workflow_id]:
+                emptied.append(workflow_id)
+                continue
+                
+            merged = merge_cluster(members[workflow_id])
+            merged.update(workflow=row.workflow_name, platform=row.platform, country=row.country)
+            values = workflow_row(merged)
+            if values["content_hash"] != row.content_hash:
+                updates.append({"row_id": workflow_id, **{column: values[column] for column in UPDATE_COLUMNS}})
+                raw_rows.append(raw_row(workflow_id, merged))
+                
+        if updates:
+            table = Workflow.__table__
+            await session.execute(
+                update(table).where(table.c.id == bindparam("row_id")).values(updated_at=func.now()),
+                updates
+            )
+            counts["updated"] += len(updates)
+            counts["workflow_ids"].extend(values["row_id"] for values in updates)
+            await upsert_raw(session, raw_rows)
+            
+        if emptied:
+            for ids in chunked(emptied):
+                await session.execute(delete(WorkflowObservation).where(WorkflowObservation.workflow_id.in_(ids)))
+                await session.execute(delete(WorkflowRaw).where(WorkflowRaw.workflow_id.in_(ids)))
+                await session.execute(delete(Workflow).where(Workflow.id.in_(ids)))
+            # Later items matching these seeds start new rows
+            removed = set(emptied)
+            self.seed_rows = {seed_id: workflow_id for seed_id, workflow_id in self.seed_rows.items()
+                              if workflow_id not in removed}
+        counts["deleted"] = len(emptied)
+        counts["deleted_ids"] = emptied
+        
+        # Insert new clusters, then link their observations and seeds by row key
+        if new_rows:
+            merged_rows = [merge_cluster([workflow for _, _, workflow in members]) for members in new_rows.values()]
+            stored = await upsert_workflows(session, merged_rows)
+            counts["inserted"] += stored["inserted"]
+            counts["updated"] += stored["updated"]
+            for workflow_id, key in await existing_keys(session, list(new_rows)):
+                counts["workflow_ids"].append(workflow_id)
+                counts["inserted_ids"].append(workflow_id)
+                for seed_id in new_seeds[key]:
+                    self.seed_rows[seed_id] = workflow_id
+                for obs_key, fingerprint, workflow in new_rows[key]:
+                    observation_rows.append(observation_row(obs_key, fingerprint, workflow, workflow_id))
+                    
+        await upsert_observations(session, observation_rows)
+        
+        logger.info(
+            f"Applied {len(fresh)} observations to {len(affected)} existing and {len(new_rows)} new clusters: "
+            f"{counts['inserted']} inserted, {counts['updated']} updated, {counts['deleted']} deleted"
+        )
+        return counts
+
+async def apply_changes(session: AsyncSession, changes: Dict, threshold: float = 0.75,
+                        stats: Optional[Dict] = None) -> Dict:
+    """Cluster and write one set of changes with a freshly loaded ClusterWriter"""
+    writer = ClusterWriter(session, threshold)
+    await writer.load()
+    counts = await writer.apply(changes)
+    if stats is not None:
+        stats.update(writer.stats())
+    return counts
+
+def observation_row(key: str, fingerprint: str, workflow: WorkflowRecord, workflow_id: int) -> Dict:
+    return {
+        "obs_key": key,
+        "workflow_id": workflow_id,
+        "content_hash": fingerprint,
+        "popularity_score": workflow.popularity_score,
+        "data": workflow.to_dict()
+    }
+
+async def existing_keys(session: AsyncSession, keys: List[Tuple[str, str, str]]) -> List[Tuple[int, Tuple[str, str, str]]]:
+    """(id, row key) of the stored workflows among keys"""
+    found = []
+    key_columns = tuple_(*(getattr(Workflow, column) for column in KEY_COLUMNS))
+    for chunk in chunked(keys):
+        result = await session.execute(
+            select(Workflow.id, *(getattr(Workflow, column) for column in KEY_COLUMNS)).where(key_columns.in_(chunk))
+        )
+        found.extend((workflow_id, tuple(key)) for workflow_id, *key in result)
+    return found
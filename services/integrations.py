@@ -0,0 +1,53 @@
+import re
+from functools import lru_cache
+from typing import List, Dict, Tuple
+
+# Integration catalogue used by every collector and the normalizer:
+# canonical name -> spellings matched in titles and keywords. Catalogue
+# order decides which service comes first in a generated workflow name.
+INTEGRATIONS: Dict[str, List[str]] = {
+    "google sheets": ["google sheets", "sheets"],
+    "slack": ["slack"],
+    "discord": ["discord"],
+    "notion": ["notion"],
+    "airtable": ["airtable"],
+    "trello": ["trello"],
+    "gmail": ["gmail"],
+    "outlook": ["outlook"],
+    "salesforce": ["salesforce"],
+    "hubspot": ["hubspot"],
+    "stripe": ["stripe"],
+    "webhook": ["webhook"],
+    "api": ["api"],
+    "database": ["database"],
+    "mysql": ["mysql"],
+    "postgresql": ["postgresql"],
+}
+
+ALIASES = {alias: name for name, aliases in INTEGRATIONS.items() for alias in aliases}
+RANKS = {name: rank for rank, name in enumerate(INTEGRATIONS)}
+
+# All spellings in one alternation, longest first so "google sheets" is
+# not read as "sheets". Matches are whole words, optionally plural.
+PATTERN = re.compile(
+    r"\b(?P<alias>" + "|".join(
+        r"\s+".join(re.escape(word) for word in alias.split())
+        for alias in sorted(ALIASES, key=len, reverse=True)
+    ) + r")s?\b",
+    re.IGNORECASE
+)
+
+@lru_cache(maxsize=65536)
+def _find(text: str) -> Tuple[str, ...]:
+    found = {ALIASES[" ".join(match.group("alias").lower().split())] for match in PATTERN.finditer(text)}
+    return tuple(sorted(found, key=RANKS.__getitem__))
+
+def find_integrations(text: str) -> List[str]:
+    """Canonical names of the integrations mentioned in text, in catalogue order"""
+    if not text:
+        return []
+    return list(_find(text))
+
+def integration_label(name: str) -> str:
+    """Display form of a canonical integration name, as used in workflow names"""
+    return name.title()
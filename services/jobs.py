@@ -0,0 +1,152 @@
+import os
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from db.session import AsyncSessionLocal
+from services.orchestrator import run_pipeline
+from services.locks import pipeline_lock
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs kept for GET /admin/jobs/{id}, oldest dropped first
+JOB_HISTORY_SIZE = int(os.getenv("JOB_HISTORY_SIZE", "50"))
+
+# Pipeline counters reported while a job runs
+PROGRESS_FIELDS = ["collected", "processed", "stored", "inserted", "updated", "deleted",
+                   "new", "changed", "unchanged"]
+
+class RefreshJob:
+    """One background run of the pipeline"""
+
+    def __init__(self, platforms: List[str], force: bool, lock_mode: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.platforms = platforms
+        self.force = force
+        self.lock_mode = lock_mode
+        self.status = "queued"
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        # Filled in place by run_pipeline while it runs
+        self.results: Dict = {}
+        # Pipeline lock outcome, once the lock was decided
+        self.lock: Optional[Dict] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def snapshot(self) -> Dict:
+        """Status, stage, progress counts and errors as plain data"""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.results.get("stage", self.status),
+            "platforms": self.platforms,
+            "force": self.force,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": {field: self.results.get(field, 0) for field in PROGRESS_FIELDS},
+            "errors": list(self.results.get("errors", [])),
+            "lock": self.lock
+        }
+
+def covers(job: RefreshJob, platforms: List[str], force: bool) -> bool:
+    """Whether job does everything a refresh of platforms with force would"""
+    return set(platforms) <= set(job.platforms) and (job.force or not force)
+
+class RefreshJobs:
+    """Runs refreshes as background tasks, at most one at a time
+
+    Submitting while a refresh is queued or running returns that job when
+    it covers the request (same or more platforms, forced if force was
+    asked), instead of starting a second pipeline over the same tables.
+    Other requests are queued to run after it.
+    """
+
+    def __init__(self, on_success: Optional[Callable[[Dict], None]] = None,
+                 history_size: int = JOB_HISTORY_SIZE):
+        self.on_success = on_success
+        self.history_size = history_size
+        self.jobs: "OrderedDict[str, RefreshJob]" = OrderedDict()
+        self.current: Optional[RefreshJob] = None
+
+    def submit(self, platforms: List[str], force: bool = False,
+               lock_mode: Optional[str] = None) -> Tuple[RefreshJob, bool]:
+        """Start a refresh job, join the active one, or queue one after it
+
+        Returns the job and whether the request was coalesced onto it.
+        """
+        previous = self.current if self.current is not None and self.current.active else None
+        if previous is not None and covers(previous, platforms, force):
+            logger.info(f"Refresh coalesced onto job {previous.id}")
+            return previous, True
+
+        job = RefreshJob(platforms, force, lock_mode)
+        self.jobs[job.id] = job
+        while len(self.jobs) > self.history_size:
+            self.jobs.popitem(last=False)
+
+        self.current = job
+        job.task = asyncio.create_task(self.run(job, previous))
+        after = f" after job {previous.id}" if previous is not None else ""
+        logger.info(f"Refresh job {job.id} queued{after}: platforms={platforms} force={force}")
+        return job, False
+
+    def get(self, job_id: str) -> Optional[RefreshJob]:
+        return self.jobs.get(job_id)
+
+    async def run(self, job: RefreshJob, previous: Optional[RefreshJob] = None):
+        if previous is not None and previous.task is not None:
+            # Runs are serialized; wait for the earlier job however it ends
+            await asyncio.wait([previous.task])
+        job.status = "running"
+        job.started_at = datetime.utcnow()
+        job.results["stage"] = "waiting"
+        try:
+            # Another process (the scheduler, another API worker) may be refreshing
+            async with pipeline_lock.hold(job.lock_mode, source="api") as attempt:
+                job.lock = attempt.snapshot()
+                if not attempt.acquired:
+                    # Skipped, or the other process's run already refreshed the data
+                    job.status = attempt.outcome
+                    job.results["stage"] = "done"
+                    logger.info(f"Refresh job {job.id} {attempt.outcome}, lock held by {attempt.holder}")
+                    return
+
+                # The job outlives the request, so it opens its own session
+                async with AsyncSessionLocal() as session:
+                    await run_pipeline(session, job.platforms, job.force, results=job.results)
+            if self.on_success is not None:
+                self.on_success(job.results)
+            job.status = "succeeded"
+            logger.info(f"Refresh job {job.id} succeeded")
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            raise
+        except Exception as e:
+            job.status = "failed"
+            # Writes committed before the failure came with a new generation
+            if self.on_success is not None and "generation" in job.results:
+                self.on_success(job.results)
+            if str(e) not in job.results.setdefault("errors", []):
+                job.results["errors"].append(str(e))
+            logger.error(f"Refresh job {job.id} failed: {e}")
+        finally:
+            job.finished_at = datetime.utcnow()
+
+    async def shutdown(self):
+        """Cancel the running and queued jobs, e.g. when the API process stops"""
+        tasks = [job.task for job in self.jobs.values() if job.task is not None and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
@@ -0,0 +1,319 @@
+import os
+import json
+import time
+import socket
+import asyncio
+import logging
+import tempfile
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import AsyncIterator, Dict, Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from db.session import engine
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows, only needed without PostgreSQL
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# What a pipeline run does when another process holds the lock:
+#   wait     - run once the other run has finished
+#   skip     - give up immediately
+#   coalesce - wait for the other run to finish and use its data instead of running
+LOCK_MODES = ["wait", "skip", "coalesce"]
+PIPELINE_LOCK_MODE = os.getenv("PIPELINE_LOCK_MODE", "coalesce")
+
+# Longest a waiting or coalescing run waits for the lock, in seconds
+PIPELINE_LOCK_TIMEOUT = float(os.getenv("PIPELINE_LOCK_TIMEOUT", "3600"))
+PIPELINE_LOCK_POLL_INTERVAL = float(os.getenv("PIPELINE_LOCK_POLL_INTERVAL", "2.0"))
+
+# PostgreSQL advisory lock key shared by every process on the database
+PIPELINE_LOCK_KEY = int(os.getenv("PIPELINE_LOCK_KEY", "7235694"))
+
+# Lock file used instead of the advisory lock on other databases (SQLite)
+PIPELINE_LOCK_FILE = os.getenv("PIPELINE_LOCK_FILE", os.path.join(tempfile.gettempdir(), "n8n-pipeline.lock"))
+
+HOLDER_PREFIX = "n8n-pipeline"
+
+class PipelineLockTimeout(Exception):
+    """The lock was still held after PIPELINE_LOCK_TIMEOUT"""
+
+def holder_info(source: str) -> Dict:
+    return {
+        "source": source,
+        "host": socket.gethostname(),
+        "pid": os.getpid(),
+        "acquired_at": datetime.utcnow().isoformat(timespec="seconds")
+    }
+
+class AdvisoryLockBackend:
+    """Session-level pg_advisory_lock on a dedicated connection
+
+    The lock belongs to the connection, so it is released even if the
+    holding process dies. The holder is published in the connection's
+    application_name, where other processes can read it.
+    """
+
+    name = "postgresql"
+
+    def __init__(self, engine: AsyncEngine, key: int = PIPELINE_LOCK_KEY):
+        self.engine = engine
+        self.key = key
+        self.connection: Optional[AsyncConnection] = None
+
+    async def try_acquire(self, holder: Dict) -> bool:
+        connection = await self.engine.connect()
+        try:
+            acquired = (await connection.execute(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}
+            )).scalar()
+            if acquired:
+                label = ":".join(str(holder[field]) for field in ("source", "host", "pid"))
+                await connection.execute(
+                    text("SELECT set_config('application_name', :name, false)"),
+                    {"name": f"{HOLDER_PREFIX}:{label}:{int(time.time())}"[:63]}
+                )
+            # Advisory locks outlive the transaction, don't sit idle in one
+            await connection.commit()
+        except Exception:
+            await connection.close()
+            raise
+
+        if not acquired:
+            await connection.close()
+            return False
+        self.connection = connection
+        return True
+
+    async def release(self):
+        connection, self.connection = self.connection, None
+        released = False
+        try:
+            released = (await connection.execute(
+                text("SELECT pg_advisory_unlock(:key)"), {"key": self.key}
+            )).scalar()
+            await connection.execute(text("SELECT set_config('application_name', '', false)"))
+            await connection.commit()
+        finally:
+            if not released:
+                # Never pool a connection that may still hold the lock
+                logger.warning(f"Could not release advisory lock {self.key}, discarding its connection")
+                await connection.invalidate()
+            await connection.close()
+
+    async def holder(self) -> Optional[Dict]:
+        # A bigint key is split into classid (high 32 bits) and objid (low 32 bits)
+        async with self.engine.connect() as connection:
+            row = (await connection.execute(text(
+                "SELECT activity.pid, activity.application_name FROM pg_locks locks "
+                "JOIN pg_stat_activity activity ON activity.pid = locks.pid "
+                "WHERE locks.locktype = 'advisory' AND locks.granted AND locks.objsubid = 1 "
+                "AND locks.classid = :high AND locks.objid = :low"
+            ), {"high": self.key >> 32, "low": self.key & 0xFFFFFFFF})).first()
+        if row is None:
+            return None
+
+        backend_pid, name = row
+        parts = name.split(":")
+        if len(parts) != 5 or parts[0] != HOLDER_PREFIX:
+            return {"backend_pid": backend_pid, "application_name": name}
+        _, source, host, pid, acquired = parts
+        return {
+            "source": source,
+            "host": host,
+            "pid": int(pid),
+            "acquired_at": datetime.utcfromtimestamp(int(acquired)).isoformat(timespec="seconds"),
+            "backend_pid": backend_pid
+        }
+
+class FileLockBackend:
+    """flock on a local file, for single-host SQLite deployments
+
+    The holder is written into the lock file; the kernel drops the lock
+    when the holding process exits.
+    """
+
+    name = "file"
+
+    def __init__(self, path: str = PIPELINE_LOCK_FILE):
+        if fcntl is None:
+            raise RuntimeError("File locks need fcntl; use PostgreSQL on this platform")
+        self.path = path
+        self.fd: Optional[int] = None
+
+    async def try_acquire(self, holder: Dict) -> bool:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, json.dumps(holder).encode())
+        self.fd = fd
+        return True
+
+    async def release(self):
+        fd, self.fd = self.fd, None
+        try:
+            os.ftruncate(fd, 0)
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    async def holder(self) -> Optional[Dict]:
+        if not os.path.exists(self.path):
+            return None
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            # A shared lock is only refused while someone holds the lock
+            try:
+                fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+            except BlockingIOError:
+                content = os.read(fd, 4096)
+                return json.loads(content) if content else {}
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            return None
+        finally:
+            os.close(fd)
+
+class LockAttempt:
+    """Outcome of PipelineLock.hold: acquired, skipped or coalesced"""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.outcome = "waiting"
+        self.wait_seconds = 0.0
+        # The other run's holder, when this attempt had to wait or give up
+        self.holder: Optional[Dict] = None
+
+    @property
+    def acquired(self) -> bool:
+        return self.outcome == "acquired"
+
+    def snapshot(self) -> Dict:
+        return {
+            "mode": self.mode,
+            "outcome": self.outcome,
+            "wait_seconds": round(self.wait_seconds, 2),
+            "holder": self.holder
+        }
+
+class PipelineLock:
+    """Single-flight guard around pipeline runs across processes
+
+    The API and scripts/scheduler.py share one lock through the database
+    (or a lock file on SQLite), so two refreshes never run against the same
+    tables at once.
+    """
+
+    def __init__(self, backend, mode: str = PIPELINE_LOCK_MODE,
+                 timeout: float = PIPELINE_LOCK_TIMEOUT, poll_interval: float = PIPELINE_LOCK_POLL_INTERVAL):
+        if mode not in LOCK_MODES:
+            raise ValueError(f"Lock mode must be one of {LOCK_MODES}")
+        self.backend = backend
+        self.mode = mode
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        # Serializes holders inside this process, the backends only exclude other processes reliably
+        self.local = asyncio.Lock()
+        self.held: Optional[Dict] = None
+        self.waiting = 0
+        self.last_wait_seconds: Optional[float] = None
+        self.counts = {"acquired": 0, "skipped": 0, "coalesced": 0, "timeouts": 0}
+
+    @asynccontextmanager
+    async def hold(self, mode: Optional[str] = None, source: str = "api") -> AsyncIterator[LockAttempt]:
+        """Try to take the lock according to mode
+
+        Yields a LockAttempt; run the pipeline only if attempt.acquired.
+        Raises PipelineLockTimeout when waiting exceeds the timeout.
+        """
+        attempt = LockAttempt(mode or self.mode)
+        if attempt.mode not in LOCK_MODES:
+            raise ValueError(f"Lock mode must be one of {LOCK_MODES}")
+
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            contended = await self.acquire(attempt, source, started)
+        finally:
+            self.waiting -= 1
+            attempt.wait_seconds = time.monotonic() - started
+            self.last_wait_seconds = round(attempt.wait_seconds, 2)
+
+        if contended:
+            # Coalescing only waited for the other run to finish
+            await self.release()
+            attempt.outcome = "coalesced"
+        elif attempt.outcome == "waiting":
+            attempt.outcome = "acquired"
+        self.counts[attempt.outcome] += 1
+        logger.info(f"Pipeline lock {attempt.outcome} ({source}, {attempt.mode}) after {attempt.wait_seconds:.1f}s")
+
+        if not attempt.acquired:
+            yield attempt
+            return
+        try:
+            yield attempt
+        finally:
+            await self.release()
+
+    async def acquire(self, attempt: LockAttempt, source: str, started: float) -> bool:
+        """Take the lock or mark the attempt skipped
+
+        Returns True when a coalescing attempt took the lock only after
+        another run released it.
+        """
+        while True:
+            if not self.local.locked():
+                await self.local.acquire()
+                try:
+                    holder = holder_info(source)
+                    if await self.backend.try_acquire(holder):
+                        self.held = holder
+                        return attempt.mode == "coalesce" and attempt.holder is not None
+                except BaseException:
+                    self.local.release()
+                    raise
+                self.local.release()
+
+            if attempt.holder is None:
+                attempt.holder = self.held or await self.backend.holder() or {}
+            if attempt.mode == "skip":
+                attempt.outcome = "skipped"
+                return False
+            if time.monotonic() - started > self.timeout:
+                self.counts["timeouts"] += 1
+                raise PipelineLockTimeout(f"Pipeline lock still held after {self.timeout:.0f}s by {attempt.holder}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def release(self):
+        self.held = None
+        try:
+            await self.backend.release()
+        finally:
+            self.local.release()
+
+    async def status(self) -> Dict:
+        """Current holder (in any process), waiters here and wait statistics"""
+        return {
+            "backend": self.backend.name,
+            "mode": self.mode,
+            "held_here": self.held is not None,
+            "holder": self.held or await self.backend.holder(),
+            "waiting": self.waiting,
+            "last_wait_seconds": self.last_wait_seconds,
+            **self.counts
+        }
+
+def create_pipeline_lock() -> PipelineLock:
+    """Advisory lock on PostgreSQL, lock file elsewhere"""
+    if engine.dialect.name == "postgresql":
+        return PipelineLock(AdvisoryLockBackend(engine))
+    return PipelineLock(FileLockBackend())
+
+pipeline_lock = create_pipeline_lock()
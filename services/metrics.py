@@ -0,0 +1,164 @@
+import bisect
+from typing import Dict, List, Sequence, Tuple
+
+# Prometheus text exposition format, version 0.0.4 (the response adds the charset)
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Bucket upper bounds in seconds
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UPSTREAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+STAGE_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+def escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """Base of the metric types; label values are passed positionally"""
+
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{format_labels(self.label_names, labels)} {format_value(value)}"
+            for labels, value in sorted(self.values.items())
+        ]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, *labels: str, value: float):
+        self.values[labels] = value
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram; observe() is a bisect and two additions"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = REQUEST_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last is +Inf), sum]
+        self.series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, (counts, total) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{format_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.label_names, labels)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+# API
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "API request latency by route", ("method", "route", "status")
+))
+
+# Pipeline
+pipeline_runs = registry.register(Counter(
+    "pipeline_runs_total", "Pipeline runs by outcome", ("status",)
+))
+pipeline_stage_duration = registry.register(Histogram(
+    "pipeline_stage_duration_seconds", "Time spent in each pipeline stage per run", ("stage",), STAGE_BUCKETS
+))
+pipeline_collect_duration = registry.register(Histogram(
+    "pipeline_collect_duration_seconds", "Collection time per platform per run", ("platform",), STAGE_BUCKETS
+))
+pipeline_rows = registry.register(Counter(
+    "pipeline_rows_total", "Workflow rows written by the pipeline", ("operation",)
+))
+pipeline_last_run_rows = registry.register(Gauge(
+    "pipeline_last_run_rows", "Workflow rows written by the last pipeline run", ("operation",)
+))
+pipeline_items = registry.register(Counter(
+    "pipeline_items_total", "Collected items by change detection result", ("result",)
+))
+
+# Collectors
+upstream_requests = registry.register(Counter(
+    "collector_upstream_requests_total", "Requests sent to upstream APIs", ("platform", "endpoint")
+))
+upstream_errors = registry.register(Counter(
+    "collector_upstream_errors_total", "Failed upstream requests", ("platform", "endpoint", "reason")
+))
+upstream_duration = registry.register(Histogram(
+    "collector_upstream_request_duration_seconds", "Upstream API request latency", ("platform", "endpoint"), UPSTREAM_BUCKETS
+))
+youtube_quota_units = registry.register(Counter(
+    "youtube_quota_units_total", "YouTube Data API quota units consumed", ("endpoint",)
+))
+
+def record_upstream(platform: str, endpoint: str, seconds: float, error: str = ""):
+    """Count one upstream request, and its failure reason if any"""
+    upstream_requests.inc(platform, endpoint)
+    upstream_duration.observe(seconds, platform, endpoint)
+    if error:
+        upstream_errors.inc(platform, endpoint, error)
+
+def record_pipeline(results: Dict, status: str):
+    """Record one run_pipeline result dict"""
+    pipeline_runs.inc(status)
+    for stage, seconds in results.get("stage_seconds", {}).items():
+        pipeline_stage_duration.observe(seconds, stage)
+    for platform, seconds in results.get("collect_seconds", {}).items():
+        pipeline_collect_duration.observe(seconds, platform)
+    for operation in ("inserted", "updated", "deleted"):
+        pipeline_rows.inc(operation, amount=results.get(operation, 0))
+        pipeline_last_run_rows.set(operation, value=results.get(operation, 0))
+    for result in ("new", "changed", "unchanged"):
+        pipeline_items.inc(result, amount=results.get(result, 0))
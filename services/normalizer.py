@@ -1,14 +1,35 @@
 import re
+import math
 import logging
-from typing import List, Dict
+from functools import lru_cache
+from typing import List, Dict, FrozenSet, Optional, Tuple
 from Levenshtein import distance
+from services.integrations import find_integrations, integration_label
+from services.records import WorkflowRecord
 
 logger = logging.getLogger(__name__)
 
+# Weights of the combined similarity score
+LEVENSHTEIN_WEIGHT = 0.7
+SERVICE_WEIGHT = 0.3
+
+# Name affixes stripped by normalize_name, in order
+NAME_PREFIXES = ["how to", "n8n", "tutorial", "guide", "setup"]
+NAME_SUFFIXES = ["automation", "workflow", "integration", "tutorial"]
+
+SEPARATORS = re.compile(r'[→\-\>\<\|]+')
+CONJUNCTIONS = re.compile(r'[&+]')
+WHITESPACE = re.compile(r'\s+')
+
+# Distinct names remembered by normalize_name; the same titles come back
+# in every batch and every similarity check
+NORMALIZE_CACHE_SIZE = 65536
+
 class WorkflowNormalizer:
     """Normalize and deduplicate workflow names"""
     
     @staticmethod
+    @lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
     def normalize_name(name: str) -> str:
         """Normalize workflow name for comparison"""
         if not name:
@@ -18,36 +39,25 @@ class WorkflowNormalizer:
         name = name.lower().strip()
         
         # Remove common prefixes/suffixes
-        prefixes = ["how to", "n8n", "tutorial", "guide", "setup"]
-        suffixes = ["automation", "workflow", "integration", "tutorial"]
-        
-        for prefix in prefixes:
+        for prefix in NAME_PREFIXES:
             if name.startswith(prefix):
                 name = name[len(prefix):].strip()
                 
-        for suffix in suffixes:
+        for suffix in NAME_SUFFIXES:
             if name.endswith(suffix):
                 name = name[:-len(suffix)].strip()
         
         # Normalize separators
-        name = re.sub(r'[→\-\>\<\|]+', ' to ', name)
-        name = re.sub(r'[&+]', ' and ', name)
-        name = re.sub(r'\s+', ' ', name).strip()
+        name = SEPARATORS.sub(' to ', name)
+        name = CONJUNCTIONS.sub(' and ', name)
+        name = WHITESPACE.sub(' ', name).strip()
         
         return name
     
     @staticmethod
     def extract_services(name: str) -> List[str]:
         """Extract service names from workflow"""
-        services = [
-            "google sheets", "sheets", "slack", "discord", "notion", "airtable",
-            "trello", "gmail", "outlook", "salesforce", "hubspot", "stripe",
-            "webhook", "api", "database", "mysql", "postgresql"
-        ]
-        
-        name_lower = name.lower()
-        found = [service for service in services if service in name_lower]
-        return found
+        return find_integrations(name)
     
     @staticmethod
     def calculate_similarity(name1: str, name2: str) -> float:
@@ -75,73 +85,72 @@ class WorkflowNormalizer:
             service_similarity = 0.0
             
         # Combined similarity
-        return 0.7 * lev_similarity + 0.3 * service_similarity
+        return LEVENSHTEIN_WEIGHT * lev_similarity + SERVICE_WEIGHT * service_similarity
     
     @staticmethod
-    def deduplicate_workflows(workflows: List[Dict], threshold: float = 0.75) -> List[Dict]:
-        """Remove duplicate workflows based on similarity"""
+    def deduplicate_workflows(workflows: List[WorkflowRecord], threshold: float = 0.75,
+                              stats: Optional[Dict] = None) -> List[WorkflowRecord]:
+        """Remove duplicate workflows based on similarity
+        
+        Each workflow joins the earliest preceding cluster seed it matches,
+        which is exactly what the pairwise greedy scan did, but candidates
+        come from a DedupIndex so only pairs sharing a block are scored.
+        Pass a dict as ``stats`` to receive the candidate-pair counters.
+        """
         if not workflows:
             return []
             
-        deduplicated = []
-        processed = set()
+        index = DedupIndex(threshold)
+        clusters: List[List[WorkflowRecord]] = []
         
-        for i, workflow in enumerate(workflows):
-            if i in processed:
-                continue
-                
-            similar_workflows = [workflow]
-            processed.add(i)
-            
-            for j, other in enumerate(workflows[i+1:], i+1):
-                if j in processed:
-                    continue
-                    
-                similarity = WorkflowNormalizer.calculate_similarity(
-                    workflow.get("workflow", ""),
-                    other.get("workflow", "")
-                )
+        for workflow in workflows:
+            cluster_id = index.add(workflow.workflow)
+            if cluster_id == len(clusters):
+                clusters.append([workflow])
+            else:
+                clusters[cluster_id].append(workflow)
                 
-                if similarity >= threshold:
-                    similar_workflows.append(other)
-                    processed.add(j)
+        if stats is not None:
+            stats.update(index.stats())
             
+        deduplicated = []
+        for similar_workflows in clusters:
             # Merge similar workflows
             if len(similar_workflows) > 1:
                 merged = WorkflowNormalizer.merge_similar_workflows(similar_workflows)
                 deduplicated.append(merged)
             else:
-                deduplicated.append(workflow)
+                deduplicated.append(similar_workflows[0])
                 
         return deduplicated
     
     @staticmethod
-    def merge_similar_workflows(workflows: List[Dict]) -> Dict:
+    def merge_similar_workflows(workflows: List[WorkflowRecord]) -> Optional[WorkflowRecord]:
         """Merge similar workflows into one"""
         if not workflows:
-            return {}
+            return None
             
         # Use highest scoring workflow as base
-        base = max(workflows, key=lambda x: x.get("popularity_score", 0))
+        base = max(workflows, key=lambda x: x.popularity_score)
         
         # Aggregate metrics
-        total_views = sum(int(w.get("views", 0)) for w in workflows)
-        total_likes = sum(int(w.get("likes", 0)) for w in workflows)
-        total_comments = sum(int(w.get("comments", 0)) for w in workflows)
+        total_views = sum(int(w.views) for w in workflows)
+        total_likes = sum(int(w.likes) for w in workflows)
+        total_comments = sum(int(w.comments) for w in workflows)
         
         # Calculate merged score
-        scores = [w.get("popularity_score", 0) for w in workflows]
+        scores = [w.popularity_score for w in workflows]
         merged_score = sum(scores) * 0.8 + max(scores) * 0.2
         
         merged = base.copy()
-        merged.update({
-            "views": total_views,
-            "likes": total_likes,
-            "comments": total_comments,
-            "popularity_score": round(merged_score, 2),
-            "platforms": list(set(w.get("platform") for w in workflows)),
-            "merged_count": len(workflows)
-        })
+        merged.update(
+            views=total_views,
+            likes=total_likes,
+            comments=total_comments,
+            popularity_score=round(merged_score, 2),
+            platforms=list(set(w.get("platform") for w in workflows)),
+            merged_count=len(workflows)
+        )
         
         return merged
     
@@ -152,9 +161,138 @@ class WorkflowNormalizer:
         services = WorkflowNormalizer.extract_services(normalized)
         
         if len(services) >= 2:
-            return f"{services[0].title()} → {services[1].title()} Integration"
+            return f"{integration_label(services[0])} → {integration_label(services[1])} Integration"
         elif len(services) == 1:
-            return f"{services[0].title()} Automation"
+            return f"{integration_label(services[0])} Automation"
         else:
             words = [w.title() for w in normalized.split() if w.isalpha() and len(w) > 2]
-            return " ".join(words[:3]) or "Unknown Workflow"
\ No newline at end of file
+            return " ".join(words[:3]) or "Unknown Workflow"
+
+class DedupIndex:
+    """Blocking index over cluster seeds used by deduplicate_workflows
+    
+    Names are normalized once when added. With the default weights a pair
+    can only reach a threshold above 0.7 if both names share at least one
+    extracted service, so seeds are blocked by service; for lower thresholds
+    they are blocked by a length window instead. Inside a block the exact
+    Levenshtein + Jaccard score is computed, with the Levenshtein distance
+    capped at the largest value that could still reach the threshold.
+    """
+    
+    # Slack for the float bounds, so pruning never drops a pair the exact
+    # score would accept
+    EPSILON = 1e-9
+    
+    def __init__(self, threshold: float = 0.75):
+        self.threshold = threshold
+        self.seeds: List[Tuple[str, FrozenSet[str]]] = []
+        self.service_blocks: Dict[str, List[int]] = {}
+        self.length_blocks: Dict[int, List[int]] = {}
+        
+        # Upper bound of the combined score for pairs without shared services
+        self.require_service = threshold > LEVENSHTEIN_WEIGHT + self.EPSILON
+        # Lower bound of min(len) / max(len) for any match
+        self.min_length_ratio = (threshold - SERVICE_WEIGHT) / LEVENSHTEIN_WEIGHT - self.EPSILON
+        
+        self.items = 0
+        self.candidate_pairs = 0
+        self.compared_pairs = 0
+        
+    @staticmethod
+    def features(name: str) -> Tuple[str, FrozenSet[str]]:
+        """Normalized name and service set used for blocking and scoring"""
+        normalized = WorkflowNormalizer.normalize_name(name)
+        return normalized, frozenset(WorkflowNormalizer.extract_services(normalized))
+    
+    def add(self, name: str) -> int:
+        """Assign a name to the earliest matching seed, or make it a new seed
+        
+        Returns the seed (cluster) id; a new seed gets the next free id.
+        """
+        normalized, services = self.features(name)
+        self.items += 1
+        
+        for seed_id in self.candidates(normalized, services):
+            self.candidate_pairs += 1
+            seed_normalized, seed_services = self.seeds[seed_id]
+            if self.matches(seed_normalized, seed_services, normalized, services):
+                return seed_id
+                
+        seed_id = len(self.seeds)
+        self.seeds.append((normalized, services))
+        self.index_seed(seed_id, normalized, services)
+        return seed_id
+    
+    def candidates(self, normalized: str, services: FrozenSet[str]) -> List[int]:
+        """Seed ids sharing a block with the name, in seed order"""
+        if self.min_length_ratio <= 0:
+            # Length and service bounds prune nothing at this threshold
+            return list(range(len(self.seeds)))
+            
+        if not normalized:
+            return []
+            
+        if self.require_service:
+            if len(services) == 1:
+                return self.service_blocks.get(next(iter(services)), [])
+            found = set()
+            for service in services:
+                found.update(self.service_blocks.get(service, ()))
+            return sorted(found)
+            
+        length = len(normalized)
+        found = set()
+        for seed_length, seed_ids in self.length_blocks.items():
+            if min(length, seed_length) >= self.min_length_ratio * max(length, seed_length):
+                found.update(seed_ids)
+        return sorted(found)
+    
+    def index_seed(self, seed_id: int, normalized: str, services: FrozenSet[str]):
+        """Register a new seed in its blocks"""
+        if not normalized or self.min_length_ratio <= 0:
+            return
+            
+        if self.require_service:
+            for service in services:
+                self.service_blocks.setdefault(service, []).append(seed_id)
+        else:
+            self.length_blocks.setdefault(len(normalized), []).append(seed_id)
+    
+    def matches(self, norm1: str, services1: FrozenSet[str],
+                norm2: str, services2: FrozenSet[str]) -> bool:
+        """Exact calculate_similarity(...) >= threshold on precomputed features"""
+        if not norm1 or not norm2:
+            return 0.0 >= self.threshold
+            
+        if services1 and services2:
+            service_similarity = len(services1 & services2) / len(services1 | services2)
+        else:
+            service_similarity = 0.0
+            
+        # Largest edit distance that can still reach the threshold
+        max_len = max(len(norm1), len(norm2))
+        required = (self.threshold - SERVICE_WEIGHT * service_similarity) / LEVENSHTEIN_WEIGHT
+        max_distance = math.floor((1 - required) * max_len + self.EPSILON)
+        if max_distance < abs(len(norm1) - len(norm2)):
+            return False
+            
+        self.compared_pairs += 1
+        edit_distance = distance(norm1, norm2, score_cutoff=max_distance)
+        if edit_distance > max_distance:
+            return False
+            
+        lev_similarity = 1 - (edit_distance / max_len)
+        similarity = LEVENSHTEIN_WEIGHT * lev_similarity + SERVICE_WEIGHT * service_similarity
+        return similarity >= self.threshold
+    
+    def stats(self) -> Dict:
+        """Candidate-pair counters compared to the naive pairwise scan"""
+        total_pairs = self.items * (self.items - 1) // 2
+        return {
+            "items": self.items,
+            "clusters": len(self.seeds),
+            "total_pairs": total_pairs,
+            "candidate_pairs": self.candidate_pairs,
+            "compared_pairs": self.compared_pairs,
+            "pruning_ratio": round(1 - self.candidate_pairs / total_pairs, 4) if total_pairs else 0.0
+        }
@@ -1,130 +1,307 @@
+import os
+import time
+import asyncio
 import logging
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional, Set
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
-from db.models import Workflow
+from sqlalchemy import delete
+from db.models import Workflow, WorkflowObservation, WorkflowRaw, WorkflowMetricSnapshot, WorkflowTrend
 from collectors.youtube import YouTubeCollector
 from collectors.forum import ForumCollector
 from collectors.google import GoogleCollector
 from services.scoring import WorkflowScorer
-from services.normalizer import WorkflowNormalizer
+from services.incremental import detect_changes, ClusterWriter
+from services.stats import refresh_stats, get_generation
+from services.snapshots import update_history
+from services.metrics import record_pipeline
 
 logger = logging.getLogger(__name__)
 
-async def run_pipeline(session: AsyncSession, platforms: List[str] = None, force: bool = False) -> Dict:
-    """Run the complete data collection and processing pipeline"""
-    
+# Collectors by platform name
+COLLECTORS = {
+    "YouTube": YouTubeCollector,
+    "Forum": ForumCollector,
+    "Google": GoogleCollector,
+}
+
+# Per-platform collection timeouts in seconds
+COLLECTOR_TIMEOUTS = {
+    "YouTube": float(os.getenv("YOUTUBE_COLLECT_TIMEOUT", "900")),
+    "Forum": float(os.getenv("FORUM_COLLECT_TIMEOUT", "600")),
+    "Google": float(os.getenv("GOOGLE_COLLECT_TIMEOUT", "600")),
+}
+
+# Batches buffered between pipeline stages; a stage waits when its output is full
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))
+
+# Scored workflows the storage stage accumulates before it writes and commits
+STORE_BATCH_SIZE = int(os.getenv("STORE_BATCH_SIZE", "500"))
+
+# Marks the end of a stage's input
+END = None
+
+def add_stage_time(results: Dict, stage: str, started: float):
+    """Add the time since started (perf_counter) to a stage's total"""
+    stage_seconds = results["stage_seconds"]
+    stage_seconds[stage] = stage_seconds.get(stage, 0.0) + time.perf_counter() - started
+
+async def collect_platform(platform: str, results: Dict, queue: asyncio.Queue,
+                           collectors: Optional[Dict[str, Callable]] = None) -> int:
+    """Stream one platform's batches into queue under its timeout
+
+    Failures are recorded in results["errors"]; batches queued before a
+    failure or timeout are kept. Time spent waiting for room in the queue
+    does not count against the timeout. Returns the number of items queued,
+    which are also counted into results["collected"] as they are queued.
+    """
+    collector = None
+    count = 0
+    timeout = COLLECTOR_TIMEOUTS[platform]
+    started = time.monotonic()
+    deadline = started + timeout
+    try:
+        collector = (collectors or COLLECTORS)[platform]()
+        batches = collector.stream()
+        try:
+            while True:
+                try:
+                    batch = await asyncio.wait_for(anext(batches), deadline - time.monotonic())
+                except StopAsyncIteration:
+                    break
+                count += len(batch)
+                results["collected"] += len(batch)
+                waiting = time.monotonic()
+                await queue.put(batch)
+                deadline += time.monotonic() - waiting
+        finally:
+            await batches.aclose()
+        logger.info(f"Collected {count} {platform} workflows")
+    except asyncio.TimeoutError:
+        error_msg = f"{platform} collection timed out after {timeout:.0f}s, keeping {count} partial results"
+        logger.error(error_msg)
+        results["errors"].append(error_msg)
+    except Exception as e:
+        error_msg = f"{platform} collection failed: {e}"
+        logger.error(error_msg)
+        results["errors"].append(error_msg)
+    finally:
+        if collector is not None and hasattr(collector, "stats"):
+            results["collector_stats"][platform] = collector.stats()
+        if collector is not None and hasattr(collector, "close"):
+            await collector.close()
+        results["collect_seconds"][platform] = round(time.monotonic() - started, 2)
+
+    return count
+
+async def collect_stage(platforms: List[str], results: Dict, output: asyncio.Queue,
+                        collectors: Optional[Dict[str, Callable]]):
+    """Run the selected collectors concurrently into one queue"""
+    await asyncio.gather(
+        *(collect_platform(platform, results, output, collectors) for platform in platforms)
+    )
+    results["stage"] = "processing"
+    await output.put(END)
+
+async def score_stage(session: AsyncSession, db_lock: asyncio.Lock, force: bool, results: Dict,
+                      source: asyncio.Queue, output: asyncio.Queue):
+    """Detect changes in each collected batch and score the new and changed items
+
+    With force, existing data is cleared when the first batch arrives, so a
+    run that collects nothing leaves the database alone. The clear is not
+    committed on its own: it lands with the run's writes, see store_stage.
+    An item collected more than once in a run (same observation key) is
+    handled the first time only; later copies are dropped.
+    """
+    seen: Set[str] = set()
+    cleared = not force
+    while True:
+        batch = await source.get()
+        if batch is END:
+            break
+
+        async with db_lock:
+            if not cleared:
+                # Clear existing data, history is keyed by the old row ids
+                await session.execute(delete(WorkflowTrend))
+                await session.execute(delete(WorkflowMetricSnapshot))
+                await session.execute(delete(WorkflowObservation))
+                await session.execute(delete(WorkflowRaw))
+                await session.execute(delete(Workflow))
+                cleared = True
+            started = time.perf_counter()
+            changes = await detect_changes(session, batch, seen)
+            add_stage_time(results, "detect", started)
+
+        results["new"] += changes["new"]
+        results["changed"] += changes["changed"]
+        results["unchanged"] += changes["unchanged"]
+        if changes["fresh"]:
+            started = time.perf_counter()
+            WorkflowScorer.score_workflows([workflow for _, _, workflow in changes["fresh"]])
+            add_stage_time(results, "score", started)
+            await output.put(changes)
+
+    await output.put(END)
+
+def count_written(results: Dict, written: Dict[str, Set[int]]):
+    """Row counts from the distinct ids written so far
+
+    A row re-merged by several flushes counts once; a row inserted and then
+    deleted by the same run counts as neither.
+    """
+    results["inserted"] = len(written["inserted"] - written["deleted"])
+    results["updated"] = len(written["written"] - written["inserted"] - written["deleted"])
+    results["deleted"] = len(written["deleted"] - written["inserted"])
+    results["stored"] = results["inserted"] + results["updated"]
+
+async def store_stage(session: AsyncSession, db_lock: asyncio.Lock, writer: ClusterWriter, force: bool,
+                      results: Dict, source: asyncio.Queue, started: float):
+    """Cluster scored changes and write them in STORE_BATCH_SIZE batches
+
+    Every flush commits, so rows land while collection is still running.
+    A forced run commits nothing until it has succeeded, so a failure
+    cannot leave the cleared tables behind.
+    """
+    written = results["written"]
+    loaded = False
+    pending = {"fresh": [], "previous": {}}
+
+    async def flush():
+        nonlocal loaded
+        async with db_lock:
+            flush_started = time.perf_counter()
+            if not loaded:
+                await writer.load()
+                loaded = True
+            stored = await writer.apply(pending)
+            if not force:
+                await session.commit()
+            # Dedup time is reported on its own
+            add_stage_time(results, "store", flush_started)
+        if "first_write_seconds" not in results:
+            results["first_write_seconds"] = round(time.monotonic() - started, 2)
+        results["processed"] += len(pending["fresh"])
+        written["written"].update(stored["workflow_ids"])
+        written["inserted"].update(stored["inserted_ids"])
+        written["deleted"].update(stored["deleted_ids"])
+        count_written(results, written)
+
+    while True:
+        changes = await source.get()
+        if changes is END:
+            break
+        pending["fresh"].extend(changes["fresh"])
+        pending["previous"].update(changes["previous"])
+        if len(pending["fresh"]) >= STORE_BATCH_SIZE:
+            await flush()
+            pending = {"fresh": [], "previous": {}}
+
+    if pending["fresh"]:
+        await flush()
+
+def finish_stage_times(results: Dict, writer: ClusterWriter, started: float):
+    """Split dedup out of the store stage, add the total and round"""
+    stage_seconds = results["stage_seconds"]
+    if "dedup" not in stage_seconds:
+        stage_seconds["dedup"] = writer.dedup_seconds
+        if "store" in stage_seconds:
+            stage_seconds["store"] -= writer.dedup_seconds
+    stage_seconds["total"] = time.monotonic() - started
+    results["stage_seconds"] = {stage: round(seconds, 3) for stage, seconds in stage_seconds.items()}
+
+async def refresh_summary(session: AsyncSession, written: Dict[str, Set[int]], results: Dict):
+    """Snapshot the rows a run wrote and refresh workflow_stats, bumping the generation"""
+    await update_history(session, sorted(written["written"] - written["deleted"]))
+    results["generation"] = await refresh_stats(session)
+    await session.commit()
+
+async def run_pipeline(session: AsyncSession, platforms: List[str] = None, force: bool = False,
+                       collectors: Optional[Dict[str, Callable]] = None,
+                       results: Optional[Dict] = None) -> Dict:
+    """Run the complete data collection and processing pipeline
+
+    Collection, change detection + scoring, and clustering + storage run as
+    concurrent stages connected by bounded queues, so only a few batches
+    are in memory at a time. Storage commits as it goes; if a run fails
+    after some commits, history and stats are still refreshed for them,
+    so the summary and cache generation match the stored rows. A forced
+    run is one transaction and rolls back completely.
+
+    collectors overrides the collector factories per platform name, e.g.
+    with stubs for offline benchmarks. Pass a dict as ``results`` to watch
+    the counts and the current "stage" while the pipeline runs; it is
+    filled in place and returned.
+    """
+
     if platforms is None:
         platforms = ["YouTube", "Forum", "Google"]
-    
+
     logger.info(f"Starting pipeline for platforms: {platforms}")
-    
-    all_workflows = []
-    results = {"collected": 0, "processed": 0, "stored": 0, "errors": []}
-    
-    # Data Collection Phase
+
+    if results is None:
+        results = {}
+    results.update({"stage": "collecting", "collected": 0, "processed": 0, "stored": 0,
+                    "inserted": 0, "updated": 0, "deleted": 0, "new": 0, "changed": 0, "unchanged": 0,
+                    "errors": [], "collect_seconds": {}, "collector_stats": {}, "stage_seconds": {},
+                    "written": {"written": set(), "inserted": set(), "deleted": set()}})
+    started = time.monotonic()
+
+    selected = [platform for platform in (collectors or COLLECTORS) if platform in platforms]
+    collected: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    scored: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    # The stages share one session, one database call at a time
+    db_lock = asyncio.Lock()
+    writer = ClusterWriter(session)
+
+    stages = [
+        asyncio.create_task(collect_stage(selected, results, collected, collectors)),
+        asyncio.create_task(score_stage(session, db_lock, force, results, collected, scored)),
+        asyncio.create_task(store_stage(session, db_lock, writer, force, results, scored, started)),
+    ]
+
     try:
-        if "YouTube" in platforms:
-            try:
-                youtube_collector = YouTubeCollector()
-                youtube_data = await youtube_collector.collect_all()
-                all_workflows.extend(youtube_data)
-                logger.info(f"Collected {len(youtube_data)} YouTube workflows")
-            except Exception as e:
-                error_msg = f"YouTube collection failed: {e}"
-                logger.error(error_msg)
-                results["errors"].append(error_msg)
-        
-        if "Forum" in platforms:
-            try:
-                forum_collector = ForumCollector()
-                forum_data = await forum_collector.collect_all()
-                all_workflows.extend(forum_data)
-                await forum_collector.close()
-                logger.info(f"Collected {len(forum_data)} Forum workflows")
-            except Exception as e:
-                error_msg = f"Forum collection failed: {e}"
-                logger.error(error_msg)
-                results["errors"].append(error_msg)
-        
-        if "Google" in platforms:
-            try:
-                google_collector = GoogleCollector()
-                google_data = await google_collector.collect_all()
-                all_workflows.extend(google_data)
-                logger.info(f"Collected {len(google_data)} Google workflows")
-            except Exception as e:
-                error_msg = f"Google collection failed: {e}"
-                logger.error(error_msg)
-                results["errors"].append(error_msg)
-        
-        results["collected"] = len(all_workflows)
-        
-        if not all_workflows:
+        await asyncio.gather(*stages)
+
+        if not results["collected"]:
             raise Exception("No data collected from any platform")
-        
-        # Scoring Phase
-        for workflow in all_workflows:
-            workflow["popularity_score"] = WorkflowScorer.calculate_score(workflow)
-        
-        # Normalization and Deduplication Phase
-        normalized_workflows = WorkflowNormalizer.deduplicate_workflows(all_workflows)
-        results["processed"] = len(normalized_workflows)
-        
-        # Database Storage Phase
-        if force:
-            # Clear existing data
-            await session.execute(delete(Workflow))
-            await session.commit()
-        
-        stored_count = 0
-        for workflow_data in normalized_workflows:
-            # Check if workflow exists
-            stmt = select(Workflow).where(
-                Workflow.workflow_name == workflow_data.get("workflow", ""),
-                Workflow.platform == workflow_data.get("platform", ""),
-                Workflow.country == workflow_data.get("country", "")
-            )
-            result = await session.execute(stmt)
-            existing = result.scalar_one_or_none()
-            
-            if existing:
-                # Update existing workflow
-                for key, value in workflow_data.items():
-                    if hasattr(existing, key):
-                        setattr(existing, key, value)
-            else:
-                # Create new workflow
-                workflow = Workflow(
-                    workflow_name=workflow_data.get("workflow", ""),
-                    platform=workflow_data.get("platform", ""),
-                    country=workflow_data.get("country", ""),
-                    views=workflow_data.get("views", 0),
-                    likes=workflow_data.get("likes", 0),
-                    comments=workflow_data.get("comments", 0),
-                    replies=workflow_data.get("replies", 0),
-                    contributors=workflow_data.get("contributors", 0),
-                    search_volume=workflow_data.get("search_volume", 0),
-                    like_to_view_ratio=workflow_data.get("like_to_view_ratio", 0.0),
-                    comment_to_view_ratio=workflow_data.get("comment_to_view_ratio", 0.0),
-                    popularity_score=workflow_data.get("popularity_score", 0.0),
-                    url=workflow_data.get("url"),
-                    title=workflow_data.get("title"),
-                    description=workflow_data.get("description"),
-                    raw_data=workflow_data
-                )
-                session.add(workflow)
-                stored_count += 1
-        
-        await session.commit()
-        results["stored"] = stored_count
-        
+
+        results["dedup"] = writer.stats()
+        logger.info(f"Deduplication candidate pairs: {results['dedup']}")
+
+        written = results.pop("written")
+        if written["written"] or written["deleted"]:
+            # History Phase
+            results["stage"] = "history"
+            history_started = time.perf_counter()
+            await refresh_summary(session, written, results)
+            add_stage_time(results, "history", history_started)
+        else:
+            logger.info("No new or changed workflows, nothing to store")
+            results["generation"] = await get_generation(session) or 0
+        results["stage"] = "done"
+        finish_stage_times(results, writer, started)
+        record_pipeline(results, "success")
+
         logger.info(f"Pipeline completed: {results}")
         return results
-        
+
     except Exception as e:
+        for stage in stages:
+            stage.cancel()
+        # Let cancelled stages leave the shared session before rolling back
+        await asyncio.gather(*stages, return_exceptions=True)
         await session.rollback()
+        written = results.pop("written", None)
+        if written and not force and (written["written"] or written["deleted"]):
+            # Earlier flushes were committed; keep the summary in step with them
+            try:
+                await refresh_summary(session, written, results)
+            except Exception as summary_error:
+                await session.rollback()
+                logger.error(f"Could not refresh stats after the failed run: {summary_error}")
+        finish_stage_times(results, writer, started)
+        record_pipeline(results, "failed")
         error_msg = f"Pipeline failed: {e}"
         logger.error(error_msg)
         results["errors"].append(error_msg)
-        raise Exception(error_msg)
\ No newline at end of file
+        raise Exception(error_msg)
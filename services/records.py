@@ -0,0 +1,184 @@
+from functools import lru_cache
+from operator import attrgetter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+import numpy as np
+
+# Typed fields of a collected workflow, named as in the collectors' dicts.
+# id and keyword identify the source item (see services.incremental)
+TEXT_FIELDS = ["workflow", "platform", "country", "url", "title", "description", "id", "keyword"]
+INT_FIELDS = ["views", "likes", "comments", "replies", "contributors", "search_volume"]
+FLOAT_FIELDS = ["trend_change_60d", "avg_interest", "like_to_view_ratio", "comment_to_view_ratio",
+                "popularity_score"]
+FIELDS = TEXT_FIELDS + INT_FIELDS + FLOAT_FIELDS
+
+DEFAULTS = {
+    "workflow": "", "platform": "", "country": "",
+    **{name: None for name in ["url", "title", "description", "id", "keyword"]},
+    **{name: 0 for name in INT_FIELDS},
+    **{name: 0.0 for name in FLOAT_FIELDS},
+}
+
+# Bit per field in WorkflowRecord.present
+FIELD_BITS = {name: 1 << index for index, name in enumerate(FIELDS)}
+
+# Numbers (and None) are stored as given, so to_dict() serializes them
+# unchanged; anything else is coerced to the field's type
+KEEP_TYPES = (int, float, type(None))
+COERCE = {**{name: int for name in INT_FIELDS}, **{name: float for name in FLOAT_FIELDS}}
+
+# (name, bit, default, coercion) per slot
+SLOTS = [(name, FIELD_BITS[name], DEFAULTS[name], COERCE.get(name)) for name in FIELDS]
+
+# Platform codes of columnar batches; 0 is an unknown platform
+PLATFORM_CODES = {"youtube": 1, "forum": 2, "google": 3}
+
+# Distinct key sets (collector shapes) remembered by key_plan
+KEY_PLAN_CACHE_SIZE = 1024
+
+@lru_cache(maxsize=None)
+def layout(present: int) -> Tuple[Tuple[str, ...], Callable]:
+    """Names of the fields set in a present mask, and a getter returning their values as a tuple"""
+    names = tuple(name for name in FIELDS if present & FIELD_BITS[name])
+    if len(names) == 1:
+        name = names[0]
+        return names, lambda record: (getattr(record, name),)
+    return names, attrgetter(*names) if names else (lambda record: ())
+
+@lru_cache(maxsize=KEY_PLAN_CACHE_SIZE)
+def key_plan(keys: Tuple[str, ...]) -> Tuple[int, List, List, List[str]]:
+    """How to fill a record from a dict with these keys
+
+    Returns the present mask, (name, coercion) of the slots set, (name,
+    default) of the slots left at their default, and the extra keys.
+    """
+    present = 0
+    for key in keys:
+        present |= FIELD_BITS.get(key, 0)
+    setting = [(name, coerce) for name, bit, _, coerce in SLOTS if present & bit]
+    defaults = [(name, default) for name, bit, default, _ in SLOTS if not present & bit]
+    return present, setting, defaults, [key for key in keys if key not in FIELD_BITS]
+
+class WorkflowRecord:
+    """One collected or merged workflow, with a slot per typed field
+
+    Metrics are coerced once when the record is built, so the scorer,
+    normalizer and storage read plain attributes instead of .get() and
+    int() on every pass. Fields the source did not set read as their
+    default but are left out of to_dict(), which returns exactly the dict a
+    collector used to emit, so content hashes and stored JSON are unchanged.
+    Keys without a slot (slugs, tags, merge bookkeeping) are kept in extra.
+    """
+
+    __slots__ = (*FIELDS, "present", "extra")
+
+    def __init__(self, **fields: Any):
+        self.fill(fields)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "WorkflowRecord":
+        record = cls.__new__(cls)
+        record.fill(data)
+        return record
+
+    def fill(self, data: Dict):
+        present, setting, defaults, extra = key_plan(tuple(data))
+        for name, coerce in setting:
+            value = data[name]
+            if coerce is not None and type(value) not in KEEP_TYPES:
+                value = coerce(value)
+            setattr(self, name, value)
+        for name, default in defaults:
+            setattr(self, name, default)
+        self.present = present
+        # Most sources fill only slots
+        self.extra: Optional[Dict[str, Any]] = {key: data[key] for key in extra} if extra else None
+
+    def to_dict(self) -> Dict:
+        """The collector-shaped dict, with only the fields that were set"""
+        names, values = layout(self.present)
+        data = dict(zip(names, values(self)))
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def update(self, **fields: Any):
+        """Set fields like dict.update; keys without a slot go to extra"""
+        for name, value in fields.items():
+            bit = FIELD_BITS.get(name)
+            if bit is None:
+                if self.extra is None:
+                    self.extra = {}
+                self.extra[name] = value
+                continue
+            coerce = COERCE.get(name)
+            if coerce is not None and type(value) not in KEEP_TYPES:
+                value = coerce(value)
+            setattr(self, name, value)
+            self.present |= bit
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """Dict-style read of a field that was set, or of an extra key"""
+        bit = FIELD_BITS.get(name)
+        if bit is not None:
+            return getattr(self, name) if self.present & bit else default
+        return self.extra.get(name, default) if self.extra else default
+
+    def copy(self) -> "WorkflowRecord":
+        record = WorkflowRecord.__new__(WorkflowRecord)
+        for name in FIELDS:
+            setattr(record, name, getattr(self, name))
+        record.present = self.present
+        record.extra = dict(self.extra) if self.extra else None
+        return record
+
+    def __repr__(self) -> str:
+        return f"WorkflowRecord({self.to_dict()!r})"
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, WorkflowRecord):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    __hash__ = None
+
+def as_record(item: Union[WorkflowRecord, Dict]) -> WorkflowRecord:
+    """Records pass through; dicts from older collectors or stored JSON are converted"""
+    return item if isinstance(item, WorkflowRecord) else WorkflowRecord.from_dict(item)
+
+def as_records(items: Iterable[Union[WorkflowRecord, Dict]]) -> List[WorkflowRecord]:
+    return [as_record(item) for item in items]
+
+class WorkflowBatch:
+    """Columnar view of records for the bulk stages
+
+    One numpy array per numeric field plus platform codes, each read from
+    the records' slots in a single pass.
+    """
+
+    __slots__ = ("records", "columns", "platform_codes")
+
+    def __init__(self, records: List[WorkflowRecord], int_fields: List[str] = INT_FIELDS,
+                 float_fields: List[str] = FLOAT_FIELDS):
+        count = len(records)
+        self.records = records
+        self.columns: Dict[str, np.ndarray] = {
+            name: np.fromiter(map(attrgetter(name), records), dtype=np.int64, count=count)
+            for name in int_fields
+        }
+        for name in float_fields:
+            self.columns[name] = np.fromiter(map(attrgetter(name), records), dtype=np.float64, count=count)
+        self.platform_codes = np.fromiter(
+            (PLATFORM_CODES.get(record.platform.lower(), 0) for record in records),
+            dtype=np.int8,
+            count=count
+        )
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def assign(self, name: str, values: np.ndarray):
+        """Write one column back onto the records, e.g. computed scores"""
+        bit = FIELD_BITS[name]
+        for record, value in zip(self.records, values.tolist()):
+            setattr(record, name, value)
+            record.present |= bit
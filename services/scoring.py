@@ -1,9 +1,17 @@
 import math
 import logging
-from typing import Dict, List
+from typing import Dict, List, Tuple
+import numpy as np
+from services.records import WorkflowRecord, WorkflowBatch, PLATFORM_CODES
 
 logger = logging.getLogger(__name__)
 
+PLATFORM_NAMES = {code: name for name, code in PLATFORM_CODES.items()}
+
+# Metric columns of a score batch
+INT_COLUMNS = ["views", "likes", "comments", "replies", "contributors", "search_volume"]
+FLOAT_COLUMNS = ["trend_change_60d"]
+
 class WorkflowScorer:
     """Calculate popularity scores using platform-specific algorithms"""
     
@@ -70,13 +78,81 @@ class WorkflowScorer:
             return 0.0
     
     @staticmethod
-    def merge_workflow_scores(workflows: List[Dict]) -> List[Dict]:
+    def score_columns(workflows: List[WorkflowRecord]) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+        """Build a columnar score batch (metric arrays, platform codes) from records"""
+        batch = WorkflowBatch(workflows, INT_COLUMNS, FLOAT_COLUMNS)
+        return batch.columns, batch.platform_codes
+    
+    @classmethod
+    def score_batch(cls, columns: Dict[str, np.ndarray], platform_codes: np.ndarray) -> np.ndarray:
+        """Vectorized calculate_score over a columnar batch
+        
+        Uses the same formulas and operation order as the scalar functions.
+        Values that land within rounding distance of a .xx5 boundary are
+        re-scored with the scalar function, since np.log and np.round may
+        differ from math.log and round() in the last bit there; the result
+        matches calculate_score exactly.
+        """
+        raw = np.zeros(len(platform_codes), dtype=np.float64)
+        
+        with np.errstate(divide="ignore", invalid="ignore"):
+            youtube = platform_codes == PLATFORM_CODES["youtube"]
+            if youtube.any():
+                views = columns["views"][youtube]
+                like_ratio = columns["likes"][youtube] / views
+                comment_ratio = columns["comments"][youtube] / views
+                engagement = 0.6 * like_ratio + 0.4 * comment_ratio
+                score = np.log(views + 1) * (1 + engagement * 10)
+                raw[youtube] = np.where(views == 0, 0.0, score)
+                
+            forum = platform_codes == PLATFORM_CODES["forum"]
+            if forum.any():
+                views = columns["views"][forum]
+                score = (
+                    np.log(views + 1) +
+                    columns["replies"][forum] * 0.4 +
+                    columns["contributors"][forum] * 0.6 +
+                    columns["likes"][forum] * 0.5
+                )
+                raw[forum] = np.where(views == 0, 0.0, score)
+                
+            google = platform_codes == PLATFORM_CODES["google"]
+            if google.any():
+                score = columns["search_volume"][google] * 0.001 + columns["trend_change_60d"][google] * 10
+                raw[google] = np.where(score < 0, 0.0, score)
+                
+            scores = np.round(raw, 2)
+            
+            # Positions where the last bit can decide the rounding
+            scaled = np.abs(raw * 100)
+            near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+            exact = near_half | (scaled > 1e9) | ~np.isfinite(raw)
+            
+        for i in np.flatnonzero(exact):
+            data = {name: column[i].item() for name, column in columns.items()}
+            data["platform"] = PLATFORM_NAMES.get(int(platform_codes[i]), "")
+            scores[i] = cls.calculate_score(data)
+            
+        return scores
+    
+    @classmethod
+    def score_workflows(cls, workflows: List[WorkflowRecord]) -> List[WorkflowRecord]:
+        """Set popularity_score on every record with one score_batch call"""
+        if not workflows:
+            return workflows
+            
+        batch = WorkflowBatch(workflows, INT_COLUMNS, FLOAT_COLUMNS)
+        batch.assign("popularity_score", cls.score_batch(batch.columns, batch.platform_codes))
+        return workflows
+    
+    @staticmethod
+    def merge_workflow_scores(workflows: List[WorkflowRecord]) -> List[WorkflowRecord]:
         """Merge scores for same workflow across platforms"""
         workflow_groups = {}
         
         # Group by normalized workflow name
         for workflow in workflows:
-            name = workflow.get("workflow", "").lower().strip()
+            name = workflow.workflow.lower().strip()
             if name not in workflow_groups:
                 workflow_groups[name] = []
             workflow_groups[name].append(workflow)
@@ -88,27 +164,27 @@ class WorkflowScorer:
                 continue
                 
             # Use highest scoring entry as base
-            base_workflow = max(group, key=lambda x: x.get("popularity_score", 0))
+            base_workflow = max(group, key=lambda x: x.popularity_score)
             
             # Aggregate metrics
-            total_views = sum(int(w.get("views", 0)) for w in group)
-            total_likes = sum(int(w.get("likes", 0)) for w in group)
-            total_comments = sum(int(w.get("comments", 0)) for w in group)
+            total_views = sum(int(w.views) for w in group)
+            total_likes = sum(int(w.likes) for w in group)
+            total_comments = sum(int(w.comments) for w in group)
             
             # Calculate combined score
-            platform_scores = [w.get("popularity_score", 0) for w in group]
+            platform_scores = [w.popularity_score for w in group]
             combined_score = sum(platform_scores) * 0.7 + max(platform_scores) * 0.3
             
             merged_workflow = base_workflow.copy()
-            merged_workflow.update({
-                "views": total_views,
-                "likes": total_likes,
-                "comments": total_comments,
-                "popularity_score": round(combined_score, 2),
-                "platforms": [w.get("platform") for w in group],
-                "platform_count": len(set(w.get("platform") for w in group))
-            })
+            merged_workflow.update(
+                views=total_views,
+                likes=total_likes,
+                comments=total_comments,
+                popularity_score=round(combined_score, 2),
+                platforms=[w.get("platform") for w in group],
+                platform_count=len(set(w.get("platform") for w in group))
+            )
             
             merged_workflows.append(merged_workflow)
         
-        return sorted(merged_workflows, key=lambda x: x.get("popularity_score", 0), reverse=True)
\ No newline at end of file
+        return sorted(merged_workflows, key=lambda x: x.popularity_score, reverse=True)
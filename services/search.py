@@ -0,0 +1,152 @@
+import os
+import re
+import logging
+from typing import List, Optional, Set, Tuple
+from sqlalchemy import select, func, desc, literal, literal_column, or_, table, column
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+from db.models import Workflow, WORKFLOW_RESPONSE_COLUMNS
+from db.search import SEARCH_LANGUAGE
+
+logger = logging.getLogger(__name__)
+
+# Share of a misspelled query's trigrams a workflow name must contain to
+# match it (pg_trgm word_similarity; 0.6 is the pg_trgm default)
+SEARCH_FUZZY_THRESHOLD = float(os.getenv("SEARCH_FUZZY_THRESHOLD", "0.6"))
+
+# Trigram candidates SQLite scores for fuzzy matches per search
+SEARCH_FUZZY_CANDIDATES = int(os.getenv("SEARCH_FUZZY_CANDIDATES", "200"))
+
+# Stored platform values; filters are matched exactly against these
+PLATFORMS = ["YouTube", "Forum", "Google"]
+PLATFORM_VALUES = {platform.lower(): platform for platform in PLATFORMS}
+
+WORD = re.compile(r"\w+")
+
+# SQLite FTS5 tables, see db.search
+workflows_fts = table("workflows_fts", column("rowid"))
+workflows_trgm = table("workflows_trgm", column("rowid"))
+
+def platform_value(platform: Optional[str]) -> Optional[str]:
+    """Stored spelling of a platform filter, so it can use the B-tree indexes"""
+    if not platform:
+        return None
+    platform = platform.strip()
+    return PLATFORM_VALUES.get(platform.lower(), platform)
+
+def country_value(country: Optional[str]) -> Optional[str]:
+    """Stored spelling of a country filter: ISO codes upper case, or Unknown"""
+    if not country:
+        return None
+    country = country.strip()
+    return "Unknown" if country.lower() == "unknown" else country.upper()
+
+def normalize_query(query: str) -> str:
+    """Lower case with collapsed whitespace; search is case-insensitive"""
+    return " ".join(query.lower().split())
+
+def filtered(query, platform: Optional[str], country: Optional[str]):
+    if platform:
+        query = query.where(Workflow.platform == platform)
+    if country:
+        query = query.where(Workflow.country == country)
+    return query
+
+def trigrams(words: List[str]) -> Set[str]:
+    """pg_trgm style trigrams: each word padded with two spaces before and one after"""
+    grams = set()
+    for word in words:
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def word_similarity(query_grams: Set[str], name: str) -> float:
+    """Share of the query's trigrams found in the name"""
+    if not query_grams:
+        return 0.0
+    return len(query_grams & trigrams(WORD.findall(name.lower()))) / len(query_grams)
+
+async def search_workflows(session: AsyncSession, query: str, platform: Optional[str] = None,
+                           country: Optional[str] = None, limit: int = 20) -> List[Tuple[Workflow, float]]:
+    """Workflows matching a search query with their rank, best first
+
+    Matches words of the name, title and description, and names that are
+    close misspellings of the query. Filters are stored values, see
+    platform_value and country_value.
+    """
+    if not WORD.search(query):
+        return []
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        return await _search_postgresql(session, query, platform, country, limit)
+    if dialect == "sqlite":
+        return await _search_sqlite(session, query, platform, country, limit)
+    raise ValueError(f"Workflow search is not supported for {dialect}")
+
+async def _search_postgresql(session: AsyncSession, query: str, platform: Optional[str],
+                             country: Optional[str], limit: int) -> List[Tuple[Workflow, float]]:
+    """One query over both GIN indexes: tsvector words or trigram name similarity"""
+    # Threshold of the <% operator for this transaction only
+    await session.execute(
+        select(func.set_config("pg_trgm.word_similarity_threshold", str(SEARCH_FUZZY_THRESHOLD), True))
+    )
+    vector = literal_column("workflows.search_vector")
+    tsquery = func.websearch_to_tsquery(literal_column(f"'{SEARCH_LANGUAGE}'::regconfig"), query)
+    rank = (func.ts_rank_cd(vector, tsquery) + func.word_similarity(query, Workflow.workflow_name)).label("rank")
+
+    statement = filtered(
+        select(Workflow, rank).options(load_only(*WORKFLOW_RESPONSE_COLUMNS)).where(or_(
+            vector.op("@@")(tsquery),
+            literal(query).op("<%")(Workflow.workflow_name)
+        )),
+        platform, country
+    ).order_by(desc(rank), desc(Workflow.popularity_score), desc(Workflow.id)).limit(limit)
+
+    result = await session.execute(statement)
+    return [(workflow, float(score)) for workflow, score in result.all()]
+
+async def _search_sqlite(session: AsyncSession, query: str, platform: Optional[str],
+                         country: Optional[str], limit: int) -> List[Tuple[Workflow, float]]:
+    """FTS5 word matches by bm25, then trigram near-misses of the name"""
+    words = WORD.findall(query)
+
+    # Every word must match; the last may be a prefix of one
+    match = " ".join(f'"{word}"' for word in words) + "*"
+    # bm25 is lower for better matches; weighted like the tsvector's A, B, C
+    bm25 = literal_column("bm25(workflows_fts, 10.0, 4.0, 1.0)")
+    statement = filtered(
+        select(Workflow, bm25)
+        .options(load_only(*WORKFLOW_RESPONSE_COLUMNS))
+        .join(workflows_fts, workflows_fts.c.rowid == Workflow.id)
+        .where(literal_column("workflows_fts").op("MATCH")(match)),
+        platform, country
+    ).order_by(bm25, desc(Workflow.popularity_score), desc(Workflow.id)).limit(limit)
+    result = await session.execute(statement)
+    results = [(workflow, -float(score)) for workflow, score in result.all()]
+    if len(results) >= limit:
+        return results
+
+    # Names sharing any trigram with the query, scored like pg_trgm's word_similarity
+    grams = {word[i:i + 3] for word in words for i in range(len(word) - 2)}
+    if not grams:
+        return results
+    found = {workflow.id for workflow, _ in results}
+    statement = filtered(
+        select(Workflow)
+        .options(load_only(*WORKFLOW_RESPONSE_COLUMNS))
+        .join(workflows_trgm, workflows_trgm.c.rowid == Workflow.id)
+        .where(literal_column("workflows_trgm").op("MATCH")(" OR ".join(f'"{gram}"' for gram in sorted(grams)))),
+        platform, country
+    ).order_by(literal_column("workflows_trgm.rank")).limit(SEARCH_FUZZY_CANDIDATES)
+    candidates = (await session.execute(statement)).scalars().all()
+
+    query_grams = trigrams(words)
+    fuzzy = []
+    for workflow in candidates:
+        if workflow.id in found:
+            continue
+        similarity = word_similarity(query_grams, workflow.workflow_name)
+        if similarity >= SEARCH_FUZZY_THRESHOLD:
+            fuzzy.append((workflow, similarity))
+    fuzzy.sort(key=lambda pair: (-pair[1], -(pair[0].popularity_score or 0.0), -pair[0].id))
+    return results + fuzzy[:limit - len(results)]
@@ -0,0 +1,188 @@
+import os
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import select, insert, delete, func, case, and_, literal, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from db.models import Workflow, WorkflowMetricSnapshot, WorkflowTrend
+from services.storage import UPSERT_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_RETENTION_DAYS = int(os.getenv("SNAPSHOT_RETENTION_DAYS", "180"))
+
+# Windows (in days) /workflows/trending can rank by
+TRENDING_WINDOWS = [int(days) for days in os.getenv("TRENDING_WINDOWS", "1,7,30").split(",")]
+
+SNAPSHOT_COLUMNS = ["views", "likes", "comments", "replies", "search_volume", "popularity_score"]
+
+SNAPSHOT_TABLE = WorkflowMetricSnapshot.__tablename__
+
+def month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1)
+
+def next_month(moment: datetime) -> datetime:
+    return datetime(moment.year + moment.month // 12, moment.month % 12 + 1, 1)
+
+def partition_name(month: datetime) -> str:
+    return f"{SNAPSHOT_TABLE}_{month.year}_{month.month:02d}"
+
+async def ensure_partitions(session: AsyncSession, now: datetime):
+    """Create this month's and next month's snapshot partitions on PostgreSQL"""
+    if session.get_bind().dialect.name != "postgresql":
+        return
+
+    month = month_start(now)
+    for _ in range(2):
+        upper = next_month(month)
+        await session.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF {SNAPSHOT_TABLE} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+        ))
+        month = upper
+
+async def record_snapshots(session: AsyncSession, workflow_ids: List[int], captured_at: datetime) -> int:
+    """Append snapshots of the given workflows, and of any workflow without history yet
+
+    Unchanged workflows are not snapshotted again; their latest snapshot
+    stays valid until they change.
+    """
+    await ensure_partitions(session, captured_at)
+
+    columns = [getattr(Workflow, column) for column in SNAPSHOT_COLUMNS]
+    target = ["workflow_id", "captured_at", *SNAPSHOT_COLUMNS]
+    source = select(Workflow.id, literal(captured_at, WorkflowMetricSnapshot.captured_at.type), *columns)
+
+    recorded = 0
+    ids = sorted(set(workflow_ids))
+    for start in range(0, len(ids), UPSERT_CHUNK_SIZE):
+        chunk = ids[start:start + UPSERT_CHUNK_SIZE]
+        result = await session.execute(
+            insert(WorkflowMetricSnapshot).from_select(target, source.where(Workflow.id.in_(chunk)))
+        )
+        recorded += result.rowcount
+
+    has_history = select(WorkflowMetricSnapshot.workflow_id).where(
+        WorkflowMetricSnapshot.workflow_id == Workflow.id
+    ).exists()
+    result = await session.execute(
+        insert(WorkflowMetricSnapshot).from_select(target, source.where(~has_history))
+    )
+    recorded += result.rowcount
+
+    logger.info(f"Recorded {recorded} metric snapshots")
+    return recorded
+
+def latest_before(cutoff: datetime):
+    """Latest captured_at before cutoff of the enclosing snapshot's workflow (correlated)"""
+    older = aliased(WorkflowMetricSnapshot)
+    return select(func.max(older.captured_at)).where(
+        older.workflow_id == WorkflowMetricSnapshot.workflow_id,
+        older.captured_at < cutoff
+    ).scalar_subquery()
+
+async def apply_retention(session: AsyncSession, now: datetime,
+                          retention_days: int = SNAPSHOT_RETENTION_DAYS) -> int:
+    """Drop snapshots older than the retention period
+
+    Each workflow keeps its latest snapshot before the cutoff, since it is
+    the trend baseline of a workflow that has not changed since. PostgreSQL
+    drops whole monthly partitions once all of their rows have expired and
+    none of them is such a baseline; the remaining expired rows are deleted.
+    """
+    cutoff = now - timedelta(days=retention_days)
+    expired = delete(WorkflowMetricSnapshot).where(
+        WorkflowMetricSnapshot.captured_at < latest_before(cutoff)
+    )
+
+    if session.get_bind().dialect.name != "postgresql":
+        result = await session.execute(expired)
+        return result.rowcount
+
+    result = await session.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+        "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+        "WHERE parent.relname = :parent"
+    ), {"parent": SNAPSHOT_TABLE})
+
+    dropped = 0
+    for (name,) in result.all():
+        year, month = name[len(SNAPSHOT_TABLE) + 1:].split("_")
+        lower = datetime(int(year), int(month), 1)
+        if next_month(lower) > cutoff:
+            continue
+        baseline = select(WorkflowMetricSnapshot.workflow_id).where(
+            WorkflowMetricSnapshot.captured_at >= lower,
+            WorkflowMetricSnapshot.captured_at < next_month(lower),
+            WorkflowMetricSnapshot.captured_at == latest_before(cutoff)
+        ).limit(1)
+        if (await session.execute(baseline)).first() is None:
+            await session.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            dropped += 1
+    if dropped:
+        logger.info(f"Dropped {dropped} expired snapshot partitions")
+
+    result = await session.execute(expired)
+    return dropped + result.rowcount
+
+async def refresh_trends(session: AsyncSession, now: datetime, windows: Optional[List[int]] = None):
+    """Rebuild workflow_trends for every window with one INSERT ... SELECT each
+
+    The baseline is the latest snapshot at or before the start of the
+    window, or the earliest snapshot for workflows younger than it.
+    Velocity is the score delta per day since the baseline.
+    """
+    dialect = session.get_bind().dialect.name
+    computed_at = literal(now, WorkflowTrend.computed_at.type)
+    for window_days in windows or TRENDING_WINDOWS:
+        window_start = now - timedelta(days=window_days)
+        snapshot = WorkflowMetricSnapshot
+
+        baseline_at = func.coalesce(
+            func.max(case((snapshot.captured_at <= window_start, snapshot.captured_at))),
+            func.min(snapshot.captured_at)
+        )
+        baselines = (
+            select(snapshot.workflow_id, baseline_at.label("baseline_at"))
+            .group_by(snapshot.workflow_id)
+            .subquery()
+        )
+
+        score_delta = Workflow.popularity_score - snapshot.popularity_score
+        if dialect == "postgresql":
+            age_days = func.extract("epoch", computed_at - baselines.c.baseline_at) / 86400.0
+        else:
+            age_days = func.julianday(computed_at) - func.julianday(baselines.c.baseline_at)
+        source = (
+            select(
+                Workflow.id,
+                literal(window_days),
+                score_delta,
+                Workflow.views - snapshot.views,
+                func.coalesce(score_delta / func.nullif(age_days, 0), 0.0),
+                baselines.c.baseline_at,
+                computed_at
+            )
+            .join(baselines, baselines.c.workflow_id == Workflow.id)
+            .join(snapshot, and_(
+                snapshot.workflow_id == baselines.c.workflow_id,
+                snapshot.captured_at == baselines.c.baseline_at
+            ))
+        )
+
+        await session.execute(delete(WorkflowTrend).where(WorkflowTrend.window_days == window_days))
+        await session.execute(insert(WorkflowTrend).from_select(
+            ["workflow_id", "window_days", "score_delta", "views_delta", "velocity", "baseline_at", "computed_at"],
+            source
+        ))
+
+    logger.info(f"Trends refreshed for windows {windows or TRENDING_WINDOWS}")
+
+async def update_history(session: AsyncSession, workflow_ids: List[int], now: Optional[datetime] = None):
+    """Snapshot written workflows, expire old history and rebuild trend deltas"""
+    now = now or datetime.utcnow()
+    await record_snapshots(session, workflow_ids, now)
+    await apply_retention(session, now)
+    await refresh_trends(session, now)
@@ -0,0 +1,132 @@
+import logging
+from typing import Dict, Optional
+from sqlalchemy import select, func, desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.models import Workflow, WorkflowStats
+
+logger = logging.getLogger(__name__)
+
+# workflow_stats holds a single summary row
+STATS_ROW_ID = 1
+
+async def compute_stats(session: AsyncSession) -> Dict:
+    """Aggregate the workflows table in one grouped query
+    
+    Per (platform, country) group counts, score sums and latest update are
+    folded into the totals here; the top workflow rides along as an
+    uncorrelated scalar subquery, so this is a single round trip.
+    """
+    top_workflow = (
+        select(Workflow.workflow_name)
+        .order_by(desc(Workflow.popularity_score))
+        .limit(1)
+        .scalar_subquery()
+    )
+    query = select(
+        Workflow.platform,
+        Workflow.country,
+        func.count(Workflow.id),
+        func.count(Workflow.popularity_score),
+        func.sum(Workflow.popularity_score),
+        func.max(Workflow.updated_at),
+        top_workflow
+    ).group_by(Workflow.platform, Workflow.country)
+    
+    result = await session.execute(query)
+    
+    total_workflows = 0
+    scored = 0
+    score_sum = 0.0
+    platforms: Dict[str, int] = {}
+    countries: Dict[str, int] = {}
+    last_updated = None
+    top = None
+    
+    for platform, country, count, score_count, group_score_sum, group_updated, top in result.all():
+        total_workflows += count
+        scored += score_count
+        score_sum += group_score_sum or 0.0
+        platforms[platform] = platforms.get(platform, 0) + count
+        countries[country] = countries.get(country, 0) + count
+        if group_updated is not None and (last_updated is None or group_updated > last_updated):
+            last_updated = group_updated
+            
+    return {
+        "total_workflows": total_workflows,
+        "platforms": platforms,
+        "countries": countries,
+        "avg_popularity_score": round(score_sum / scored, 2) if scored else 0.0,
+        "top_workflow": top,
+        "last_updated": last_updated
+    }
+
+async def refresh_stats(session: AsyncSession) -> int:
+    """Recompute the summary row and bump the data generation
+    
+    Runs inside the caller's transaction so the summary commits together
+    with the data it describes. Returns the new generation.
+    """
+    stats = await compute_stats(session)
+    
+    row = await session.get(WorkflowStats, STATS_ROW_ID)
+    if row is None:
+        row = WorkflowStats(id=STATS_ROW_ID, generation=0)
+        session.add(row)
+        
+    for key, value in stats.items():
+        setattr(row, key, value)
+    row.generation = (row.generation or 0) + 1
+    await session.flush()
+    
+    logger.info(f"Workflow stats refreshed, generation {row.generation}")
+    return row.generation
+
+async def get_generation(session: AsyncSession) -> Optional[int]:
+    """Current data generation, or None before the first refresh"""
+    result = await session.execute(
+        select(WorkflowStats.generation).where(WorkflowStats.id == STATS_ROW_ID)
+    )
+    return result.scalar()
+
+class StatsCache:
+    """In-process copy of the summary row for one data generation"""
+    
+    def __init__(self):
+        self.generation: Optional[int] = None
+        self.stats: Optional[Dict] = None
+        
+    def get(self, generation: int) -> Optional[Dict]:
+        return self.stats if generation == self.generation else None
+    
+    def set(self, generation: int, stats: Dict):
+        self.generation = generation
+        self.stats = stats
+
+stats_cache = StatsCache()
+
+async def load_stats(session: AsyncSession) -> Dict:
+    """Stats for the API, independent of the size of the workflows table
+    
+    Only the generation number is read while the cache is current. Before
+    the first pipeline run there is no summary row and the stats are
+    computed directly.
+    """
+    generation = await get_generation(session)
+    if generation is None:
+        return await compute_stats(session)
+        
+    cached = stats_cache.get(generation)
+    if cached is not None:
+        return cached
+        
+    row = await session.get(WorkflowStats, STATS_ROW_ID)
+    stats = {
+        "total_workflows": row.total_workflows or 0,
+        "platforms": row.platforms or {},
+        "countries": row.countries or {},
+        "avg_popularity_score": row.avg_popularity_score or 0.0,
+        "top_workflow": row.top_workflow,
+        "last_updated": row.last_updated
+    }
+    stats_cache.set(generation, stats)
+    return stats
@@ -0,0 +1,192 @@
+import os
+import json
+import hashlib
+import logging
+from typing import List, Dict, Tuple, Union
+from sqlalchemy import select, tuple_, func, literal_column
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.models import Workflow, WorkflowObservation, WorkflowRaw
+from db.raw import compress_raw, decompress_raw
+from services.records import WorkflowRecord, as_record
+
+logger = logging.getLogger(__name__)
+
+UPSERT_CHUNK_SIZE = int(os.getenv("UPSERT_CHUNK_SIZE", "500"))
+
+# Unique key of a stored workflow (uq_workflow_platform_country)
+KEY_COLUMNS = ["workflow_name", "platform", "country"]
+
+# Columns overwritten when an existing row is upserted
+UPDATE_COLUMNS = [
+    "views", "likes", "comments", "replies", "contributors", "search_volume",
+    "like_to_view_ratio", "comment_to_view_ratio", "popularity_score",
+    "url", "title", "description", "content_hash"
+]
+
+# Columns overwritten when an observation is seen again
+OBSERVATION_UPDATE_COLUMNS = ["workflow_id", "content_hash", "popularity_score", "data"]
+
+def content_hash(data: Dict) -> str:
+    """Stable fingerprint of a JSON-serializable dict, independent of key order"""
+    encoded = json.dumps(data, sort_keys=True, default=str, separators=(",", ":")).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+def workflow_row(workflow: WorkflowRecord) -> Dict:
+    """Map a processed workflow record onto workflows table columns
+    
+    The record itself is stored apart, see raw_row.
+    """
+    return {
+        "workflow_name": workflow.workflow,
+        "platform": workflow.platform,
+        "country": workflow.country,
+        "views": workflow.views,
+        "likes": workflow.likes,
+        "comments": workflow.comments,
+        "replies": workflow.replies,
+        "contributors": workflow.contributors,
+        "search_volume": workflow.search_volume,
+        "like_to_view_ratio": workflow.like_to_view_ratio,
+        "comment_to_view_ratio": workflow.comment_to_view_ratio,
+        "popularity_score": workflow.popularity_score,
+        "url": workflow.url,
+        "title": workflow.title,
+        "description": workflow.description,
+        "content_hash": content_hash(workflow.to_dict())
+    }
+
+def raw_row(workflow_id: int, workflow: WorkflowRecord) -> Dict:
+    """workflow_raw row holding the compressed collector dict of a workflow"""
+    return {"workflow_id": workflow_id, "data": compress_raw(workflow.to_dict())}
+
+def row_key(row: Dict) -> Tuple[str, str, str]:
+    return tuple(row[column] for column in KEY_COLUMNS)
+
+async def upsert_workflows(session: AsyncSession, workflows: List[Union[WorkflowRecord, Dict]],
+                           chunk_size: int = UPSERT_CHUNK_SIZE) -> Dict[str, int]:
+    """Insert or update workflows in batched INSERT ... ON CONFLICT DO UPDATE
+
+    Workflows sharing a key are collapsed to the last one, matching the old
+    row-by-row behaviour. Existing rows whose content_hash is unchanged are
+    left alone; the rows written get their raw payload in workflow_raw.
+    Returns inserted and updated row counts; the caller owns the
+    transaction.
+    """
+    rows = {}
+    records = {}
+    for workflow in map(as_record, workflows):
+        row = workflow_row(workflow)
+        rows[row_key(row)] = row
+        records[row_key(row)] = workflow
+    rows = list(rows.values())
+
+    dialect = dialect_name(session)
+    upsert_chunk = _upsert_chunk_postgresql if dialect == "postgresql" else _upsert_chunk_sqlite
+
+    counts = {"inserted": 0, "updated": 0}
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        inserted, updated, written = await upsert_chunk(session, chunk)
+        counts["inserted"] += inserted
+        counts["updated"] += updated
+        # Raw payloads follow the rows that were actually written
+        await upsert_raw(session, [raw_row(workflow_id, records[key]) for workflow_id, key in written])
+
+    logger.info(f"Upserted {len(rows)} workflows: {counts}")
+    return counts
+
+async def upsert_observations(session: AsyncSession, observations: List[Dict],
+                              chunk_size: int = UPSERT_CHUNK_SIZE):
+    """Insert or overwrite workflow_observations rows by obs_key"""
+    insert = postgresql.insert if dialect_name(session) == "postgresql" else sqlite.insert
+    stmt = insert(WorkflowObservation.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["obs_key"],
+        set_={
+            **{column: stmt.excluded[column] for column in OBSERVATION_UPDATE_COLUMNS},
+            "observed_at": func.now()
+        }
+    )
+    for start in range(0, len(observations), chunk_size):
+        await session.execute(stmt, observations[start:start + chunk_size])
+
+async def upsert_raw(session: AsyncSession, rows: List[Dict], chunk_size: int = UPSERT_CHUNK_SIZE):
+    """Insert or overwrite workflow_raw rows (see raw_row) by workflow id"""
+    if not rows:
+        return
+    insert = postgresql.insert if dialect_name(session) == "postgresql" else sqlite.insert
+    stmt = insert(WorkflowRaw.__table__)
+    stmt = stmt.on_conflict_do_update(index_elements=["workflow_id"], set_={"data": stmt.excluded.data})
+    for start in range(0, len(rows), chunk_size):
+        await session.execute(stmt, rows[start:start + chunk_size])
+
+async def load_raw_data(session: AsyncSession, workflow_ids: List[int]) -> Dict[int, Dict]:
+    """Collector dicts of stored workflows by id; rows without a payload are left out"""
+    found = {}
+    for start in range(0, len(workflow_ids), UPSERT_CHUNK_SIZE):
+        result = await session.execute(
+            select(WorkflowRaw.workflow_id, WorkflowRaw.data)
+            .where(WorkflowRaw.workflow_id.in_(workflow_ids[start:start + UPSERT_CHUNK_SIZE]))
+        )
+        found.update((workflow_id, decompress_raw(data)) for workflow_id, data in result)
+    return found
+
+def dialect_name(session: AsyncSession) -> str:
+    """Dialect of the session's bind, checked against the supported upsert dialects"""
+    dialect = session.get_bind().dialect.name
+    if dialect not in ("postgresql", "sqlite"):
+        raise ValueError(f"Bulk upsert is not supported for {dialect}")
+    return dialect
+
+# Statements are built once and run executemany-style on the Core table,
+# so SQLAlchemy batches them into multi-row INSERTs from one cached
+# compilation instead of compiling a new VALUES list for every chunk
+
+def _upsert_statement(insert):
+    stmt = insert(Workflow.__table__)
+    return stmt.on_conflict_do_update(
+        index_elements=KEY_COLUMNS,
+        set_={
+            **{column: stmt.excluded[column] for column in UPDATE_COLUMNS},
+            # onupdate defaults are not applied to ON CONFLICT updates
+            "updated_at": func.now()
+        },
+        where=Workflow.content_hash.is_distinct_from(stmt.excluded.content_hash)
+    )
+
+# Written rows come back with their id and key, to attach raw payloads
+WRITTEN_COLUMNS = [Workflow.id, *(getattr(Workflow, column) for column in KEY_COLUMNS)]
+
+POSTGRESQL_UPSERT = _upsert_statement(postgresql.insert).returning(
+    *WRITTEN_COLUMNS, literal_column("(xmax = 0)").label("inserted")
+)
+SQLITE_UPSERT = _upsert_statement(sqlite.insert).returning(*WRITTEN_COLUMNS)
+
+# (id, row key) of the rows an upsert wrote
+Written = List[Tuple[int, Tuple[str, str, str]]]
+
+async def _upsert_chunk_postgresql(session: AsyncSession, chunk: List[Dict]) -> Tuple[int, int, Written]:
+    """Upsert one chunk, counting inserts from the system column xmax
+    
+    Rows skipped by the content_hash guard are not returned at all.
+    """
+    result = await session.execute(POSTGRESQL_UPSERT, chunk)
+    written = [(workflow_id, (name, platform, country), flag)
+               for workflow_id, name, platform, country, flag in result.all()]
+    inserted = sum(1 for *_, flag in written if flag)
+    return inserted, len(written) - inserted, [(workflow_id, key) for workflow_id, key, _ in written]
+
+async def _upsert_chunk_sqlite(session: AsyncSession, chunk: List[Dict]) -> Tuple[int, int, Written]:
+    """Upsert one chunk on SQLite, which has no xmax to tell inserts apart"""
+    keys = [row_key(row) for row in chunk]
+    existing = await session.execute(
+        select(func.count()).select_from(Workflow).where(
+            tuple_(*(getattr(Workflow, column) for column in KEY_COLUMNS)).in_(keys)
+        )
+    )
+
+    result = await session.execute(SQLITE_UPSERT, chunk)
+    written = [(workflow_id, tuple(key)) for workflow_id, *key in result.all()]
+    inserted = len(chunk) - existing.scalar()
+    return inserted, len(written) - inserted, written